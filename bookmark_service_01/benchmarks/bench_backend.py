@@ -0,0 +1,91 @@
+# bench_backend.py
+# 存储后端压测：比较 YamlBackend（书签配置文件 + 写前日志）与 SqliteBackend（SQLite WAL），
+# 统计完整加载、单条书签写入（含刷盘）、另一个进程写入后的增量更新，以及合并（导出书签配置文件）的耗时。
+#
+# 用法（在 bookmark_service_01 目录下）：
+#   python benchmarks/bench_backend.py --entries 100000
+#   python benchmarks/bench_backend.py --entries 100000 --writes 500 --synchronous NORMAL
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from bookmark_store import BookmarkStore  # noqa: E402
+from bookmark_backend import YamlBackend, SqliteBackend  # noqa: E402
+from bookmark_journal import BookmarkJournal, put_op  # noqa: E402
+from bookmark_model import Service  # noqa: E402
+from bench_search import synthetic_model  # noqa: E402
+
+
+def make_backend(kind, workdir, synchronous):
+    path = os.path.join(workdir, 'bookmarks.yaml')
+    if kind == 'yaml':
+        return YamlBackend(path, BookmarkJournal(os.path.join(workdir, '.bookmarks.yaml.journal')))
+    return SqliteBackend(os.path.join(workdir, 'bookmarks.db'), path, synchronous=synchronous)
+
+
+def run(kind, entries, writes, synchronous):
+    with tempfile.TemporaryDirectory() as workdir:
+        model = synthetic_model(entries)
+        writer = BookmarkStore(backend=make_backend(kind, workdir, synchronous), compact_interval=0,
+                               compact_max_ops=writes * 2)
+        start = time.perf_counter()
+        writer.save(model.to_list())
+        save_s = time.perf_counter() - start
+
+        # 另一个进程（独立的后端实例，没有共享内存中的模型）
+        reader = BookmarkStore(backend=make_backend(kind, workdir, synchronous), compact_interval=0)
+        start = time.perf_counter()
+        reader.model()
+        load_s = time.perf_counter() - start
+
+        samples = []
+        for i in range(writes):
+            service = Service.create(f'bench-{i}', 'BN', f'https://bench.example/{i}')
+            start = time.perf_counter()
+            writer.apply([put_op('Bench', service)])
+            samples.append(time.perf_counter() - start)
+        samples.sort()
+
+        start = time.perf_counter()
+        reader.model()
+        catch_up_s = time.perf_counter() - start
+        assert reader.model().service('Bench', f'bench-{writes - 1}') is not None
+
+        start = time.perf_counter()
+        writer.compact()
+        compact_s = time.perf_counter() - start
+        return {
+            'save_s': save_s,
+            'load_s': load_s,
+            'write_p50_ms': samples[len(samples) // 2] * 1000,
+            'write_p99_ms': samples[int(len(samples) * 0.99)] * 1000,
+            'catch_up_ms': catch_up_s * 1000,
+            'compact_s': compact_s,
+            'reloads': reader.reloads,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='存储后端：YAML + 写前日志与 SQLite 的对比')
+    parser.add_argument('--entries', type=int, default=100000)
+    parser.add_argument('--writes', type=int, default=200)
+    parser.add_argument('--backends', nargs='+', default=['yaml', 'sqlite'])
+    parser.add_argument('--synchronous', default='FULL', help='SQLite 的 PRAGMA synchronous')
+    args = parser.parse_args()
+
+    print(f"书签数: {args.entries}，单条写入: {args.writes} 次")
+    print(f"{'后端':<8s}{'保存 (s)':>10s}{'加载 (s)':>10s}{'写入 p50 (ms)':>16s}{'写入 p99 (ms)':>16s}"
+          f"{'增量更新 (ms)':>16s}{'合并 (s)':>10s}{'重新加载':>10s}")
+    for kind in args.backends:
+        result = run(kind, args.entries, args.writes, args.synchronous)
+        print(f"{kind:<8s}{result['save_s']:>10.2f}{result['load_s']:>10.2f}{result['write_p50_ms']:>16.2f}"
+              f"{result['write_p99_ms']:>16.2f}{result['catch_up_ms']:>16.1f}{result['compact_s']:>10.2f}"
+              f"{result['reloads']:>10d}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+# bench_concurrent_writes.py
+# 并发写入压力测试：N 个进程同时写书签，验证没有丢失任何一次写入，读者也不会读到写了一半的文件。
+#
+# 用法（在 bookmark_service_01 目录下）：
+#   python benchmarks/bench_concurrent_writes.py --workers 8 --writes 200
+#   python benchmarks/bench_concurrent_writes.py --unsafe   # 对比：不加锁、直接 open('w') 的写法
+import os
+import sys
+import time
+import argparse
+import tempfile
+import multiprocessing
+
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from atomic_file import atomic_write, file_lock  # noqa: E402
+from bookmark_store import BookmarkStore  # noqa: E402
+from bookmark_journal import BookmarkJournal, put_op  # noqa: E402
+from bookmark_model import Service  # noqa: E402
+
+
+def _store(workdir, compact_max_ops):
+    return BookmarkStore(
+        os.path.join(workdir, 'bookmarks.yaml'),
+        journal=BookmarkJournal(os.path.join(workdir, '.bookmarks.yaml.journal')),
+        compact_interval=0,
+        compact_max_ops=compact_max_ops,
+    )
+
+
+def bookmark_writer(workdir, worker, writes, compact_max_ops):
+    store = _store(workdir, compact_max_ops)
+    for i in range(writes):
+        store.apply([put_op(f"group-{worker}", Service.create(f"service-{i}", f"s{i}", f"https://{worker}.example/{i}"))])
+    store.compact()
+
+
+def counter_writer(path, writes, unsafe):
+    for _ in range(writes):
+        if unsafe:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = yaml.safe_load(f) or {'count': 0}
+            data['count'] += 1
+            with open(path, 'w', encoding='utf-8') as f:
+                yaml.dump(data, f)
+        else:
+            with file_lock(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = yaml.safe_load(f)
+                data['count'] += 1
+                atomic_write(path, yaml.dump(data))
+
+
+def reader(path, stop, torn):
+    while not stop.is_set():
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = yaml.safe_load(f)
+            if not isinstance(data, dict) or 'count' not in data:
+                torn.value += 1
+        except yaml.YAMLError:
+            torn.value += 1
+
+
+def run_processes(target, args_list):
+    procs = [multiprocessing.Process(target=target, args=args) for args in args_list]
+    start = time.perf_counter()
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="书签并发写入压力测试")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--writes', type=int, default=200)
+    parser.add_argument('--compact-max-ops', type=int, default=100)
+    parser.add_argument('--unsafe', action='store_true', help="计数器测试使用不加锁的原始写法")
+    args = parser.parse_args()
+
+    ok = True
+    with tempfile.TemporaryDirectory() as workdir:
+        elapsed = run_processes(bookmark_writer, [
+            (workdir, w, args.writes, args.compact_max_ops) for w in range(args.workers)
+        ])
+        model = _store(workdir, args.compact_max_ops).model()
+        expected = args.workers * args.writes
+        actual = model.service_count()
+        print(f"bookmarks: {args.workers} workers x {args.writes} adds, "
+              f"{expected / elapsed:.0f} adds/s, expected={expected} actual={actual}")
+        ok &= actual == expected
+
+        counter = os.path.join(workdir, 'counter.yaml')
+        with open(counter, 'w', encoding='utf-8') as f:
+            yaml.dump({'count': 0}, f)
+        stop = multiprocessing.Event()
+        torn = multiprocessing.Value('i', 0)
+        watcher = multiprocessing.Process(target=reader, args=(counter, stop, torn))
+        watcher.start()
+        elapsed = run_processes(counter_writer, [
+            (counter, args.writes, args.unsafe) for _ in range(args.workers)
+        ])
+        stop.set()
+        watcher.join()
+        with open(counter, 'r', encoding='utf-8') as f:
+            count = (yaml.safe_load(f) or {}).get('count')
+        print(f"counter ({'unsafe' if args.unsafe else 'locked+atomic'}): "
+              f"{expected / elapsed:.0f} updates/s, expected={expected} actual={count} torn_reads={torn.value}")
+        ok &= count == expected and torn.value == 0
+
+    print("OK" if ok else "LOST WRITES")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,228 @@
+# bench_favicon.py
+# 书签图标和标题的抓取检查：在本地启动模拟站点（不需要访问外网），验证标题和图标的提取、
+# 多个 worker 同时补齐时每个链接只抓取一次、相同图标只保存一份、图标接口的 ETag / 304 和安全响应头，
+# 以及超过大小上限时的淘汰和之后的重新抓取。
+#
+# 用法（在 bookmark_service_01 目录下）：
+#   python benchmarks/bench_favicon.py
+#   python benchmarks/bench_favicon.py --sites 50 --workers 4
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+# 服务使用临时的配置目录，并关闭后台的链接检查和图标抓取（由本脚本直接调用）
+WORKDIR = tempfile.mkdtemp(prefix='bench-favicon-')
+os.environ['BOOKMARK_CONFIG_DIR'] = WORKDIR
+os.environ['LOG_FILE'] = os.path.join(WORKDIR, 'logs', 'add_bookmark.log')
+os.environ.setdefault('BACKGROUND_FETCH', '0')
+os.environ.setdefault('BOOKMARK_COMPACT_INTERVAL', '0')
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 2048
+ICO = b'\x00\x00\x01\x00' + b'\x01' * 1024
+SVG = b'<svg xmlns="http://www.w3.org/2000/svg"><script>alert(1)</script></svg>'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    模拟站点：
+      /site<N>    标题为 Site N，<link rel="icon"> 指向所有站点共用的 /shared.png；
+      /plain<N>   没有标题和图标链接，使用根目录的 /favicon.ico；
+      /vector<N>  图标为 SVG（/vector<N>.svg）；
+      /big<N>     每个站点各自的较大图标（/big<N>.png，用于淘汰）。
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        path = self.path.split('?')[0]
+        with server.guard:
+            server.requests[path] += 1
+        # 放慢响应，让多个 worker 的补齐在时间上重叠
+        time.sleep(server.delay)
+        name = path.lstrip('/')
+        content_type = 'text/html; charset=utf-8'
+        if path == '/shared.png':
+            body, content_type = PNG, 'image/png'
+        elif path == '/favicon.ico':
+            body, content_type = ICO, 'image/x-icon'
+        elif name.startswith('vector') and name.endswith('.svg'):
+            body, content_type = SVG, 'image/svg+xml'
+        elif name.startswith('big') and name.endswith('.png'):
+            body, content_type = PNG + name.encode('ascii') * 64, 'image/png'
+        elif name.startswith('site'):
+            body = (f'<html><head><title> Site {name[4:]} </title><link rel="icon" href="/shared.png"></head>'
+                    f'<body>ignored<title>no</title></body></html>').encode('utf-8')
+        elif name.startswith('plain'):
+            body = b'<html><head></head><body>plain</body></html>'
+        elif name.startswith('vector'):
+            body = f'<html><head><title>Vector</title><link rel="icon" href="/{name}.svg"></head></html>'.encode('utf-8')
+        elif name.startswith('big'):
+            body = f'<html><head><title>Big</title><link rel="icon" href="/{name}.png"></head></html>'.encode('utf-8')
+        else:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_stub(delay):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    server.guard = threading.Lock()
+    server.requests = Counter()
+    server.delay = delay
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def write_config(hrefs):
+    """
+    临时配置目录：bookmarks.yaml（即第一页）包含所有模拟站点的链接，以及翻页配置。
+    """
+    import yaml_io
+
+    pages_dir = os.path.join(WORKDIR, 'other', 'bookmarks')
+    os.makedirs(pages_dir)
+    os.makedirs(os.path.join(WORKDIR, 'logs'))
+    groups = [{'Stub': [{f'stub{i}': {'abbr': 'ST', 'href': href}} for i, href in enumerate(hrefs)]}]
+    for path in (os.path.join(pages_dir, 'page1.yaml'), os.path.join(WORKDIR, 'bookmarks.yaml')):
+        yaml_io.dump_file(path, groups)
+    with open(os.path.join(WORKDIR, 'other', 'next_setting.yaml'), 'w', encoding='utf-8') as file:
+        file.write("bookmarks:\n  index: 1\n  action: page1.yaml\n  files: [page1.yaml]\n  target: bookmarks.yaml\n")
+
+
+def check_extraction(cache, base):
+    """
+    标题和图标的提取：rel="icon"、回退到 /favicon.ico、SVG 图标。
+    """
+    site, plain, vector = cache.metadata(f'{base}/site0'), cache.metadata(f'{base}/plain0'), cache.metadata(f'{base}/vector0')
+    assert site['title'] == 'Site 0', site
+    assert site['icon_url'] == f'{base}/shared.png' and site['content_type'] == 'image/png', site
+    assert plain['title'] is None and plain['icon_url'] == f'{base}/favicon.ico', plain
+    assert plain['content_type'] == 'image/x-icon', plain
+    assert vector['title'] == 'Vector' and vector['content_type'] == 'image/svg+xml', vector
+    print(f"提取: {site['title']!r} -> {site['icon_url']}，{plain['icon_url']}，{vector['content_type']}")
+
+
+def check_dedupe(cache_dir, hrefs, server, workers):
+    """
+    多个 worker（各自的 FaviconCache 实例，共用缓存目录）同时补齐：每个链接只请求一次，相同的图标只保存一份。
+    """
+    from favicon_cache import FaviconCache
+
+    caches = [FaviconCache(lambda: hrefs, cache_dir=cache_dir, timeout=5) for _ in range(workers)]
+    counts = [0] * workers
+
+    def refresh(i):
+        counts[i] = caches[i].refresh()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=refresh, args=(i,)) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    pages = {href.rsplit('/', 1)[-1] for href in hrefs}
+    repeated = {path: n for path, n in server.requests.items() if path.lstrip('/') in pages and n != 1}
+    stats = caches[0].stats()
+    print(f"{workers} 个 worker 同时补齐 {len(hrefs)} 个链接: {elapsed:.2f}s，各 worker 抓取 {counts}，"
+          f"/shared.png 请求 {server.requests['/shared.png']} 次，保存图标 {stats['icons']} 个")
+    assert sum(counts) == len(hrefs), counts
+    assert not repeated, f"重复抓取: {repeated}"
+    # site* 共用一个 PNG，plain* 共用 /favicon.ico，vector* 的 SVG 内容相同
+    assert stats['icons'] == 3, stats
+    return caches[0]
+
+
+def check_conditional(hrefs):
+    """
+    图标接口：200 带 ETag 和安全响应头，带上 If-None-Match 时返回 304。
+    """
+    from app import app
+    from favicon_cache import favicon_cache, bookmark_id
+
+    favicon_cache.refresh(hrefs)
+    client = app.test_client()
+    svg = next(href for href in hrefs if '/vector' in href)
+    response = client.get(f'/api/bookmarks/{bookmark_id(svg)}/icon')
+    assert response.status_code == 200 and response.mimetype == 'image/svg+xml', response.status
+    etag = response.headers['ETag']
+    for headers in (response.headers, client.get(f'/api/bookmarks/{bookmark_id(svg)}/icon',
+                                                 headers={'If-None-Match': etag}).headers):
+        assert 'sandbox' in headers['Content-Security-Policy'], headers
+        assert headers['X-Content-Type-Options'] == 'nosniff', headers
+    again = client.get(f'/api/bookmarks/{bookmark_id(svg)}/icon', headers={'If-None-Match': etag})
+    assert again.status_code == 304 and not again.data, again.status
+    missing = client.get('/api/bookmarks/0000000000000000/icon')
+    assert missing.status_code == 404, missing.status
+    print(f"图标接口: 200 ETag {etag}，If-None-Match -> {again.status_code}，未知书签 -> {missing.status_code}")
+
+
+def check_eviction(cache_dir, base, server, sites):
+    """
+    图标的总大小超过上限时淘汰最久没有被访问的图标，被淘汰的图标在下次访问时重新抓取。
+    """
+    from favicon_cache import FaviconCache, bookmark_id
+
+    hrefs = [f'{base}/big{i}' for i in range(sites)]
+    size = len(PNG + b'big0.png' * 64)
+    cache = FaviconCache(lambda: hrefs, cache_dir=cache_dir, max_bytes=size * 4, timeout=5)
+    cache.refresh()
+    stats = cache.stats()
+    assert stats['bytes'] <= cache.max_bytes and stats['evictions'] >= sites - 4, stats
+    evicted = [href for href in hrefs if cache.metadata(href)['hash'] is None]
+    assert evicted, stats
+    href = evicted[0]
+    icon_path = '/' + href.rsplit('/', 1)[-1] + '.png'
+    before = server.requests[icon_path]
+    # 被淘汰的图标：接口返回“暂时没有”并在后台排队，这里直接补齐
+    assert cache.icon(bookmark_id(href)) == (None, None, None)
+    cache.refresh([href])
+    digest, content_type, body = cache.icon(bookmark_id(href))
+    assert digest is not None and content_type == 'image/png', content_type
+    assert server.requests[icon_path] == before + 1, server.requests[icon_path]
+    print(f"淘汰: 上限 {cache.max_bytes} 字节，{sites} 个图标淘汰 {stats['evictions']} 个，"
+          f"重新抓取 {href.rsplit('/', 1)[-1]} -> {digest[:12]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='书签图标和标题：提取、去重、304 和淘汰')
+    parser.add_argument('--sites', type=int, default=20, help='每种模拟站点的数量')
+    parser.add_argument('--workers', type=int, default=4, help='同时补齐的 worker 数')
+    parser.add_argument('--delay', type=float, default=0.01, help='模拟站点的响应时间（秒）')
+    args = parser.parse_args()
+
+    server = start_stub(args.delay)
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+    hrefs = [f'{base}/{kind}{i}' for kind in ('site', 'plain', 'vector') for i in range(args.sites)]
+    write_config(hrefs)
+    try:
+        cache = check_dedupe(os.path.join(WORKDIR, 'dedupe'), hrefs, server, args.workers)
+        check_extraction(cache, base)
+        check_conditional(hrefs[::args.sites])
+        check_eviction(os.path.join(WORKDIR, 'eviction'), base, server, args.sites)
+        print("全部检查通过")
+    finally:
+        server.shutdown()
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+# bench_link_check.py
+# 链接检查压测：在本地启动若干个模拟站点（不需要访问外网），检查大量链接，
+# 验证总并发和每个主机的并发上限、HEAD 失败（错误状态码或断开连接）后改用 GET、重定向、重定向循环、
+# 没有 Location 的重定向、超时，以及结果缓存的有效期。每种链接的检查结果都有断言，结果不符时脚本失败。
+#
+# 用法（在 bookmark_service_01 目录下）：
+#   python benchmarks/bench_link_check.py --links 2000 --hosts 8
+import os
+import sys
+import time
+import socket
+import argparse
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+os.environ.setdefault('LINK_CHECK_INTERVAL', '0')
+
+from link_checker import LinkChecker  # noqa: E402
+
+
+# 每种模拟链接期望的检查结果
+EXPECTED = {
+    'ok': {'ok': True, 'status': 200, 'method': 'HEAD', 'error': None},
+    'slow': {'ok': True, 'status': 200, 'method': 'HEAD', 'error': None},
+    'missing': {'ok': False, 'status': 404, 'method': 'GET', 'error': None},
+    'nohead': {'ok': True, 'status': 200, 'method': 'GET', 'error': None},
+    'headdrop': {'ok': True, 'status': 200, 'method': 'GET', 'error': None},
+    'redirect': {'ok': True, 'status': 200, 'method': 'HEAD', 'error': None},
+    'loop': {'ok': False, 'status': 302, 'method': 'GET', 'error': 'too many redirects'},
+    'noloc': {'ok': False, 'status': 302, 'method': 'GET', 'error': 'redirect without location'},
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    模拟站点：/ok、/slow、/missing（404）、/nohead（HEAD 返回 405）、/headdrop（HEAD 直接断开连接）、
+    /redirect（302 到 /ok）、/loop（302 到自身）、/noloc（302 但没有 Location）、/hang（超时）。
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self, head):
+        server = self.server
+        with server.guard:
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+            server.requests += 1
+        try:
+            path = self.path.split('?')[0].rstrip('/').rsplit('/', 1)[-1]
+            if path.startswith('slow'):
+                time.sleep(server.delay)
+            if path.startswith('hang'):
+                time.sleep(server.hang)
+            if path.startswith('headdrop') and head:
+                self.close_connection = True
+                self.connection.shutdown(socket.SHUT_RDWR)
+                return
+            if path.startswith('missing'):
+                status = 404
+            elif path.startswith('nohead') and head:
+                status = 405
+            elif path.startswith(('redirect', 'loop', 'noloc')):
+                status = 302
+            else:
+                status = 200
+            body = b'' if head else b'ok'
+            self.send_response(status)
+            if path.startswith('redirect'):
+                self.send_header('Location', '/ok')
+            elif path.startswith('loop'):
+                self.send_header('Location', '/' + path)
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.guard:
+                server.active -= 1
+
+    def do_HEAD(self):
+        self._respond(True)
+
+    def do_GET(self):
+        self._respond(False)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # /hang 的客户端超时后已经断开连接
+        pass
+
+
+def start_stub(delay, hang):
+    server = StubServer(('127.0.0.1', 0), StubHandler)
+    server.guard = threading.Lock()
+    server.active = server.peak = server.requests = 0
+    server.delay = delay
+    server.hang = hang
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='书签链接检查：并发上限、HEAD/GET 回退和结果缓存')
+    parser.add_argument('--links', type=int, default=2000)
+    parser.add_argument('--hosts', type=int, default=8)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--per-host', type=int, default=4)
+    parser.add_argument('--delay', type=float, default=0.02, help='/slow 的响应时间（秒）')
+    parser.add_argument('--timeout', type=float, default=0.5)
+    args = parser.parse_args()
+
+    servers = [start_stub(args.delay, args.timeout * 4) for _ in range(args.hosts)]
+    kinds = list(EXPECTED)
+    urls = set()
+    for i in range(args.links):
+        server = servers[i % len(servers)]
+        urls.add(f"http://127.0.0.1:{server.server_address[1]}/{kinds[i % len(kinds)]}{i}")
+    hang = f"http://127.0.0.1:{servers[0].server_address[1]}/hang"
+    urls.add(hang)
+    urls.add('mailto:someone@example.com')
+
+    with tempfile.TemporaryDirectory() as workdir:
+        checker = LinkChecker(lambda: urls, path=os.path.join(workdir, 'links.json'), ttl=3600, interval=0,
+                              concurrency=args.concurrency, per_host=args.per_host, timeout=args.timeout)
+        start = time.perf_counter()
+        checked = checker.scan()
+        elapsed = time.perf_counter() - start
+        results = checker.results()
+        peak = max(server.peak for server in servers)
+        print(f"检查 {checked} 个链接: {elapsed:.2f}s（{checked / elapsed:.0f} 个/秒），"
+              f"每个主机的最大并发 {peak}（上限 {args.per_host}），总请求数 {sum(s.requests for s in servers)}")
+        by_kind = {}
+        for url, result in results.items():
+            kind = url.rsplit('/', 1)[-1].rstrip('0123456789')
+            by_kind.setdefault(kind, set()).add((result['ok'], result['status'], result['method'], result['error']))
+        for kind, outcomes in sorted(by_kind.items()):
+            print(f"  {kind:<10s}{sorted(outcomes, key=str)}")
+        assert peak <= args.per_host, "超过了每个主机的并发上限"
+        assert results[hang]['error'] == 'timeout' and not results[hang]['ok'], results[hang]
+        assert 'mailto:someone@example.com' not in results, "不应检查非 http 链接"
+        for url, result in results.items():
+            if url == hang:
+                continue
+            kind = url.rsplit('/', 1)[-1].rstrip('0123456789')
+            expected = EXPECTED[kind]
+            actual = {key: result[key] for key in expected}
+            assert actual == expected, f"{url}: 期望 {expected}，实际 {actual}"
+            if kind == 'redirect':
+                assert result['final_url'].endswith('/ok'), result
+
+        # 有效期内再次扫描不会发送任何请求；新的检查器从结果文件中读取
+        start = time.perf_counter()
+        requests = sum(s.requests for s in servers)
+        again = LinkChecker(lambda: urls, path=checker.path, ttl=3600, interval=0).scan()
+        print(f"有效期内再次扫描: 检查 {again} 个链接，用时 {(time.perf_counter() - start) * 1000:.1f}ms")
+        assert again == 0 and sum(s.requests for s in servers) == requests, "有效期内不应重新检查"
+        print("全部检查通过")
+        for server in servers:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+# bench_logging.py
+# 日志开销压测：模拟一次添加书签请求中的日志调用（app.py 的请求处理函数 + add_bookmark 模块），比较
+#   - legacy：logging.basicConfig 同步写文件，调试信息（请求头、请求体）和 f-string 消息在每次调用时都会求值；
+#   - pipeline：app_logging.setup_logging，后台线程写文件，调试信息只在 DEBUG 级别开启时读取，消息延迟格式化。
+# 每种模式、每个日志级别在单独的子进程中运行（根日志记录器只能配置一次），统计每个请求的日志开销。
+#
+# 用法（在 bookmark_service_01 目录下）：
+#   python benchmarks/bench_logging.py --requests 20000
+#   python benchmarks/bench_logging.py --levels INFO --body-bytes 65536
+#   python benchmarks/bench_logging.py --levels INFO --write-delay-ms 0.05   # 模拟慢的存储（例如网络卷），每条记录写入前等待
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+
+def legacy_request(logger, request, data):
+    # 改动前 app.py 和 add_bookmark.py 中的写法
+    logger.info("收到添加书签的请求: %s", request.remote_addr)
+    logger.debug("请求头: %s", request.headers)
+    logger.debug("请求体: %s", request.get_data(as_text=True))
+    logger.info(f"添加新书签: {data['service_name']} 到分组 {data['group_name']}")
+    logger.debug(f"书签详情: abbr={data['abbr']}, url={data['url']}")
+    logger.info(f"成功添加书签: {data['service_name']} 到现有分组 {data['group_name']}")
+    logger.info("添加书签成功，状态码: %s", 200)
+
+
+def pipeline_request(logger, request, data):
+    from app_logging import log_request
+    logger.info("收到添加书签的请求: %s", request.remote_addr)
+    log_request(logger, body=True)
+    logger.info("添加新书签: %s 到分组 %s", data['service_name'], data['group_name'])
+    logger.debug("书签详情: abbr=%s, url=%s", data['abbr'], data['url'])
+    logger.info("成功添加书签: %s 到现有分组 %s", data['service_name'], data['group_name'])
+    logger.info("添加书签成功，状态码: %s", 200)
+
+
+def run_worker(mode, level, requests, body_bytes, path, write_delay_ms=0):
+    """
+    子进程：配置日志后在请求上下文中执行 requests 次日志调用。
+    :return: {'mean_us', 'p50_us', 'p99_us', 'flush_ms', 'bytes', 'dropped'}
+    """
+    sys.path.insert(0, SRC_DIR)
+    import logging
+    from flask import Flask
+
+    if mode == 'legacy':
+        logging.basicConfig(level=level, filename=path, filemode='a', encoding='utf-8',
+                            format='%(asctime)s - %(levelname)s - [%(filename)s] - %(name)s - %(message)s')
+        handle = legacy_request
+    else:
+        from app_logging import setup_logging, bind_request_id, reset_request_id
+        setup_logging(path, level=level, max_bytes=0)
+        handle = pipeline_request
+    logger = logging.getLogger('bench')
+
+    if write_delay_ms > 0:
+        if mode == 'legacy':
+            file_handler = logging.getLogger().handlers[0]
+        else:
+            import app_logging
+            file_handler = app_logging._listener.handlers[0]
+        emit = file_handler.emit
+
+        def slow_emit(record):
+            time.sleep(write_delay_ms / 1000)
+            emit(record)
+        file_handler.emit = slow_emit
+
+    app = Flask(__name__)
+    data = {'group_name': 'Bench', 'service_name': 'bench-service', 'abbr': 'BS',
+            'url': 'https://bench.example/' + 'x' * max(0, body_bytes - 100)}
+    body = json.dumps(data)
+    samples = []
+    for i in range(requests):
+        with app.test_request_context('/api/bookmarks', method='POST', data=body,
+                                      headers={'Content-Type': 'application/json'}) as ctx:
+            token = bind_request_id() if mode == 'pipeline' else None
+            start = time.perf_counter_ns()
+            handle(logger, ctx.request, data)
+            samples.append(time.perf_counter_ns() - start)
+            if token is not None:
+                reset_request_id(token)
+
+    # 后台线程中还没有写完的记录，不计入每个请求的开销
+    start = time.perf_counter()
+    dropped = 0
+    if mode == 'pipeline':
+        from app_logging import stop_logging, records_dropped
+        stop_logging()
+        dropped = sum(value for _, _, _, value in records_dropped.samples())
+    else:
+        logging.shutdown()
+    flush_ms = (time.perf_counter() - start) * 1000
+
+    samples.sort()
+    return {
+        'mean_us': sum(samples) / len(samples) / 1000,
+        'p50_us': samples[len(samples) // 2] / 1000,
+        'p99_us': samples[int(len(samples) * 0.99)] / 1000,
+        'flush_ms': flush_ms,
+        'bytes': os.path.getsize(path) if os.path.exists(path) else 0,
+        'dropped': dropped,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='日志开销：同步写文件与后台队列的对比')
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--levels', nargs='+', default=['WARNING', 'INFO', 'DEBUG'])
+    parser.add_argument('--body-bytes', type=int, default=4096, help='模拟的请求体大小')
+    parser.add_argument('--write-delay-ms', type=float, default=0, help='每条记录写入文件前等待的时间（模拟慢的存储）')
+    parser.add_argument('--worker', nargs=2, metavar=('MODE', 'LEVEL'), help=argparse.SUPPRESS)
+    parser.add_argument('--path', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        mode, level = args.worker
+        print(json.dumps(run_worker(mode, level, args.requests, args.body_bytes, args.path, args.write_delay_ms)))
+        return
+
+    print(f"请求数: {args.requests}，请求体: {args.body_bytes} 字节，每条记录的写入延迟: {args.write_delay_ms} ms")
+    print(f"{'级别':<10s}{'模式':<10s}{'平均 (us)':>12s}{'p50 (us)':>12s}{'p99 (us)':>12s}"
+          f"{'退出时写完 (ms)':>18s}{'日志字节':>12s}{'丢弃':>8s}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for level in args.levels:
+            for mode in ('legacy', 'pipeline'):
+                path = os.path.join(workdir, f'{mode}-{level}.log')
+                output = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '--worker', mode, level, '--path', path,
+                     '--requests', str(args.requests), '--body-bytes', str(args.body_bytes),
+                     '--write-delay-ms', str(args.write_delay_ms)],
+                    check=True, capture_output=True, text=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                print(f"{level:<10s}{mode:<10s}{result['mean_us']:>12.1f}{result['p50_us']:>12.1f}"
+                      f"{result['p99_us']:>12.1f}{result['flush_ms']:>18.1f}{result['bytes']:>12d}{result['dropped']:>8d}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# bench_search.py
+# 书签搜索压测：比较 bookmark_search 的三元组倒排索引与逐个扫描全部书签（bookmark.js 在客户端的做法）。
+#
+# 用法（在 bookmark_service_01 目录下）：
+#   python benchmarks/bench_search.py --entries 100000
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from bookmark_store import BookmarkStore  # noqa: E402
+from bookmark_journal import BookmarkJournal, put_op  # noqa: E402
+from bookmark_model import BookmarkModel, Group, Service  # noqa: E402
+from bookmark_search import BookmarkSearchIndex  # noqa: E402
+
+WORDS = ['git', 'hub', 'lab', 'mail', 'cloud', 'docs', 'news', 'video', 'music', 'shop', 'photo', 'blog',
+         'wiki', 'chat', 'drive', 'maps', 'code', 'store', 'play', 'book']
+
+
+def synthetic_model(entries, per_group=100, seed=1):
+    rng = random.Random(seed)
+    model = BookmarkModel()
+    for g in range((entries + per_group - 1) // per_group):
+        group = Group(f"{rng.choice(WORDS).title()} {g}")
+        for s in range(min(per_group, entries - g * per_group)):
+            name = f"{rng.choice(WORDS)}{rng.choice(WORDS)}-{g}-{s}"
+            host = f"{rng.choice(WORDS)}{g % 997}.example.com"
+            group.put(Service.create(name, name[:3].upper(), f"https://www.{host}/{rng.choice(WORDS)}/{s}"))
+        model.groups[group.name] = group
+    return model
+
+
+def linear_search(model, query, limit):
+    words = query.lower().split()
+    results = []
+    for group in model.groups.values():
+        for service in group.services.values():
+            text = ' '.join((service.name, service.abbr, group.name, service.href)).lower()
+            if all(word in text for word in words):
+                results.append((group.name, service.name))
+    return results[:limit]
+
+
+def timed(repeat, fn):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='书签搜索：倒排索引与线性扫描的对比')
+    parser.add_argument('--entries', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        store = BookmarkStore(os.path.join(workdir, 'bookmarks.yaml'),
+                              journal=BookmarkJournal(os.path.join(workdir, '.bookmarks.yaml.journal')),
+                              compact_interval=0)
+        model = synthetic_model(args.entries)
+        # 直接换入内存中的模型，不经过 YAML 解析
+        store.swap(model)
+        index = BookmarkSearchIndex(store)
+
+        start = time.perf_counter()
+        index.search('warmup')
+        print(f"书签数: {args.entries}，构建索引: {time.perf_counter() - start:.2f}s，{index.stats()}")
+
+        sample = model.group(model.group_names()[len(model) // 2])
+        exact = sample.service_names()[7]
+        queries = [exact, 'cloud42', 'musicshop', 'docs wiki', 'mail7.example', 'zzz-not-found', 'co', 'play 5']
+        print(f"{'查询':<18s}{'索引 (ms)':>12s}{'线性扫描 (ms)':>16s}{'匹配数':>10s}")
+        for query in queries:
+            indexed = timed(args.repeat, lambda: index.search(query, args.limit))
+            linear = timed(max(3, args.repeat // 10), lambda: linear_search(model, query, args.limit))
+            print(f"{query:<18s}{indexed * 1000:>12.3f}{linear * 1000:>16.1f}{index.search(query)['total']:>10d}")
+
+        # 增量更新：每次添加书签后立即可以搜索到（先把换入的模型写回文件，计时只包含追加日志和更新索引）
+        store.flush()
+        store.compact_max_ops = 10 ** 9
+        start = time.perf_counter()
+        for i in range(1000):
+            store.apply([put_op('Bench', Service.create(f'incremental-{i}', 'INC', f'https://inc.example/{i}'))], batch=True)
+        elapsed = time.perf_counter() - start
+        print(f"1000 次添加（含写前日志刷盘和索引更新）: {elapsed:.2f}s，搜索 incremental-999: "
+              f"{index.search('incremental-999')['total']} 个结果")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+# bench_serving.py
+# 吞吐量压测：用 serve.py 分别以 1、2、4…… 个 worker 进程启动服务，多个客户端进程并发请求同一个接口，
+# 比较每秒请求数和延迟，用于验证多进程部署的扩展性。
+#
+# 用法（在 bookmark_service_01 目录下，书签配置位于 /app/configs）：
+#   python benchmarks/bench_serving.py --workers 1 2 4 --clients 8 --duration 10
+#   python benchmarks/bench_serving.py --server gunicorn --path /api/bookmarks
+#   python benchmarks/bench_serving.py --write-ratio 0.1   # 10% 的请求为添加书签
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import subprocess
+import http.client
+import multiprocessing
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+
+def wait_until_ready(port, path, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', path)
+            conn.getresponse().read()
+            conn.close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def client(port, path, duration, write_ratio, seed, queue):
+    """
+    客户端进程：在 duration 秒内不断发送请求，返回 (请求数, 错误数, 延迟列表)。
+    """
+    count = errors = 0
+    latencies = []
+    body = None
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        write = write_ratio > 0 and (count * 7919 + seed) % 1000 < write_ratio * 1000
+        start = time.perf_counter()
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+            if write:
+                body = json.dumps({'group_name': f'bench-{seed}', 'service_name': f's{count % 100}',
+                                   'url': f'https://bench.example/{seed}/{count}'})
+                conn.request('POST', '/api/bookmarks', body=body, headers={'Content-Type': 'application/json'})
+            else:
+                conn.request('GET', path, headers={'Accept-Encoding': 'gzip'})
+            response = conn.getresponse()
+            response.read()
+            conn.close()
+            if response.status >= 400:
+                errors += 1
+        except OSError:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+        count += 1
+    queue.put((count, errors, latencies))
+
+
+def run(server, workers, threads, clients, duration, path, write_ratio, port):
+    env = dict(os.environ)
+    process = subprocess.Popen(
+        [sys.executable, 'serve.py', '--server', server, '--bind', f'127.0.0.1:{port}',
+         '--workers', str(workers), '--threads', str(threads)],
+        cwd=SRC_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_until_ready(port, path):
+            raise RuntimeError('服务没有启动')
+        queue = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=client, args=(port, path, duration, write_ratio, i, queue))
+                 for i in range(clients)]
+        for p in procs:
+            p.start()
+        results = [queue.get() for _ in procs]
+        for p in procs:
+            p.join()
+    finally:
+        process.terminate()
+        process.wait(10)
+
+    count = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
+    latencies = sorted(latency for r in results for latency in r[2])
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+    print(f"{server:9s} workers={workers:<3d} {count / duration:9.1f} req/s  "
+          f"p50={p50:7.2f}ms  p99={p99:7.2f}ms  errors={errors}", flush=True)
+    return count / duration
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多进程部署的吞吐量压测')
+    parser.add_argument('--server', default='prefork', choices=['gunicorn', 'prefork', 'threaded'])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--clients', type=int, default=8, help='并发的客户端进程数')
+    parser.add_argument('--duration', type=float, default=10, help='每轮压测的时长（秒）')
+    parser.add_argument('--path', default='/api/bookmarks')
+    parser.add_argument('--write-ratio', type=float, default=0.0, help='添加书签请求的比例')
+    args = parser.parse_args()
+
+    print(f"CPU 核数: {os.cpu_count()}，客户端进程: {args.clients}，接口: {args.path}")
+    baseline = None
+    for workers in args.workers:
+        throughput = run(args.server, workers, args.threads, args.clients, args.duration,
+                         args.path, args.write_ratio, free_port())
+        baseline = baseline or throughput
+        print(f"  相对 {args.workers[0]} 个 worker: {throughput / baseline:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,466 @@
+# bench_suite.py
+# 可重复的整体压测：按固定的随机种子生成不同规模（100 ~ 1000000 个书签）的数据集
+# （bookmarks.yaml 和 configs/other/bookmarks/ 下的多个页面），分别通过 Flask 测试客户端（单进程、没有网络开销）
+# 和 HTTP 压测（serve.py 启动的服务 + 多个并发客户端线程）访问各个接口：
+#   GET /、GET/POST /api/bookmarks、POST /api/bookmarks/save、GET /api/config/files、
+#   GET /api/config/get_yaml_content、GET /api/bookmarks/change_page
+# 统计每个接口的延迟分位数、吞吐量、进程的峰值内存（RSS）和写入配置文件的字节数，
+# 结果可以保存为基线 JSON，之后的运行与基线比较，超过容差的指标标记为退化（退出码为 1）。
+#
+# 每个规模的数据集只生成一次，测试客户端和 HTTP 压测分别使用它的副本（写接口会修改数据）。
+# 服务通过 BOOKMARK_CONFIG_DIR 指向数据集目录，并关闭后台的链接检查和图标抓取（BACKGROUND_FETCH=0）。
+#
+# 用法（在 bookmark_service_01 目录下）：
+#   python benchmarks/bench_suite.py --sizes 100 10000 --save-baseline /tmp/bookmark-baseline.json
+#   python benchmarks/bench_suite.py --sizes 100 10000 --baseline /tmp/bookmark-baseline.json
+#   python benchmarks/bench_suite.py --sizes 1000000 --duration 10 --drivers test-client   # 大数据集只跑测试客户端
+#   python benchmarks/bench_suite.py --output results.json --tolerance 0.3
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import socket
+import hashlib
+import argparse
+import platform
+import tempfile
+import itertools
+import threading
+import subprocess
+import http.client
+from urllib.parse import quote
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+WORDS = ['git', 'hub', 'lab', 'mail', 'cloud', 'docs', 'news', 'video', 'music', 'shop', 'photo', 'blog',
+         'wiki', 'chat', 'drive', 'maps', 'code', 'store', 'play', 'book']
+DRIVERS = ('test-client', 'http')
+# 每个接口至少发送的请求数（即使超过了时长）
+MIN_REQUESTS = 3
+# 与基线比较的指标：(键名, 数值越大越差, 忽略的绝对差值)
+COMPARED = (
+    ('p50_ms', True, 1.0),
+    ('p99_ms', True, 5.0),
+    ('throughput_rps', False, 0.0),
+    ('peak_rss_mb', True, 8.0),
+    ('bytes_per_request', True, 256),
+)
+
+
+# ---------------------------------------------------------------------------------------
+# 数据集
+
+def page_groups(entries, per_group, seed, tag):
+    """
+    生成一个页面的书签：[(分组名, [(服务名, 缩写, 链接)])]，相同的参数总是生成相同的数据。
+    """
+    rng = random.Random(f'{seed}-{tag}')
+    groups = []
+    for g in range((entries + per_group - 1) // per_group):
+        services = []
+        for s in range(min(per_group, entries - g * per_group)):
+            n = g * per_group + s
+            word = rng.choice(WORDS)
+            services.append((f'{word}-{tag}-{n}', f'{word[:2].upper()}{n % 100}',
+                             f'https://{word}{n % 997}.example/{tag}/{n}'))
+        groups.append((f'{rng.choice(WORDS).title()}-{tag}-{g}', services))
+    return groups
+
+
+def write_page(path, groups):
+    with open(path, 'w', encoding='utf-8') as file:
+        for group, services in groups:
+            file.write(f'- {group}:\n')
+            for name, abbr, href in services:
+                file.write(f'  - {name}:\n    - abbr: {abbr}\n      href: {href}\n')
+
+
+def save_payload(groups):
+    """
+    /api/bookmarks/save 的请求体：与 bookmarks.yaml 结构相同的 JSON。
+    """
+    return json.dumps([{group: [{name: [{'abbr': abbr}, {'href': href}]} for name, abbr, href in services]}
+                       for group, services in groups], ensure_ascii=False).encode('utf-8')
+
+
+def generate_dataset(root, entries, pages, per_group, seed):
+    """
+    生成数据集：<root>/configs/bookmarks.yaml（第一页的内容）、configs/other/bookmarks/page<N>.yaml、
+    configs/other/next_setting.yaml，以及保存接口使用的请求体 <root>/save.json。
+    :return: 数据集的描述（参数、文件大小、bookmarks.yaml 的 sha1、生成耗时）
+    """
+    start = time.perf_counter()
+    configs = os.path.join(root, 'configs')
+    pages_dir = os.path.join(configs, 'other', 'bookmarks')
+    os.makedirs(pages_dir)
+    os.makedirs(os.path.join(configs, 'logs'))
+    files = [f'page{i}.yaml' for i in range(1, pages + 1)]
+    for index, name in enumerate(files):
+        groups = page_groups(entries, per_group, seed, f'p{index + 1}')
+        write_page(os.path.join(pages_dir, name), groups)
+        if index == 0:
+            with open(os.path.join(root, 'save.json'), 'wb') as file:
+                file.write(save_payload(groups))
+    shutil.copyfile(os.path.join(pages_dir, files[0]), os.path.join(configs, 'bookmarks.yaml'))
+    with open(os.path.join(configs, 'other', 'next_setting.yaml'), 'w', encoding='utf-8') as file:
+        file.write(f"bookmarks:\n  index: 1\n  action: {files[0]}\n  files: [{', '.join(files)}]\n"
+                   f"  target: bookmarks.yaml\n")
+
+    digest = hashlib.sha1()
+    with open(os.path.join(configs, 'bookmarks.yaml'), 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    size = sum(os.path.getsize(os.path.join(dirpath, name))
+               for dirpath, _, names in os.walk(configs) for name in names)
+    return {'entries': entries, 'pages': pages, 'per_group': per_group, 'seed': seed,
+            'sha1': digest.hexdigest(), 'bytes': size, 'seconds': round(time.perf_counter() - start, 2)}
+
+
+def scenarios(config_dir, save_body):
+    """
+    压测的接口：[(名称, 方法, 路径, 请求体函数)]，请求体函数的参数为请求序号，返回 (请求体, Content-Type)。
+    """
+    def add_body(i):
+        return json.dumps({'group_name': 'Bench', 'service_name': f'bench-{i}', 'abbr': 'BN',
+                           'url': f'https://bench.example/{i}'}).encode('utf-8'), 'application/json'
+
+    pages_dir = quote(os.path.join(config_dir, 'other', 'bookmarks'))
+    return [
+        ('GET /', 'GET', '/', None),
+        ('GET /api/bookmarks', 'GET', '/api/bookmarks', None),
+        ('POST /api/bookmarks', 'POST', '/api/bookmarks', add_body),
+        ('POST /api/bookmarks/save', 'POST', '/api/bookmarks/save', lambda i: (save_body, 'application/json')),
+        ('GET /api/config/files', 'GET', f'/api/config/files?dir={pages_dir}', None),
+        ('GET /api/config/get_yaml_content', 'GET',
+         f'/api/config/get_yaml_content?file_path={quote(config_dir)}&file_name=bookmarks.yaml', None),
+        ('GET /api/bookmarks/change_page', 'GET', '/api/bookmarks/change_page', None),
+    ]
+
+
+def summarize(latencies, elapsed, errors):
+    latencies = sorted(latencies)
+
+    def percentile(q):
+        return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 3) if latencies else None
+
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': percentile(0.50),
+        'p90_ms': percentile(0.90),
+        'p99_ms': percentile(0.99),
+        'max_ms': round(latencies[-1] * 1000, 3) if latencies else None,
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed > 0 else None,
+    }
+
+
+def service_env(config_dir):
+    env = dict(os.environ)
+    env.update({
+        'BOOKMARK_CONFIG_DIR': config_dir,
+        'LOG_FILE': os.path.join(config_dir, 'logs', 'add_bookmark.log'),
+        'BACKGROUND_FETCH': '0',
+        'PYTHONHASHSEED': '0',
+    })
+    return env
+
+
+# ---------------------------------------------------------------------------------------
+# Flask 测试客户端（在子进程中运行，配置目录在导入 config 时确定）
+
+def run_test_client(config_dir, save_path, duration, max_requests):
+    sys.path.insert(0, SRC_DIR)
+    import resource
+
+    start = time.perf_counter()
+    from app import app
+    import api_change_config
+    from bookmark_store import bookmark_store
+    from metrics import file_bytes
+    # 等待后台构建的全局书签索引（启动时解析所有页面）
+    api_change_config.bookmark_page_index.lookup(service='bench-warmup', timeout=3600)
+    startup = time.perf_counter() - start
+
+    def written():
+        return sum(value for _, _, values, value in file_bytes.samples() if values == ('write',))
+
+    with open(save_path, 'rb') as file:
+        save_body = file.read()
+    client = app.test_client()
+    results = {}
+    for name, method, path, body in scenarios(config_dir, save_body):
+        before = written()
+        latencies = []
+        errors = 0
+        begin = time.perf_counter()
+        deadline = begin + duration
+        for i in itertools.count():
+            if i >= max_requests or (i >= MIN_REQUESTS and time.perf_counter() >= deadline):
+                break
+            data, content_type = body(i) if body else (None, None)
+            t = time.perf_counter()
+            response = client.open(path, method=method, data=data, content_type=content_type)
+            response.get_data()
+            latencies.append(time.perf_counter() - t)
+            errors += response.status_code >= 400
+        elapsed = time.perf_counter() - begin
+        # 写回延迟写入的页面和写前日志，计入这个接口写入的字节数
+        api_change_config.page_persister.flush()
+        bookmark_store.compact()
+        result = summarize(latencies, elapsed, errors)
+        result['bytes_written'] = written() - before
+        result['bytes_per_request'] = result['bytes_written'] // max(1, result['requests'])
+        # ru_maxrss 在 Linux 上以 KB 为单位，是进程启动以来的峰值
+        result['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        results[name] = result
+    return {'startup_seconds': round(startup, 3), 'endpoints': results}
+
+
+# ---------------------------------------------------------------------------------------
+# HTTP 压测
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def http_request(port, method, path, body=None, content_type=None, timeout=600):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        headers = {'Content-Type': content_type} if content_type else {}
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        data = response.read()
+        return response.status, data
+    finally:
+        conn.close()
+
+
+def server_peak_rss_mb(pid):
+    """
+    服务进程的峰值内存（/proc/<pid>/status 的 VmHWM），不是 Linux 时返回 None。
+    """
+    try:
+        with open(f'/proc/{pid}/status', 'r') as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def server_written_bytes(port):
+    """
+    从 /metrics 读取服务写入配置文件的字节数。
+    """
+    status, data = http_request(port, 'GET', '/metrics', timeout=30)
+    total = 0
+    for line in data.decode('utf-8').splitlines():
+        if line.startswith('bookmark_file_bytes_total{') and 'direction="write"' in line:
+            total += float(line.rsplit(' ', 1)[1])
+    return int(total)
+
+
+def run_http(config_dir, save_path, duration, max_requests, clients, threads, startup_timeout):
+    with open(save_path, 'rb') as file:
+        save_body = file.read()
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, 'serve.py', '--server', 'threaded', '--bind', f'127.0.0.1:{port}', '--threads', str(threads)],
+        cwd=SRC_DIR, env=service_env(config_dir), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            try:
+                # 查找接口会等待全局书签索引构建完成
+                http_request(port, 'GET', '/api/bookmarks/locate?service=bench-warmup', timeout=startup_timeout)
+                break
+            except OSError:
+                if time.monotonic() > deadline or process.poll() is not None:
+                    raise RuntimeError('服务没有启动')
+                time.sleep(0.2)
+        startup = time.perf_counter() - start
+
+        results = {}
+        for name, method, path, body in scenarios(config_dir, save_body):
+            before = server_written_bytes(port)
+            latencies = []
+            errors = [0]
+            sequence = itertools.count()
+            lock = threading.Lock()
+            stop_at = time.perf_counter() + duration
+
+            def client():
+                while True:
+                    i = next(sequence)
+                    if i >= max_requests or (i >= MIN_REQUESTS and time.perf_counter() >= stop_at):
+                        return
+                    data, content_type = body(i) if body else (None, None)
+                    t = time.perf_counter()
+                    try:
+                        status, _ = http_request(port, method, path, data, content_type)
+                        failed = status >= 400
+                    except OSError:
+                        failed = True
+                    elapsed = time.perf_counter() - t
+                    with lock:
+                        latencies.append(elapsed)
+                        errors[0] += failed
+
+            begin = time.perf_counter()
+            workers = [threading.Thread(target=client) for _ in range(clients)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            result = summarize(latencies, time.perf_counter() - begin, errors[0])
+            result['bytes_written'] = server_written_bytes(port) - before
+            result['bytes_per_request'] = result['bytes_written'] // max(1, result['requests'])
+            result['peak_rss_mb'] = server_peak_rss_mb(process.pid)
+            results[name] = result
+        return {'startup_seconds': round(startup, 3), 'endpoints': results}
+    finally:
+        process.terminate()
+        process.wait(30)
+
+
+# ---------------------------------------------------------------------------------------
+# 基线
+
+def compare(results, baseline, tolerance):
+    """
+    与基线比较。
+    :return: [(规模, 压测方式, 接口, 指标, 基线值, 当前值)]
+    """
+    regressions = []
+    for size, current in results['results'].items():
+        base = baseline.get('results', {}).get(size)
+        if base is None:
+            continue
+        if base.get('dataset', {}).get('sha1') != current['dataset']['sha1']:
+            print(f"警告: {size} 个书签的数据集与基线不同（参数或生成方式变化），跳过比较")
+            continue
+        for driver in DRIVERS:
+            for name, stats in current.get(driver, {}).get('endpoints', {}).items():
+                base_stats = base.get(driver, {}).get('endpoints', {}).get(name)
+                if not base_stats:
+                    continue
+                for key, higher_is_worse, noise in COMPARED:
+                    old, new = base_stats.get(key), stats.get(key)
+                    if old is None or new is None:
+                        continue
+                    if higher_is_worse:
+                        worse = new > old * (1 + tolerance) and new - old > noise
+                    else:
+                        worse = new < old / (1 + tolerance) and old - new > noise
+                    if worse:
+                        regressions.append((size, driver, name, key, old, new))
+    return regressions
+
+
+def print_results(size, driver, result):
+    print(f"\n[{size} 个书签 / {driver}] 启动并构建索引: {result['startup_seconds']:.2f}s")
+    print(f"  {'接口':<34s}{'请求数':>8s}{'错误':>6s}{'p50 ms':>10s}{'p90 ms':>10s}{'p99 ms':>10s}"
+          f"{'req/s':>10s}{'峰值 RSS MB':>14s}{'写入字节':>14s}")
+    for name, stats in result['endpoints'].items():
+        print(f"  {name:<34s}{stats['requests']:>8d}{stats['errors']:>6d}{stats['p50_ms']:>10.2f}{stats['p90_ms']:>10.2f}"
+              f"{stats['p99_ms']:>10.2f}{stats['throughput_rps']:>10.1f}{stats['peak_rss_mb'] or 0:>14.1f}"
+              f"{stats['bytes_written']:>14d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='书签服务的整体压测（生成数据集、测试客户端和 HTTP 压测、基线比较）')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000],
+                        help='每个页面的书签数，可以加上 1000000')
+    parser.add_argument('--pages', type=int, default=3, help='页面数（configs/other/bookmarks/page<N>.yaml）')
+    parser.add_argument('--per-group', type=int, default=50, help='每个分组的书签数')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--drivers', nargs='+', choices=DRIVERS, default=list(DRIVERS))
+    parser.add_argument('--duration', type=float, default=3, help='每个接口的压测时长（秒）')
+    parser.add_argument('--max-requests', type=int, default=2000, help='每个接口最多发送的请求数')
+    parser.add_argument('--clients', type=int, default=4, help='HTTP 压测的并发客户端线程数')
+    parser.add_argument('--threads', type=int, default=8, help='服务的线程数')
+    parser.add_argument('--startup-timeout', type=float, default=1800)
+    parser.add_argument('--workdir', help='数据集目录（默认使用临时目录，结束后删除）')
+    parser.add_argument('--output', help='保存本次结果的 JSON 文件')
+    parser.add_argument('--baseline', help='与这个基线 JSON 比较')
+    parser.add_argument('--save-baseline', help='把本次结果保存为基线 JSON')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='允许的相对退化比例')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--config-dir', help=argparse.SUPPRESS)
+    parser.add_argument('--save-path', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker == 'test-client':
+        print(json.dumps(run_test_client(args.config_dir, args.save_path, args.duration, args.max_requests)))
+        return 0
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='bookmark-bench-')
+    results = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'duration': args.duration,
+            'max_requests': args.max_requests,
+            'clients': args.clients,
+            'threads': args.threads,
+        },
+        'results': {},
+    }
+    try:
+        for size in args.sizes:
+            root = os.path.join(workdir, str(size))
+            shutil.rmtree(root, ignore_errors=True)
+            dataset = generate_dataset(os.path.join(root, 'dataset'), size, args.pages, args.per_group, args.seed)
+            print(f"\n生成数据集: {size} 个书签 x {args.pages} 页，{dataset['bytes'] / 1e6:.1f} MB，{dataset['seconds']:.1f}s")
+            entry = results['results'][str(size)] = {'dataset': dataset}
+            save_path = os.path.join(root, 'dataset', 'save.json')
+            for driver in args.drivers:
+                # 写接口会修改数据，每种压测方式使用数据集的一份副本
+                config_dir = os.path.join(root, driver, 'configs')
+                shutil.copytree(os.path.join(root, 'dataset', 'configs'), config_dir)
+                if driver == 'test-client':
+                    output = subprocess.run(
+                        [sys.executable, os.path.abspath(__file__), '--worker', 'test-client',
+                         '--config-dir', config_dir, '--save-path', save_path,
+                         '--duration', str(args.duration), '--max-requests', str(args.max_requests)],
+                        env=service_env(config_dir), check=True, capture_output=True, text=True).stdout
+                    result = json.loads(output.strip().splitlines()[-1])
+                else:
+                    result = run_http(config_dir, save_path, args.duration, args.max_requests, args.clients,
+                                      args.threads, args.startup_timeout)
+                entry[driver] = result
+                print_results(size, driver, result)
+                shutil.rmtree(os.path.join(root, driver), ignore_errors=True)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+            print(f"\n结果已保存: {path}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n与基线 {args.baseline} 相比，以下指标退化超过 {args.tolerance:.0%}:")
+            for size, driver, name, key, old, new in regressions:
+                print(f"  [{size} / {driver}] {name} {key}: {old} -> {new}")
+            return 1
+        print(f"\n与基线 {args.baseline} 相比没有退化（容差 {args.tolerance:.0%}）")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
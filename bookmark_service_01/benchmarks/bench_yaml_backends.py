@@ -0,0 +1,78 @@
+# bench_yaml_backends.py
+# 比较 YAML 序列化后端：纯 Python 的 SafeLoader/SafeDumper、libyaml 的 CSafeLoader/CSafeDumper，
+# 以及 yaml_io 的二进制快照（.<文件名>.snapshot）。
+#
+# 用法（在 bookmark_service_01 目录下）：
+#   python benchmarks/bench_yaml_backends.py --entries 50000
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import yaml_io  # noqa: E402
+
+
+def synthetic_bookmarks(entries, per_group=100):
+    """
+    生成 homepage 格式的书签数据。
+    """
+    groups = []
+    for g in range((entries + per_group - 1) // per_group):
+        services = []
+        for s in range(min(per_group, entries - g * per_group)):
+            services.append({f"服务-{g}-{s}": [{'abbr': f"S{s}", 'href': f"https://host{g}.example.com/path/{s}"}]})
+        groups.append({f"分组-{g}": services})
+    return groups
+
+
+def best_of(repeat, fn):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="YAML 后端性能对比")
+    parser.add_argument('--entries', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    data = synthetic_bookmarks(args.entries)
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'bookmarks.yaml')
+        yaml_io.dump_file(path, data, snapshot=True)
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        print(f"entries={args.entries} yaml_bytes={len(text)} "
+              f"snapshot_bytes={os.path.getsize(yaml_io.snapshot_path_for(path))} libyaml={yaml_io.LIBYAML}")
+
+        rows = [
+            ('load  SafeLoader (pure)', lambda: yaml.load(text, Loader=yaml.SafeLoader)),
+            ('dump  SafeDumper (pure)', lambda: yaml.dump(data, Dumper=yaml.SafeDumper, allow_unicode=True)),
+        ]
+        if yaml_io.LIBYAML:
+            rows += [
+                ('load  CSafeLoader', lambda: yaml.load(text, Loader=yaml.CSafeLoader)),
+                ('dump  CSafeDumper', lambda: yaml.dump(data, Dumper=yaml.CSafeDumper, allow_unicode=True)),
+            ]
+        rows.append(('load  snapshot (pickle)', lambda: yaml_io.load_snapshot(path)))
+
+        baseline = None
+        for name, fn in rows:
+            elapsed = best_of(args.repeat, fn)
+            if baseline is None:
+                baseline = elapsed
+            print(f"{name:<26} {elapsed * 1000:10.1f} ms  {baseline / elapsed:6.1f}x vs pure load")
+
+
+if __name__ == '__main__':
+    main()
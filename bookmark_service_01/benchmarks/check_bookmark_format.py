@@ -0,0 +1,111 @@
+# check_bookmark_format.py
+# 书签文件的原样往返检查：合法的书签文件经过 BookmarkModel 加载、再由存储后端（yaml、sqlite）写回后内容不变；
+# 模型无法原样表示的文件（重复的分组、同一分组中重复的服务、不是字典或有多个键的条目）拒绝加载，
+# 并且之后的写入不会改动原文件。
+#
+# 用法（在 bookmark_service_01 目录下）：
+#   python benchmarks/check_bookmark_format.py
+import os
+import sys
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import yaml_io  # noqa: E402
+from bookmark_model import BookmarkModel, BookmarkFormatError, Service  # noqa: E402
+from bookmark_backend import YamlBackend, SqliteBackend  # noqa: E402
+from bookmark_journal import BookmarkJournal, put_op  # noqa: E402
+from bookmark_store import BookmarkStore  # noqa: E402
+
+# 合法的书签文件：多个属性字典、额外的字段、非 ASCII 字符、需要引号的值、空分组
+VALID = '''\
+- 开发:
+  - GitHub:
+    - abbr: GH
+      href: https://github.com
+      description: "代码托管: git"
+  - Docs:
+    - abbr: ''
+      href: https://docs.example.com/?q=a&b=c
+    - icon: docs.png
+- Empty: []
+- 媒体:
+  - "Video: 1":
+    - abbr: V1
+      href: http://127.0.0.1:8080/#/watch
+'''
+
+# 模型无法原样表示的文件
+INVALID = {
+    'duplicate group': '- A:\n  - x:\n    - href: https://a\n- A:\n  - y:\n    - href: https://b\n',
+    'duplicate service': '- A:\n  - x:\n    - href: https://a\n  - x:\n    - href: https://b\n',
+    'non-dict group': '- A:\n  - x:\n    - href: https://a\n- just a string\n',
+    'non-dict service': '- A:\n  - x:\n    - href: https://a\n  - 42\n',
+    'multi-key group': '- A:\n  - x:\n    - href: https://a\n  B:\n  - y:\n    - href: https://b\n',
+    'multi-key service': '- A:\n  - x:\n    - href: https://a\n    y:\n    - href: https://b\n',
+    'services not a list': '- A:\n    x: https://a\n',
+}
+
+
+def check_round_trip(workdir):
+    """
+    合法的书签文件：加载后 to_list() 与原数据相同，yaml 和 sqlite 后端写回后重新读取仍然相同。
+    """
+    path = os.path.join(workdir, 'bookmarks.yaml')
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(VALID)
+    data = yaml_io.load_file(path)
+
+    yaml_backend = YamlBackend(path, BookmarkJournal(os.path.join(workdir, '.bookmarks.yaml.journal')))
+    model = yaml_backend.load()
+    assert model.to_list() == data, model.to_list()
+    yaml_backend.write(model)
+    assert yaml_io.load_file(path) == data, "yaml 后端写回后内容改变"
+
+    sqlite_backend = SqliteBackend(os.path.join(workdir, 'bookmarks.db'), path)
+    sqlite_backend.write(model)
+    assert sqlite_backend.load().to_list() == data, "sqlite 后端读回的内容改变"
+    print(f"往返: {len(model)} 个分组，{model.service_count()} 个服务，yaml 和 sqlite 后端写回后内容不变")
+
+
+def check_rejected(workdir):
+    """
+    无法原样表示的文件：拒绝加载（BookmarkFormatError），写入失败，文件保持原样。
+    """
+    for name, text in INVALID.items():
+        case_dir = os.path.join(workdir, name.replace(' ', '-'))
+        os.makedirs(case_dir)
+        path = os.path.join(case_dir, 'bookmarks.yaml')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        try:
+            BookmarkModel.from_list(yaml_io.load_file(path))
+        except BookmarkFormatError as e:
+            message = str(e)
+        else:
+            raise AssertionError(f"{name}: 应当拒绝加载")
+
+        store = BookmarkStore(path, BookmarkJournal(os.path.join(case_dir, '.bookmarks.yaml.journal')),
+                              compact_interval=0)
+        try:
+            store.apply([put_op('A', Service.create('z', 'Z', 'https://z'))])
+        except BookmarkFormatError:
+            pass
+        else:
+            raise AssertionError(f"{name}: 写入应当失败")
+        with open(path, encoding='utf-8') as file:
+            assert file.read() == text, f"{name}: 文件被改动"
+        print(f"拒绝: {name:<20s}{message}")
+
+
+def main():
+    argparse.ArgumentParser(description='书签文件的原样往返检查').parse_args()
+    with tempfile.TemporaryDirectory() as workdir:
+        check_round_trip(workdir)
+        check_rejected(workdir)
+    print("全部检查通过")
+
+
+if __name__ == '__main__':
+    main()
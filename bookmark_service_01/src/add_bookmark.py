@@ -1,37 +1,62 @@
-import yaml
 import logging
 from config import BOOKMARK_CONFIG_PATH
+from bookmark_store import bookmark_store
+from bookmark_model import Service, BookmarkFormatError
+from metrics import timed
+from bookmark_journal import put_op, delete_op, add_group_op, delete_group_op, move_op, rename_group_op, reorder_op
 
 # 设置日志记录器
 logger = logging.getLogger(__name__)
 
+@timed('load_bookmarks')
 def load_bookmarks():
     """
-    从配置文件中加载书签数据。
+    从配置文件中加载书签数据（可修改的副本）。
+    文件未修改时直接使用内存中的缓存，不会重新解析。
     :return: 书签数据
     """
-    logger.debug(f"加载书签配置文件: {BOOKMARK_CONFIG_PATH}")
+    logger.debug("加载书签配置文件: %s", BOOKMARK_CONFIG_PATH)
     try:
-        with open(BOOKMARK_CONFIG_PATH, 'r', encoding='utf-8') as file:
-            bookmarks = yaml.safe_load(file) or []
-            logger.info(f"成功加载 {len(bookmarks)} 个书签分组")
-            return bookmarks
-    except FileNotFoundError:
-        logger.warning(f"配置文件不存在: {BOOKMARK_CONFIG_PATH}，返回空列表")
+        bookmarks = bookmark_store.load()
+        logger.info("成功加载 %s 个书签分组", len(bookmarks))
+        return bookmarks
+    except Exception as e:
+        logger.error("加载书签配置失败: %s", str(e), exc_info=True)
         return []
+
+def get_bookmarks_snapshot():
+    """
+    获取书签数据的只读快照，供只读的 API 使用，避免复制数据。
+    :return: 只读的书签数据
+    """
+    try:
+        return bookmark_store.snapshot()
     except Exception as e:
-        logger.error(f"加载书签配置失败: {str(e)}", exc_info=True)
+        logger.error("加载书签配置失败: %s", str(e), exc_info=True)
         return []
 
+def get_bookmarks_version():
+    """
+    获取书签数据的当前版本号，数据不变时版本号不变。
+    :return: 版本号
+    """
+    return bookmark_store.current_version()
+
+def get_bookmarks_cache_stats():
+    """
+    获取书签缓存的命中统计。
+    :return: 统计信息字典
+    """
+    return bookmark_store.stats()
+
 def get_bookmarks_groups():
     """
     获取书签分组。
     :return: 书签分组列表
     """
     logger.debug("获取所有书签分组")
-    bookmarks = load_bookmarks()
-    groups = [list(group.keys())[0] for group in bookmarks]
-    logger.info(f"找到 {len(groups)} 个书签分组")
+    groups = bookmark_store.model().group_names()
+    logger.info("找到 %s 个书签分组", len(groups))
     return groups
 
 def get_bookmarks_services(group_name):
@@ -40,14 +65,13 @@ def get_bookmarks_services(group_name):
     :param group_name: 分组名
     :return: 分组下的书签服务列表
     """
-    logger.debug(f"获取分组 '{group_name}' 下的所有服务")
-    bookmarks = load_bookmarks()
-    for group in bookmarks:
-        if list(group.keys())[0] == group_name:
-            services = [list(service.keys())[0] for service in group[group_name]]
-            logger.info(f"分组 '{group_name}' 下有 {len(services)} 个服务")
-            return services
-    logger.warning(f"未找到分组: {group_name}")
+    logger.debug("获取分组 '%s' 下的所有服务", group_name)
+    group = bookmark_store.model().group(group_name)
+    if group is not None:
+        services = group.service_names()
+        logger.info("分组 '%s' 下有 %s 个服务", group_name, len(services))
+        return services
+    logger.warning("未找到分组: %s", group_name)
     return []
 
 def get_bookmarks_service(group_name, service_name):
@@ -57,104 +81,178 @@ def get_bookmarks_service(group_name, service_name):
     :param service_name: 服务名
     :return: 书签服务信息
     """
-    logger.debug(f"获取分组 '{group_name}' 下的服务 '{service_name}'")
-    bookmarks = load_bookmarks()
-    for group in bookmarks:
-        if list(group.keys())[0] == group_name:
-            for service in group[group_name]:
-                if list(service.keys())[0] == service_name:
-                    logger.info(f"成功找到服务: {service_name}")
-                    return service[service_name][0]
-    logger.warning(f"未找到服务: {service_name} 在分组 {group_name} 中")
+    logger.debug("获取分组 '%s' 下的服务 '%s'", group_name, service_name)
+    service = bookmark_store.model().service(group_name, service_name)
+    if service is not None and service.info is not None:
+        logger.info("成功找到服务: %s", service_name)
+        return dict(service.info)
+    logger.warning("未找到服务: %s 在分组 %s 中", service_name, group_name)
     return None
 
+@timed('save_bookmarks')
 def save_bookmarks(bookmarks):
     """
     将书签数据保存到配置文件中。
     :param bookmarks: 书签数据
+    :raise BookmarkFormatError: 书签数据无法原样保存（例如有重复的分组或服务）
     """
-    logger.debug(f"保存书签配置到: {BOOKMARK_CONFIG_PATH}")
+    logger.debug("保存书签配置到: %s", BOOKMARK_CONFIG_PATH)
     try:
-        with open(BOOKMARK_CONFIG_PATH, 'w', encoding='utf-8') as file:
-            yaml.dump(bookmarks, file, allow_unicode=True)
-        logger.info(f"成功保存 {len(bookmarks)} 个书签分组到配置文件")
+        bookmark_store.save(bookmarks)
+        logger.info("成功保存 %s 个书签分组到配置文件", len(bookmarks))
         return True
+    except BookmarkFormatError:
+        raise
     except Exception as e:
-        logger.error(f"保存书签配置失败: {str(e)}", exc_info=True)
+        logger.error("保存书签配置失败: %s", str(e), exc_info=True)
         return False
 
+@timed('add_bookmark')
 def add_bookmark(group_name, service_name, abbr=None, url=None):
     """
-    添加新的书签。
+    添加新的书签，同名书签会被覆盖。
     :param group_name: 分组名
     :param service_name: 书签名
     :param abbr: 缩写名
     :param url: 链接名
     """
-    logger.info(f"添加新书签: {service_name} 到分组 {group_name}")
-    logger.debug(f"书签详情: abbr={abbr}, url={url}")
-    
-    bookmarks = load_bookmarks()
-    group_found = False
-    
-    # 检查是否已存在相同名称的书签
-    for group in bookmarks:
-        if list(group.keys())[0] == group_name:
-            group_found = True
-            # 检查是否已存在相同名称的服务
-            for service in group[group_name]:
-                if list(service.keys())[0] == service_name:
-                    logger.warning(f"书签已存在: {service_name}，将被覆盖")
-                    # 移除现有服务
-                    group[group_name].remove(service)
-                    break
-            
-            # 添加新服务
-            service = {
-                service_name: [
-                    {
-                        'abbr': abbr if abbr else '',
-                        'href': url if url else ''
-                    }
-                ]
-            }
-            group[group_name].append(service)
-            logger.info(f"成功添加书签: {service_name} 到现有分组 {group_name}")
-            break
-    
-    if not group_found:
-        # 创建新分组并添加服务
-        new_group = {
-            group_name: [
-                {
-                    service_name: [
-                        {
-                            'abbr': abbr if abbr else '',
-                            'href': url if url else ''
-                        }
-                    ]
-                }
-            ]
-        }
-        bookmarks.append(new_group)
-        logger.info(f"成功添加书签: {service_name} 到新分组 {group_name}")
-    
-    return save_bookmarks(bookmarks)
+    logger.info("添加新书签: %s 到分组 %s", service_name, group_name)
+    logger.debug("书签详情: abbr=%s, url=%s", abbr, url)
+
+    try:
+        service = Service.create(service_name, abbr, url)
+        [(created, replaced)] = bookmark_store.apply([put_op(group_name, service)])
+        if replaced:
+            logger.warning("书签已存在: %s，已被覆盖", service_name)
+        if created:
+            logger.info("成功添加书签: %s 到新分组 %s", service_name, group_name)
+        else:
+            logger.info("成功添加书签: %s 到现有分组 %s", service_name, group_name)
+        return True
+    except Exception as e:
+        logger.error("保存书签配置失败: %s", str(e), exc_info=True)
+        return False
 
 def add_bookmark_groups(group_name):
     """
     添加新的书签分组。
     :param group_name: 分组名
     """
-    logger.info(f"添加新书签分组: {group_name}")
-    bookmarks = load_bookmarks()
-    group_exists = any(list(group.keys())[0] == group_name for group in bookmarks)
-    
-    if group_exists:
-        logger.warning(f"分组已存在: {group_name}，不执行操作")
+    logger.info("添加新书签分组: %s", group_name)
+    if bookmark_store.model().group(group_name) is not None:
+        logger.warning("分组已存在: %s，不执行操作", group_name)
         return False
-    else:
-        new_group = {group_name: []}
-        bookmarks.append(new_group)
-        logger.info(f"成功添加新分组: {group_name}")
-        return save_bookmarks(bookmarks)
+
+    try:
+        [added] = bookmark_store.apply([add_group_op(group_name)])
+        if not added:
+            logger.warning("分组已存在: %s，不执行操作", group_name)
+            return False
+        logger.info("成功添加新分组: %s", group_name)
+        return True
+    except Exception as e:
+        logger.error("保存书签配置失败: %s", str(e), exc_info=True)
+        return False
+
+def add_bookmarks(records):
+    """
+    批量添加书签：一次性合并到书签模型中，只刷盘一次。
+    同名书签的覆盖规则与 add_bookmark 相同，同一批中后出现的记录覆盖先出现的记录。
+    :param records: [{group_name, service_name, abbr, url}]
+    :return: 每条记录的处理结果列表 [{index, status, ...}]，status 为 added / replaced / error
+    """
+    logger.info("批量添加书签: %s 条", len(records))
+    results = [None] * len(records)
+    ops = []
+    positions = []
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            results[index] = {'index': index, 'status': 'error', 'error': 'Invalid record'}
+            continue
+        group_name = record.get('group_name')
+        service_name = record.get('service_name')
+        url = record.get('url')
+        if not (group_name and service_name and url):
+            results[index] = {'index': index, 'status': 'error', 'error': 'Missing required fields'}
+            continue
+        ops.append(put_op(group_name, Service.create(service_name, record.get('abbr'), url)))
+        positions.append(index)
+
+    if ops:
+        for index, (created, replaced) in zip(positions, bookmark_store.apply(ops, batch=True)):
+            results[index] = {
+                'index': index,
+                'status': 'replaced' if replaced else 'added',
+                'group_name': records[index]['group_name'],
+                'service_name': records[index]['service_name'],
+            }
+    logger.info("批量添加书签完成: 成功 %s 条，失败 %s 条", len(ops), len(records) - len(ops))
+    return results
+
+def _name(record, key, required=True):
+    """
+    读取操作中的分组名或服务名。
+    """
+    value = record.get(key)
+    if value is None and not required:
+        return None
+    if not isinstance(value, (str, int, float)) or isinstance(value, bool) or value == '':
+        raise ValueError(f"字段 {key} 必须是非空的名称")
+    return value
+
+def patch_op(record):
+    """
+    把 PATCH 请求中的一条操作转换为写前日志的操作。
+    :param record: {op: put / delete / add_group / delete_group / move / rename_group / reorder, ...}
+    :return: bookmark_journal 中定义的操作
+    :raise ValueError: 操作格式不正确
+    """
+    if not isinstance(record, dict):
+        raise ValueError("操作必须是对象")
+    kind = record.get('op')
+    if kind == 'put':
+        url = record.get('url')
+        if not url:
+            raise ValueError("字段 url 不能为空")
+        return put_op(_name(record, 'group'), Service.create(_name(record, 'service'), record.get('abbr'), url))
+    if kind == 'delete':
+        return delete_op(_name(record, 'group'), _name(record, 'service'))
+    if kind == 'add_group':
+        return add_group_op(_name(record, 'group'))
+    if kind == 'delete_group':
+        return delete_group_op(_name(record, 'group'))
+    if kind == 'move':
+        index = record.get('index')
+        if index is not None and (not isinstance(index, int) or isinstance(index, bool) or index < 0):
+            raise ValueError("字段 index 必须是非负整数")
+        group_name = _name(record, 'group')
+        to_group = _name(record, 'to_group', required=False)
+        return move_op(group_name, _name(record, 'service'), group_name if to_group is None else to_group, index)
+    if kind == 'rename_group':
+        return rename_group_op(_name(record, 'group'), _name(record, 'name'))
+    if kind == 'reorder':
+        order = record.get('order')
+        if not isinstance(order, list):
+            raise ValueError("字段 order 必须是名称列表")
+        return reorder_op(order, _name(record, 'group', required=False))
+    raise ValueError(f"不支持的操作: {kind}")
+
+@timed('patch_bookmarks')
+def patch_bookmarks(records, precondition=None):
+    """
+    增量修改书签：在一次事务中应用一组操作，只追加到写前日志，不重写书签文件。
+    任何一条操作失败时整组都不会生效。
+    :param records: 操作列表，格式见 patch_op
+    :param precondition: 传给 BookmarkStore.apply，用于检查客户端的版本
+    :return: 每条操作是否修改了书签数据的列表
+    :raise ValueError: 操作格式不正确或无法应用（例如新分组名已存在）
+    :raise KeyError: 操作引用的分组或服务不存在
+    :raise BookmarkConflict: 版本不一致
+    """
+    ops = [patch_op(record) for record in records]
+    logger.info("增量修改书签: %s 条操作", len(ops))
+    if not ops:
+        return []
+    results = bookmark_store.apply(ops, batch=True, precondition=precondition)
+    # put 总是修改数据；move / rename_group 没有修改时返回 None，其余操作返回是否有修改
+    return [op['op'] == 'put' or (result is not None and result is not False) for op, result in zip(ops, results)]
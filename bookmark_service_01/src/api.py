@@ -1,7 +1,21 @@
+import json
 import logging
-from flask import jsonify, request
-from add_bookmark import load_bookmarks, add_bookmark, save_bookmarks
-from config import get_all_filenames, get_yaml_file_content
+from flask import jsonify, request, current_app, Response, render_template
+from add_bookmark import get_bookmarks_groups, get_bookmarks_snapshot, get_bookmarks_version, get_bookmarks_cache_stats, add_bookmark, add_bookmarks, save_bookmarks, patch_bookmarks
+from bookmark_store import BookmarkConflict
+from bookmark_model import BookmarkFormatError
+from config import get_yaml_file_content, get_yaml_file_path, list_config_files, config_files_version, CONFIG_FILES_PAGE_SIZE, CONFIG_FILES_MAX_PAGE_SIZE, BACKGROUND_FETCH, CHANGE_FEED_MODE
+from http_cache import EncodedBody, ResponseCache, cached_response
+from change_feed import stream_events, long_poll
+from async_io import single_flight
+from bookmark_search import search_index
+from api_change_config import bookmark_page_index
+from link_checker import link_checker, annotate_links
+from favicon_cache import favicon_cache
+from yaml_cache import yaml_cache
+from dir_index import dir_index_cache
+from metrics import registry, register_collector
+from yaml_stream import YamlCursor, YamlPathNotFound, read_partial
 
 # 配置日志
 # logging.basicConfig(
@@ -10,6 +24,51 @@ from config import get_all_filenames, get_yaml_file_content
 # )
 logger = logging.getLogger(__name__)
 
+# 编码好的响应体（以及渲染好的页面）缓存，按书签数据版本号或配置目录的文件列表版本号失效
+response_cache = ResponseCache()
+
+def start_background_tasks():
+    """
+    启动后台的链接检查和书签图标、标题的抓取（BACKGROUND_FETCH 关闭时不启动）。
+    由服务的启动入口在每个 worker 进程中调用一次，只导入本模块（例如命令行工具）时不会访问书签链接。
+    """
+    if BACKGROUND_FETCH:
+        link_checker.start()
+        favicon_cache.start()
+
+def bookmarks_body(version):
+    """
+    获取指定版本的书签响应体（已缓存时直接返回），它的 ETag 同时作为 PATCH 的版本令牌。
+    """
+    return response_cache.get('bookmarks', version, lambda: EncodedBody(
+        current_app.json.dumps(get_bookmarks_snapshot()) + '\n', current_app.json.mimetype))
+
+def read_annotation_args():
+    """
+    读取书签数据的附加信息参数：links=1 附加链接检查结果，meta=1 附加 id、网页标题和图标路径。
+    :return: (links, meta)
+    """
+    return bool(request.args.get('links')), bool(request.args.get('meta'))
+
+def build_annotated_body(version, links, meta, dumps, mimetype):
+    """
+    获取附加了链接检查结果或图标、标题的书签响应体，书签数据或附加信息变化时重新生成。
+    不使用 current_app，可以在线程池中执行。
+    """
+    results = link_checker.results() if links else None
+    key = ('bookmarks_annotated', links, meta)
+    versions = (version, link_checker.version if links else None, favicon_cache.version if meta else None)
+
+    def build():
+        bookmarks = get_bookmarks_snapshot()
+        if links:
+            bookmarks = annotate_links(bookmarks, results)
+        if meta:
+            bookmarks = favicon_cache.annotate(bookmarks)
+        return EncodedBody(dumps(bookmarks) + '\n', mimetype)
+
+    return response_cache.get(key, versions, build)
+
 def api_get_bookmarks():
     """
     处理获取书签的分组API请求。
@@ -18,13 +77,232 @@ def api_get_bookmarks():
     logger.info("收到获取书签列表的请求")
     
     try:
-        bookmarks = load_bookmarks()
-        logger.info(f"成功加载 {len(bookmarks)} 个书签分组")
-        return jsonify(bookmarks)
+        # 数据未变化时直接复用编码和压缩好的响应体，If-None-Match 匹配时返回 304
+        links, meta = read_annotation_args()
+        if links or meta:
+            return cached_response(build_annotated_body(get_bookmarks_version(), links, meta,
+                                                        current_app.json.dumps, current_app.json.mimetype))
+        return cached_response(bookmarks_body(get_bookmarks_version()))
     except Exception as e:
-        logger.error(f"获取书签列表失败: {str(e)}", exc_info=True)
+        logger.error("获取书签列表失败: %s", str(e), exc_info=True)
         return jsonify({'error': 'Failed to load bookmarks', 'details': str(e)}), 500
 
+def api_render_index():
+    """
+    渲染添加书签的页面。渲染和压缩好的 HTML 按书签数据版本号缓存，
+    任何修改书签的操作（添加、批量添加、PATCH、保存、翻页、其他进程的修改）都会增加版本号，下一次请求时重新渲染。
+    :return: HTML 响应，If-None-Match 匹配时返回 304
+    """
+    def build():
+        groups = get_bookmarks_groups()
+        logger.info("渲染添加书签的页面，共 %d 个分组", len(groups))
+        return EncodedBody(render_template('add_bookmark.html', groups=groups), 'text/html')
+
+    # 模板中的 url_for 与应用的挂载路径有关
+    key = ('page', 'index', request.script_root)
+    return cached_response(response_cache.get(key, get_bookmarks_version(), build))
+
+def api_render_config():
+    """
+    渲染配置管理页面（只渲染第一页的文件名）。渲染和压缩好的 HTML 按配置目录的文件列表版本号缓存，
+    文件被创建、删除或改名时重新渲染。
+    :return: HTML 响应，If-None-Match 匹配时返回 304
+    """
+    def build():
+        listing = list_config_files()
+        files = [entry['name'] for entry in listing['files']]
+        logger.info("渲染配置管理页面，共 %d 个配置文件", listing['total'])
+        return EncodedBody(render_template('config.html', files=files), 'text/html')
+
+    key = ('page', 'config', request.script_root)
+    return cached_response(response_cache.get(key, config_files_version(), build))
+
+def collect_cache_metrics():
+    """
+    抓取 /metrics 时读取各个缓存自己的统计。
+    :return: [(名称, 类型, 说明, [(标签字典, 数值)])]
+    """
+    caches = {
+        'bookmark_store': get_bookmarks_cache_stats(),
+        'response': {'hits': response_cache.hits, 'misses': response_cache.misses},
+        'yaml_document': yaml_cache.stats(),
+        'favicon': favicon_cache.stats(),
+    }
+    hits, misses, ratios, entries, cache_bytes = [], [], [], [], []
+    for name, stats in caches.items():
+        labels = {'cache': name}
+        hits.append((labels, stats.get('hits')))
+        misses.append((labels, stats.get('misses')))
+        total = (stats.get('hits') or 0) + (stats.get('misses') or 0)
+        ratios.append((labels, round(stats['hits'] / total, 4) if total else None))
+        entries.append((labels, stats.get('entries')))
+        cache_bytes.append((labels, stats.get('bytes')))
+    io = single_flight.stats()
+    search = search_index.stats()
+    links = link_checker.stats()
+    return [
+        ('bookmark_cache_hits_total', 'counter', '缓存命中次数', hits),
+        ('bookmark_cache_misses_total', 'counter', '缓存未命中次数', misses),
+        ('bookmark_cache_hit_ratio', 'gauge', '缓存命中率', ratios),
+        ('bookmark_cache_entries', 'gauge', '缓存项数', entries),
+        ('bookmark_cache_bytes', 'gauge', '缓存占用的字节数（估算）', cache_bytes),
+        ('bookmark_cache_evictions_total', 'counter', '缓存淘汰次数',
+         [({'cache': 'yaml_document'}, yaml_cache.stats()['evictions']), ({'cache': 'favicon'}, caches['favicon']['evictions'])]),
+        ('bookmark_journal_pending_ops', 'gauge', '尚未合并到书签配置文件的写前日志操作数',
+         [({}, caches['bookmark_store']['journal_pending'])]),
+        ('bookmark_store_reloads_total', 'counter', '书签配置文件被重新解析的次数', [({}, caches['bookmark_store']['reloads'])]),
+        ('bookmark_io_calls_total', 'counter', '异步模式下的文件读取次数（coalesced 为合并掉的并发读取）',
+         [({'result': 'executed'}, io['io_executed']), ({'result': 'coalesced'}, io['io_coalesced'])]),
+        ('bookmark_search_documents', 'gauge', '搜索索引中的书签数', [({}, search['documents'])]),
+        ('bookmark_directory_scans_total', 'counter', '配置目录被重新扫描的次数', [({}, dir_index_cache.stats()['scans'])]),
+        ('bookmark_links_broken', 'gauge', '检查结果为失效的链接数', [({}, links['broken'])]),
+    ]
+
+register_collector(collect_cache_metrics)
+
+def api_get_metrics():
+    """
+    处理获取运行指标的API请求（Prometheus 文本格式）。
+    :return: 指标文本
+    """
+    return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8',
+                    headers={'Cache-Control': 'no-store'})
+
+def api_get_bookmarks_cache_stats():
+    """
+    处理获取书签缓存命中统计的API请求。
+    :return: 缓存统计的JSON响应
+    """
+    logger.info("收到获取书签缓存统计的请求")
+    stats = get_bookmarks_cache_stats()
+    stats['response_hits'] = response_cache.hits
+    stats['response_misses'] = response_cache.misses
+    stats.update(single_flight.stats())
+    stats['search_index'] = search_index.stats()
+    stats['page_index'] = bookmark_page_index.stats()
+    stats['link_checker'] = link_checker.stats()
+    stats['favicon_cache'] = favicon_cache.stats()
+    return jsonify({'stats': stats, 'code': 200})
+
+def api_search_bookmarks():
+    """
+    处理搜索书签的API请求：q 为查询字符串（空格分隔的多个词需要同时匹配），limit 为最多返回的结果数。
+    :return: 按得分排序的搜索结果的JSON响应
+    """
+    query = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    logger.info("收到搜索书签的请求: %s", query)
+
+    try:
+        result = search_index.search(query, limit)
+        return jsonify({**result, 'query': query, 'limit': limit, 'code': 200})
+    except Exception as e:
+        logger.error("搜索书签失败: %s", str(e), exc_info=True)
+        return jsonify({'error': 'Failed to search bookmarks', 'details': str(e)}), 500
+
+def api_locate_bookmark():
+    """
+    处理查找书签所在页面的API请求：service 为服务名（不区分大小写），url 为链接，至少指定一个。
+    :return: 包含书签的页面（file 可以作为翻页接口的 to 参数）的JSON响应
+    """
+    service = request.args.get('service', '').strip()
+    url = request.args.get('url', '').strip()
+    if not service and not url:
+        return jsonify({'error': 'service or url is required'}), 400
+    logger.info("收到查找书签所在页面的请求: %s %s", service, url)
+
+    try:
+        results = bookmark_page_index.lookup(service or None, url or None)
+        return jsonify({'results': results, 'total': len(results), 'code': 200})
+    except Exception as e:
+        logger.error("查找书签所在页面失败: %s", str(e), exc_info=True)
+        return jsonify({'error': 'Failed to locate bookmark', 'details': str(e)}), 500
+
+def api_get_bookmark_links():
+    """
+    处理获取书签链接检查结果的API请求，broken=1 时只返回失效的链接。
+    :return: 检查结果的JSON响应
+    """
+    broken = request.args.get('broken', '').lower() in ('1', 'true', 'yes')
+    logger.info("收到获取书签链接检查结果的请求")
+
+    try:
+        results = [{'url': url, **result} for url, result in sorted(link_checker.results().items())
+                   if not broken or not result.get('ok')]
+        return jsonify({'results': results, 'total': len(results), 'stats': link_checker.stats(), 'code': 200})
+    except Exception as e:
+        logger.error("获取书签链接检查结果失败: %s", str(e), exc_info=True)
+        return jsonify({'error': 'Failed to load link check results', 'details': str(e)}), 500
+
+def api_scan_bookmark_links():
+    """
+    处理立即检查书签链接的API请求（在后台执行），force=1 时忽略有效期重新检查全部链接。
+    :return: 202 和检查器状态的JSON响应
+    """
+    force = request.args.get('force', '').lower() in ('1', 'true', 'yes')
+    logger.info("收到检查书签链接的请求, force=%s", force)
+
+    try:
+        link_checker.trigger(force)
+        return jsonify({'message': 'Link check scheduled', 'code': 202, 'stats': link_checker.stats()}), 202
+    except Exception as e:
+        logger.error("检查书签链接失败: %s", str(e), exc_info=True)
+        return jsonify({'error': 'Failed to schedule link check', 'details': str(e)}), 500
+
+def api_get_bookmark_icon(id):
+    """
+    处理获取书签图标的API请求。图标按内容寻址，ETag 为图标内容的哈希，客户端可以长时间缓存。
+    :param id: 书签 id（链接的哈希，见 meta=1 时书签数据中的 id）
+    :return: 图标，书签不存在或图标还没有抓取到时返回 404
+    """
+    logger.info("收到获取书签图标的请求: %s", id)
+
+    try:
+        icon = favicon_cache.icon(id)
+        if icon is None:
+            return jsonify({'error': 'Bookmark not found'}), 404
+        digest, content_type, body = icon
+        if digest is None:
+            # 已在后台排队抓取
+            response = jsonify({'error': 'Icon not available yet'})
+            response.status_code = 404
+            response.headers['Retry-After'] = '60'
+            return response
+        if request.if_none_match.contains(digest):
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype=content_type)
+        response.set_etag(digest)
+        response.headers['Cache-Control'] = f'public, max-age={int(favicon_cache.ttl)}'
+        # 图标来自外部站点，SVG 图标中可能带有脚本：禁止执行脚本和加载外部资源，并禁止浏览器猜测内容类型
+        response.headers['Content-Security-Policy'] = "default-src 'none'; style-src 'unsafe-inline'; sandbox"
+        response.headers['X-Content-Type-Options'] = 'nosniff'
+        return response
+    except Exception as e:
+        logger.error("获取书签图标失败: %s", str(e), exc_info=True)
+        return jsonify({'error': 'Failed to load icon', 'details': str(e)}), 500
+
+def api_get_bookmark_events():
+    """
+    处理书签变更推送的API请求。
+    mode=sse 返回 server-sent events 流（连接期间一直占用一个 worker 线程）；mode=poll 时为长轮询，返回 JSON。
+    没有指定 mode 时使用 CHANGE_FEED_MODE（多进程部署时默认为长轮询）。
+    通过 Last-Event-ID 请求头或 since 参数从指定事件之后续传，事件 id 在所有 worker 之间通用。
+    :return: 事件流或长轮询的JSON响应
+    """
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('since')
+    logger.info("收到书签变更推送的请求，起始事件: %s", last_id)
+
+    if request.args.get('mode', CHANGE_FEED_MODE) == 'poll':
+        timeout = min(max(request.args.get('timeout', 30, type=float), 0), 60)
+        return jsonify({**long_poll(last_id, timeout), 'code': 200})
+
+    response = Response(stream_events(last_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # 关闭反向代理（nginx）的缓冲，事件才能立即送达
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 def api_add_bookmark():
     """
     处理添加书签的 API 请求。
@@ -34,7 +312,7 @@ def api_add_bookmark():
     
     try:
         data = request.get_json()
-        logger.debug(f"请求数据: {data}")
+        logger.debug("请求数据: %s", data)
         
         group_name = data.get('group_name')
         service_name = data.get('service_name')
@@ -43,15 +321,58 @@ def api_add_bookmark():
         
         if group_name and service_name and url:
             add_bookmark(group_name, service_name, abbr, url)
-            logger.info(f"成功添加书签: {service_name} 到分组 {group_name}")
+            logger.info("成功添加书签: %s 到分组 %s", service_name, group_name)
             return jsonify({'message': 'Bookmark added successfully', 'code': 200})
         else:
             logger.warning("添加书签失败: 缺少必要字段")
             return jsonify({'error': 'Missing required fields'}), 400
     except Exception as e:
-        logger.error(f"添加书签时发生错误: {str(e)}", exc_info=True)
+        logger.error("添加书签时发生错误: %s", str(e), exc_info=True)
         return jsonify({'error': 'Failed to add bookmark', 'details': str(e)}), 500
 
+def read_batch_records():
+    """
+    读取批量请求中的记录，支持 JSON 数组和 NDJSON（每行一个 JSON 对象）。
+    NDJSON 中无法解析的行会作为 None 保留位置，以便返回逐条的处理结果。
+    :return: 记录列表，请求体格式错误时返回 None
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl', 'application/ndjson'):
+        records = []
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                records.append(None)
+        return records
+    data = request.get_json(silent=True)
+    return data if isinstance(data, list) else None
+
+def api_add_bookmarks_batch():
+    """
+    处理批量添加书签的 API 请求，所有记录一次合并、一次保存。
+    :return: 逐条处理结果的JSON响应
+    """
+    logger.info("收到批量添加书签的请求")
+    
+    try:
+        records = read_batch_records()
+        if records is None:
+            logger.warning("批量添加书签失败: 请求体不是 JSON 数组或 NDJSON")
+            return jsonify({'error': 'Request body must be a JSON array or NDJSON'}), 400
+        
+        results = add_bookmarks(records)
+        counts = {'added': 0, 'replaced': 0, 'error': 0}
+        for result in results:
+            counts[result['status']] += 1
+        logger.info("批量添加书签完成: %s", counts)
+        return jsonify({'message': 'Batch processed', 'code': 200, **counts, 'results': results})
+    except Exception as e:
+        logger.error("批量添加书签时发生错误: %s", str(e), exc_info=True)
+        return jsonify({'error': 'Failed to add bookmarks', 'details': str(e)}), 500
+
 def api_save_bookmarks():
     """
     处理保存书签的 API 请求。
@@ -61,60 +382,238 @@ def api_save_bookmarks():
     
     try:
         data = request.get_json()
-        logger.debug(f"请求数据: {data}")
+        logger.debug("请求数据: %s", data)
         
         save_bookmarks(data)
         logger.info("成功保存书签配置")
         return jsonify({'message': '书签添加成功！', 'code': 200})
+    except BookmarkFormatError as e:
+        logger.warning("书签数据格式错误，没有保存: %s", str(e))
+        # 路由函数会读取 response.status_code，这里返回响应对象而不是元组
+        response = jsonify({'error': 'Invalid bookmarks', 'details': str(e)})
+        response.status_code = 400
+        return response
     except Exception as e:
-        logger.error(f"保存书签配置失败: {str(e)}", exc_info=True)
+        logger.error("保存书签配置失败: %s", str(e), exc_info=True)
         return jsonify({'error': 'Failed to save bookmarks', 'details': str(e)}), 500
 
+def read_patch_request():
+    """
+    读取 PATCH 请求：请求体为 {"version": ETag, "ops": [...]}，或者操作数组加 If-Match 请求头。
+    :return: (版本令牌列表, 操作列表)，格式不正确时操作列表为 None
+    """
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        ops = data.get('ops')
+        tokens = [data['version']] if data.get('version') else []
+    else:
+        ops = data
+        tokens = []
+    tokens.extend(request.if_match.as_set(include_weak=True))
+    if request.if_match.star_tag:
+        tokens.append('*')
+    return tokens, ops if isinstance(ops, list) else None
+
+def api_patch_bookmarks():
+    """
+    处理增量修改书签的 API 请求：按顺序应用一组操作（移动服务、重命名分组、调整顺序、删除等），
+    只追加到写前日志。版本令牌为 GET /api/bookmarks 返回的 ETag，与当前数据不一致时返回 409。
+    :return: 操作结果和新的版本令牌的JSON响应
+    """
+    logger.info("收到增量修改书签的请求")
+
+    try:
+        if request.mimetype == 'application/json-patch+json':
+            return jsonify({'error': 'JSON Patch is not supported, use the op list format'}), 415
+        tokens, ops = read_patch_request()
+        if ops is None:
+            logger.warning("增量修改书签失败: 请求体中没有操作列表")
+            return jsonify({'error': 'Request body must contain an op list'}), 400
+        if not tokens:
+            logger.warning("增量修改书签失败: 缺少版本令牌")
+            return jsonify({'error': 'A version token (If-Match or version) is required'}), 428
+
+        def matches(version):
+            return '*' in tokens or any(tag in tokens for tag in bookmarks_body(version).etags())
+
+        results = patch_bookmarks(ops, matches)
+        etag = bookmarks_body(get_bookmarks_version()).etag
+        logger.info("增量修改书签完成: %s 条操作", len(results))
+        response = jsonify({'message': 'Bookmarks patched', 'code': 200, 'results': results, 'version': etag})
+        response.set_etag(etag)
+        return response
+    except BookmarkConflict:
+        etag = bookmarks_body(get_bookmarks_version()).etag
+        logger.warning("增量修改书签失败: 版本不一致")
+        response = jsonify({'error': 'Bookmarks have been modified', 'code': 409, 'version': etag})
+        response.set_etag(etag)
+        return response, 409
+    except KeyError as e:
+        logger.warning("增量修改书签失败: %s", e)
+        return jsonify({'error': 'Group or service not found', 'details': str(e.args[0] if e.args else e)}), 404
+    except ValueError as e:
+        logger.warning("增量修改书签失败: %s", e)
+        return jsonify({'error': 'Invalid op', 'details': str(e)}), 400
+    except Exception as e:
+        logger.error("增量修改书签失败: %s", str(e), exc_info=True)
+        return jsonify({'error': 'Failed to patch bookmarks', 'details': str(e)}), 500
+
+
+def read_file_list_args():
+    """
+    读取配置文件列表的分页和过滤参数：glob（通配符，例如 *.yaml）、offset、limit。
+    :return: (pattern, offset, limit)
+    """
+    pattern = request.args.get('glob') or None
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = request.args.get('limit', CONFIG_FILES_PAGE_SIZE, type=int)
+    limit = min(max(limit, 1), CONFIG_FILES_MAX_PAGE_SIZE)
+    return pattern, offset, limit
+
+def file_list_response(listing):
+    """
+    生成配置文件列表的JSON响应，files 为当前页的文件名，entries 为文件名、大小和修改时间。
+    :param listing: list_config_files 的返回值
+    """
+    filenames = [entry['name'] for entry in listing['files']]
+    page = {
+        'entries': listing['files'],
+        'total': listing['total'],
+        'offset': listing['offset'],
+        'limit': listing['limit'],
+        'next_offset': listing['next_offset'],
+    }
+    if not filenames:
+        logger.info("没有找到任何配置文件")
+        return jsonify({'message': '没有找到配置文件。', 'files': [], **page})
+
+    logger.info("成功获取 %s 个配置文件，共 %s 个", len(filenames), listing['total'])
+    return jsonify({'files': filenames, 'code': 200, **page})
 
 def api_get_configs(dir):
     """
-    获取指定目录下的所有配置文件。
+    获取指定目录下的配置文件（分页，支持 glob 过滤）。
     :param dir: 指定的目录路径
     :return: 配置文件列表的JSON响应
     """
-    logger.info(f"收到获取配置文件列表的请求，目录: {dir}")
+    logger.info("收到获取配置文件列表的请求，目录: %s", dir)
     
     try:
-        # 获取指定目录下的所有文件名
-        filenames = get_all_filenames(dir)
-        
-        if not filenames:
-            logger.info("没有找到任何配置文件")
-            return jsonify({'message': '没有找到配置文件。', 'files': []})
-        
-        logger.info(f"成功获取 {len(filenames)} 个配置文件")
-        return jsonify({'files': filenames, 'code': 200})
+        pattern, offset, limit = read_file_list_args()
+        # 获取指定目录下的文件（目录的文件列表有缓存）
+        return file_list_response(list_config_files(dir, pattern, offset, limit))
     except Exception as e:
-        logger.error(f"获取配置文件列表失败: {str(e)}", exc_info=True)
+        logger.error("获取配置文件列表失败: %s", str(e), exc_info=True)
         return jsonify({'error': '错误的获取配置文件列表', 'details': str(e)}), 500
 
+def api_get_config_cache_stats():
+    """
+    处理获取 YAML 文档缓存统计的API请求。
+    :return: 缓存命中和淘汰统计的JSON响应
+    """
+    logger.info("收到获取 YAML 文档缓存统计的请求")
+    return jsonify({'stats': yaml_cache.stats(), 'code': 200})
+
+def read_yaml_partial_args():
+    """
+    读取 YAML 文件部分获取的参数：
+    stream（ndjson：每行一个元素；json：分块输出的 JSON）、path（例如 Developer.Github）、offset、limit。
+    :return: (stream, path, offset, limit)
+    """
+    stream = request.args.get('stream') or None
+    path = request.args.get('path') or None
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = request.args.get('limit', type=int)
+    if limit is not None:
+        limit = max(limit, 0)
+    return stream, path, offset, limit
+
+def stream_yaml_items(cursor, stream, offset, limit, dumps):
+    """
+    逐个元素输出 YAML 内容，每次只在内存中保留一个元素。
+    :param cursor: 已经定位好的 YamlCursor，输出结束后关闭
+    :param stream: ndjson 或 json
+    """
+    try:
+        if stream == 'ndjson':
+            for item in cursor.items(offset, limit):
+                yield dumps(item) + '\n'
+            return
+        yield '{"content": ['
+        for index, item in enumerate(cursor.items(offset, limit)):
+            yield (',' if index else '') + dumps(item)
+        yield f'], "has_more": {"true" if cursor.has_more else "false"}, "code": 200}}\n'
+    except Exception as e:
+        # 响应头已经发出，只能记录日志并结束输出
+        logger.error("输出 YAML 文件内容失败: %s", str(e), exc_info=True)
+    finally:
+        cursor.close()
+
+def yaml_stream_response(file_full_path, stream, path, offset, limit):
+    """
+    生成流式的 YAML 内容响应（分块传输）。
+    """
+    cursor = YamlCursor(file_full_path)
+    try:
+        cursor.locate(path)
+    except BaseException:
+        cursor.close()
+        raise
+    mimetype = 'application/x-ndjson' if stream == 'ndjson' else 'application/json'
+    response = Response(stream_yaml_items(cursor, stream, offset, limit, current_app.json.dumps), mimetype=mimetype)
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def partial_yaml_response(content, has_more, path, offset, limit):
+    """
+    生成部分获取的 YAML 内容的JSON响应。
+    """
+    result = {'content': content, 'code': 200}
+    if path:
+        result['path'] = path
+    if offset or limit is not None:
+        result.update({'offset': offset, 'limit': limit, 'has_more': has_more})
+    return jsonify(result)
+
 def api_get_yaml_content(file_path, file_name):
     """
     获取指定 YAML 文件的内容。
+    指定 path / offset / limit 时只读取需要的部分，指定 stream 时逐个元素流式输出，内存占用与文件大小无关。
     :param file_path: 文件路径
     :param file_name: 文件名
     :return: YAML 文件内容的JSON响应
     """
-    logger.info(f"收到获取 YAML 文件内容的请求，文件: {file_name}")
+    logger.info("收到获取 YAML 文件内容的请求，文件: %s", file_name)
     
     try:
         if not file_path or not file_name:
             logger.warning("文件路径或文件名为空, 返回默认配置文件")
         
+        stream, path, offset, limit = read_yaml_partial_args()
+        if stream not in (None, 'ndjson', 'json'):
+            return jsonify({'error': f'不支持的 stream 参数: {stream}，可选 ndjson / json'}), 400
+        if stream or path or offset or limit is not None:
+            file_full_path = get_yaml_file_path(file_path, file_name)
+            if file_full_path is None:
+                logger.error("无法读取文件: %s", file_name)
+                return jsonify({'error': f'无法读取文件: {file_name}'}), 404
+            if stream:
+                return yaml_stream_response(file_full_path, stream, path, offset, limit)
+            content, has_more = read_partial(file_full_path, path, offset, limit)
+            return partial_yaml_response(content, has_more, path, offset, limit)
+        
         # 获取指定 YAML 文件的内容
         content = get_yaml_file_content(file_path, file_name)
         
         if content is None:
-            logger.error(f"无法读取文件: {file_name}")
+            logger.error("无法读取文件: %s", file_name)
             return jsonify({'error': f'无法读取文件: {file_name}'}), 404
         
-        logger.info(f"成功获取文件 {file_name} 的内容")
+        logger.info("成功获取文件 %s 的内容", file_name)
         return jsonify({'content': content, 'code': 200})
+    except YamlPathNotFound as e:
+        logger.warning("YAML 文件中不存在路径: %s %s", file_name, e)
+        return jsonify({'error': f'路径不存在: {e.args[0] if e.args else ""}'}), 404
     except Exception as e:
-        logger.error(f"获取 YAML 文件内容失败: {str(e)}", exc_info=True)
-        return jsonify({'error': '错误的获取 YAML 文件内容', 'details': str(e)}), 500
\ No newline at end of file
+        logger.error("获取 YAML 文件内容失败: %s", str(e), exc_info=True)
+        return jsonify({'error': '错误的获取 YAML 文件内容', 'details': str(e)}), 500
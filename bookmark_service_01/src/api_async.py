@@ -0,0 +1,120 @@
+import os
+import asyncio
+import logging
+from flask import jsonify, current_app
+from add_bookmark import get_bookmarks_snapshot, get_bookmarks_version
+from config import BOOKMARK_DIRS, get_yaml_file_content, get_yaml_file_path, list_config_files
+from atomic_file import file_signature
+from http_cache import EncodedBody, cached_response
+from async_io import io_executor, single_flight
+from api import (response_cache, read_annotation_args, build_annotated_body, read_file_list_args, file_list_response,
+                 read_yaml_partial_args, yaml_stream_response, partial_yaml_response)
+from yaml_stream import YamlPathNotFound, read_partial
+
+logger = logging.getLogger(__name__)
+
+# api.py 中只读接口的异步版本（ASYNC_API=1 时由 app.py 使用）。
+# 阻塞的 stat / open / YAML 解析都在有界线程池 io_executor 中执行，不占用事件循环；
+# 先在线程池中取得文件签名或数据版本号，再以它作为键合并相同的并发读取，
+# 这样合并进来的请求不会拿到它到达之前就已经过期的内容。
+
+
+async def run_io(fn, *args):
+    """
+    在有界线程池中执行阻塞函数（不合并）。
+    """
+    return await asyncio.get_running_loop().run_in_executor(io_executor, fn, *args)
+
+
+def build_bookmarks_body(version, dumps, mimetype):
+    """
+    生成指定版本的书签响应体（已缓存时直接返回）。在线程池中执行。
+    """
+    return response_cache.get('bookmarks', version, lambda: EncodedBody(dumps(get_bookmarks_snapshot()) + '\n', mimetype))
+
+
+async def api_get_bookmarks_async():
+    """
+    api_get_bookmarks 的异步版本。
+    :return: 书签数据的JSON响应
+    """
+    logger.info("收到获取书签列表的请求（异步）")
+
+    try:
+        version = await run_io(get_bookmarks_version)
+        links, meta = read_annotation_args()
+        if links or meta:
+            entry = await run_io(build_annotated_body, version, links, meta,
+                                 current_app.json.dumps, current_app.json.mimetype)
+            return cached_response(entry)
+        entry = await single_flight.run(('bookmarks', version), build_bookmarks_body,
+                                        version, current_app.json.dumps, current_app.json.mimetype)
+        return cached_response(entry)
+    except Exception as e:
+        logger.error("获取书签列表失败: %s", str(e), exc_info=True)
+        return jsonify({'error': 'Failed to load bookmarks', 'details': str(e)}), 500
+
+
+async def api_get_configs_async(dir):
+    """
+    api_get_configs 的异步版本。
+    :param dir: 指定的目录路径
+    :return: 配置文件列表的JSON响应
+    """
+    logger.info("收到获取配置文件列表的请求（异步），目录: %s", dir)
+
+    try:
+        pattern, offset, limit = read_file_list_args()
+        path = os.path.abspath(dir or BOOKMARK_DIRS)
+        signature = await run_io(file_signature, path)
+        listing = await single_flight.run(('dir', path, signature, pattern, offset, limit),
+                                          list_config_files, path, pattern, offset, limit)
+        return file_list_response(listing)
+    except Exception as e:
+        logger.error("获取配置文件列表失败: %s", str(e), exc_info=True)
+        return jsonify({'error': '错误的获取配置文件列表', 'details': str(e)}), 500
+
+
+async def api_get_yaml_content_async(file_path, file_name):
+    """
+    api_get_yaml_content 的异步版本。
+    :param file_path: 文件路径
+    :param file_name: 文件名
+    :return: YAML 文件内容的JSON响应
+    """
+    logger.info("收到获取 YAML 文件内容的请求（异步），文件: %s", file_name)
+
+    try:
+        if not file_path or not file_name:
+            logger.warning("文件路径或文件名为空, 返回默认配置文件")
+
+        stream, yaml_path, offset, limit = read_yaml_partial_args()
+        if stream not in (None, 'ndjson', 'json'):
+            return jsonify({'error': f'不支持的 stream 参数: {stream}，可选 ndjson / json'}), 400
+        if stream or yaml_path or offset or limit is not None:
+            file_full_path = await run_io(get_yaml_file_path, file_path, file_name)
+            if file_full_path is None:
+                logger.error("无法读取文件: %s", file_name)
+                return jsonify({'error': f'无法读取文件: {file_name}'}), 404
+            if stream:
+                # 流式输出由 WSGI 服务器在请求线程中逐块读取
+                return yaml_stream_response(file_full_path, stream, yaml_path, offset, limit)
+            content, has_more = await run_io(read_partial, file_full_path, yaml_path, offset, limit)
+            return partial_yaml_response(content, has_more, yaml_path, offset, limit)
+
+        path = os.path.normpath(os.path.join(file_path or BOOKMARK_DIRS, file_name or 'bookmarks.yaml'))
+        signature = await run_io(file_signature, path)
+        content = await single_flight.run(('yaml', path, signature), get_yaml_file_content, file_path, file_name)
+
+        if content is None:
+            logger.error("无法读取文件: %s", file_name)
+            return jsonify({'error': f'无法读取文件: {file_name}'}), 404
+
+        logger.info("成功获取文件 %s 的内容", file_name)
+        return jsonify({'content': content, 'code': 200})
+    except YamlPathNotFound as e:
+        logger.warning("YAML 文件中不存在路径: %s %s", file_name, e)
+        return jsonify({'error': f'路径不存在: {e.args[0] if e.args else ""}'}), 404
+    except Exception as e:
+        logger.error("获取 YAML 文件内容失败: %s", str(e), exc_info=True)
+        return jsonify({'error': '错误的获取 YAML 文件内容', 'details': str(e)}), 500
@@ -1,5 +1,11 @@
 import change_config
 from config import BOOKMARK_CONFIG_PATH 
+from bookmark_store import bookmark_store
+from change_feed import publish_page_changed
+from page_state import PageState, PagePersister, PageSnapshots, PageLoadError
+from page_index import PageIndex
+from metrics import timed
+import threading
 import logging
 import os
 
@@ -13,52 +19,111 @@ logger = logging.getLogger(__name__)
 
 
 # 切换配置文件路径
-OTHER_BOOKMARK_CONFIG_FILE = base_dir = os.path.dirname(__file__) + '/configs/other/next_setting.yaml'
+OTHER_BOOKMARK_CONFIG_FILE = change_config.get_abs_path('next_setting.yaml', '/other')
+
+# 翻页配置的内存缓存
+page_state = PageState(OTHER_BOOKMARK_CONFIG_FILE)
+# 翻页后页面文件和书签配置文件的后台写回
+page_persister = PagePersister()
+# 书签页面（configs/other/bookmarks/）的已解析快照
+bookmark_pages = PageSnapshots(change_config.get_abs_path("", "/other/bookmarks"), page_persister)
+_bookmark_pages_warmed = False
+# 所有书签页面的全局索引（服务名、链接 -> 页面），启动时在后台构建
+bookmark_page_index = PageIndex(bookmark_pages.dir_path, page_state, bookmark_pages, bookmark_store)
+bookmark_page_index.start()
+
+
+def warm_bookmark_pages(files):
+    """
+    第一次翻页时在后台预先解析所有书签页面。
+    """
+    global _bookmark_pages_warmed
+    if _bookmark_pages_warmed:
+        return
+    _bookmark_pages_warmed = True
+    threading.Thread(target=bookmark_pages.warm, args=(files,), name='bookmark-pages-warm', daemon=True).start()
+
+
+def switch_bookmark_page(page):
+    """
+    书签翻页：把已解析的新页面（page['prepared']）直接交换为当前书签数据（O(1)），
+    换出的页面和书签配置文件在后台写回，不再复制文件。调用者需持有书签锁。
+    :param page: PageState.flip 的返回值
+    """
+    if page['active'] != page['old_active']:
+        old_model, dirty = bookmark_store.swap(page['prepared'])
+        if page['old_active']:
+            bookmark_pages.put(page['old_active'], old_model, dirty)
+        page_persister.schedule(bookmark_store.path, bookmark_store.flush)
+    warm_bookmark_pages(page['files'])
+
+
+def is_bookmark_target(type, target_file):
+    """
+    判断翻页的目标文件是否就是 bookmark_store 管理的书签配置文件。
+    """
+    if type != "bookmarks" or not target_file:
+        return False
+    target = os.path.realpath(change_config.get_abs_path(target_file))
+    return target == os.path.realpath(bookmark_store.path)
 
 # 翻页下一页：
 # 修改配置文件，索引加一，活动文件修改成对应的文件，并将活动文件的内容复制到到标准配置文件
-def change_page_config(next=True, type="bookmarks"):
+@timed('change_page')
+def change_page_config(next=True, type="bookmarks", to=None):
     """
     修改书签配置到下一页或上一页
     
     Args:
         next: true表示下一页，false表示上一页
         type: 配置类型，默认为 "bookmarks", ”services", "settings"
+        to: 直接跳转到的页面文件名（例如 page_index 查到的页面），指定时忽略 next
     
     Returns:
         str: 操作结果消息
     """
-    # 1. 获取当前的配置索引,和活动文件
-    current_bookmarks_index = change_config.get_config_file_content(OTHER_BOOKMARK_CONFIG_FILE, type, "index")
-    current_bookmarks_active = change_config.get_config_file_content(OTHER_BOOKMARK_CONFIG_FILE, type, "action") 
-    # 2. 修改索引和活动文件， 索引达到最大时，索引归1
-    current_bookmarks_files = change_config.get_config_file_content(OTHER_BOOKMARK_CONFIG_FILE, type, "files")
-    target_file = change_config.get_config_file_content(OTHER_BOOKMARK_CONFIG_FILE, type, "target")
-    if next:
-        if current_bookmarks_index + 1 > len(current_bookmarks_files):
-            new_index = 1
-        else:
-            new_index = current_bookmarks_index + 1
-    else:
-        if current_bookmarks_index - 1 < 0:
-            new_index = len(current_bookmarks_files) 
+    def prepare(page):
+        # 在修改翻页配置之前加载（检查）新的页面，失败时页码和活动文件保持不变
+        try:
+            if is_bookmark_target(type, page['target']):
+                return bookmark_pages.get(page['active'])
+            new_bookmarks_active = change_config.get_abs_path(page['active'], "/other/" + type)
+            if not os.path.isfile(new_bookmarks_active):
+                raise FileNotFoundError(new_bookmarks_active)
+            return None
+        except Exception as e:
+            raise PageLoadError(f"无法加载页面文件: {page['active']}: {e}") from e
+
+    # 翻页配置的修改、页面的交换（或复制）和写回安排在同一个书签锁内完成，
+    # 并发的翻页按顺序执行，换出的页面不会被写到其他页面的文件中
+    with bookmark_store.locked():
+        # 1-3. 在一个事务中修改页码和活动文件（索引达到最大时归1），翻页配置只读一次（通常命中缓存）、写一次
+        try:
+            page = page_state.flip(type, next, to, prepare=prepare)
+        except PageLoadError as e:
+            logger.error("翻页失败，页面保持不变: %s", e)
+            return "翻页失败"
+        target_file = page['target']
+
+        if is_bookmark_target(type, target_file):
+            switch_bookmark_page(page)
+            publish_page_changed(type, page['index'], page['active'])
+            return "下一页" if next else "上一页"
+
+        try:
+            # 复制期间持有书签锁：先合并书签写前日志，并阻止其他请求同时修改书签文件
+            with bookmark_store.exclusive():
+                current_bookmarks_active = change_config.get_abs_path(page['old_active'], "/other/" + type)
+                # 4. 确保保存的活动配置文件是最新的
+                change_config.copy_config_file_content(target_file, current_bookmarks_active)
+
+                # 4. 将活动文件的内容复制到标准配置文件
+                new_bookmarks_active = change_config.get_abs_path(page['active'], "/other/" + type)
+                change_config.copy_config_file_content(new_bookmarks_active, target_file)
+        except Exception as e:
+            logger.error("保存活动配置文件时出错: %s", e)
         else:
-            new_index = current_bookmarks_index - 1
-    new_bookmarks_active = current_bookmarks_files[new_index - 1]
-    # 3. 修改配置文件
-    change_config.change_config_file_content(OTHER_BOOKMARK_CONFIG_FILE, type, "index", new_index)
-    change_config.change_config_file_content(OTHER_BOOKMARK_CONFIG_FILE, type, "action", new_bookmarks_active)
-
-    try:
-        current_bookmarks_active = change_config.get_abs_path(current_bookmarks_active, "/other/" + type)
-        # 4. 确保保存的活动配置文件是最新的
-        change_config.copy_config_file_content(target_file, current_bookmarks_active)
-
-        # 4. 将活动文件的内容复制到标准配置文件
-        new_bookmarks_active = change_config.get_abs_path(new_bookmarks_active, "/other/" + type)
-        change_config.copy_config_file_content(new_bookmarks_active, target_file)
-    except Exception as e:
-        logger.error(f"保存活动配置文件时出错: {e}")
+            publish_page_changed(type, page['index'], page['active'])
     # 三元运算符
     return "下一页" if next else "上一页"
     
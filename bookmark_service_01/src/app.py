@@ -1,36 +1,61 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import Flask, request, jsonify, redirect, g
+import time
 import logging
-from api import api_get_bookmarks, api_add_bookmark, api_save_bookmarks, api_get_configs, api_get_yaml_content
-from config import get_all_filenames
-from add_bookmark import get_bookmarks_groups
+from api import api_render_index, api_render_config, api_get_bookmarks, api_get_bookmarks_cache_stats, api_search_bookmarks, api_locate_bookmark, api_get_bookmark_links, api_scan_bookmark_links, api_get_bookmark_icon, api_get_bookmark_events, api_add_bookmark, api_add_bookmarks_batch, api_save_bookmarks, api_patch_bookmarks, api_get_configs, api_get_yaml_content, api_get_config_cache_stats, api_get_metrics
+from metrics import request_seconds
+from app_logging import setup_logging, bind_request_id, reset_request_id, current_request_id, log_request
+from config import ASYNC_API
 import api_change_config 
 
 app = Flask(__name__)
 
-# 配置日志
-logging.basicConfig(
-    # 最低日志级设置
-    level=logging.WARNING,
-    format='%(asctime)s - %(levelname)s - [%(filename)s] - %(name)s - %(message)s',
-    # 设置日志文件路径
-    filename='configs/logs/add_bookmark.log',
-    # 文件不存在则自动创建
-    filemode='a',
-    encoding='utf-8',
-    # force=True  # 强制覆盖之前的配置
-)
+# 配置日志：写文件在后台线程中进行，级别、格式、轮转和采样见 config.py 中的 LOG_* 配置
+setup_logging()
 logger = logging.getLogger(__name__)
 
+# ---------------------------------------------------------------------------------------
+# 运行指标：每个请求按路由模板（而不是实际路径，避免标签过多）统计耗时
+# 请求 ID：日志记录中带有请求 ID，并通过 X-Request-ID 响应头返回给客户端
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.request_id_token = bind_request_id(request.headers.get('X-Request-ID'))
+
+@app.after_request
+def record_request_time(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        request_seconds.observe(time.perf_counter() - start, route, request.method, response.status_code)
+    response.headers.setdefault('X-Request-ID', current_request_id())
+    return response
+
+@app.teardown_request
+def clear_request_id(error=None):
+    token = g.pop('request_id_token', None)
+    if token is not None:
+        reset_request_id(token)
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    处理获取运行指标的请求（Prometheus 文本格式）。
+    :return: 指标文本
+    """
+    try:
+        return api_get_metrics()
+    except Exception as e:
+        logger.error("处理获取运行指标请求时发生错误: %s", str(e))
+        return jsonify({"error": "获取运行指标失败"}), 500
+
 @app.route('/')
 def index():
     """
-    渲染添加书签的页面。
+    渲染添加书签的页面（书签数据未变化时直接返回缓存的页面）。
     :return: 渲染后的HTML页面
     """
     try:
-        groups = get_bookmarks_groups()
-        logger.info("成功获取书签分组列表，共 %d 个分组", len(groups))
-        return render_template('add_bookmark.html', groups=groups)
+        return api_render_index()
     except Exception as e:
         logger.error("获取书签分组列表失败: %s", str(e))
         return jsonify({"error": "获取书签分组失败"}), 500
@@ -38,15 +63,15 @@ def index():
 @app.route('/config')
 def config_manager():
     """
-    渲染配置管理页面。
+    渲染配置管理页面（配置目录的文件列表未变化时直接返回缓存的页面）。
     :return: 渲染后的HTML页面
     """
     try:
-        files = get_all_filenames()
-        logger.info("成功获取配置文件列表，共 %d 个配置文件", len(files))
-        return render_template('config.html', files=files)
+        # 只渲染第一页，其余的由页面通过 /api/config/files 分页获取
+        return api_render_config()
     except Exception as e:
         logger.error("获取配置文件列表失败: %s", str(e))
+        return jsonify({"error": "获取配置文件列表失败"}), 500
 
 @app.route('/api/bookmarks', methods=['GET'])
 def get_bookmarks():
@@ -57,9 +82,8 @@ def get_bookmarks():
     logger.info("收到获取书签数据的请求: %s", request.remote_addr)
     
     try:
-        # 打印请求信息
-        logger.debug("请求头: %s", request.headers)
-        logger.debug("请求参数: %s", request.args)
+        # 打印请求信息（只在 DEBUG 级别开启时读取）
+        log_request(logger)
         
         # 调用API处理函数
         response = api_get_bookmarks()
@@ -71,6 +95,105 @@ def get_bookmarks():
         logger.error("处理获取书签请求时发生错误: %s", str(e))
         return jsonify({"error": "获取书签数据失败"}), 500
 
+@app.route('/api/bookmarks/cache', methods=['GET'])
+def get_bookmarks_cache_stats():
+    """
+    处理获取书签缓存统计的API请求。
+    :return: 缓存命中统计的JSON响应
+    """
+    logger.info("收到获取书签缓存统计的请求: %s", request.remote_addr)
+    
+    try:
+        return api_get_bookmarks_cache_stats()
+    except Exception as e:
+        logger.error("处理获取书签缓存统计请求时发生错误: %s", str(e))
+        return jsonify({"error": "获取书签缓存统计失败"}), 500
+
+@app.route('/api/bookmarks/search', methods=['GET'])
+def search_bookmarks():
+    """
+    处理搜索书签的API请求。
+    :return: 搜索结果的JSON响应
+    """
+    logger.info("收到搜索书签的请求: %s", request.remote_addr)
+    
+    try:
+        return api_search_bookmarks()
+    except Exception as e:
+        logger.error("处理搜索书签请求时发生错误: %s", str(e))
+        return jsonify({"error": "搜索书签失败"}), 500
+
+@app.route('/api/bookmarks/locate', methods=['GET'])
+def locate_bookmark():
+    """
+    处理查找书签所在页面的API请求。
+    :return: 查找结果的JSON响应
+    """
+    logger.info("收到查找书签所在页面的请求: %s", request.remote_addr)
+    
+    try:
+        return api_locate_bookmark()
+    except Exception as e:
+        logger.error("处理查找书签所在页面请求时发生错误: %s", str(e))
+        return jsonify({"error": "查找书签所在页面失败"}), 500
+
+@app.route('/api/bookmarks/links', methods=['GET'])
+def get_bookmark_links():
+    """
+    处理获取书签链接检查结果的API请求。
+    :return: 检查结果的JSON响应
+    """
+    logger.info("收到获取书签链接检查结果的请求: %s", request.remote_addr)
+    
+    try:
+        return api_get_bookmark_links()
+    except Exception as e:
+        logger.error("处理获取书签链接检查结果请求时发生错误: %s", str(e))
+        return jsonify({"error": "获取书签链接检查结果失败"}), 500
+
+@app.route('/api/bookmarks/links/scan', methods=['POST'])
+def scan_bookmark_links():
+    """
+    处理立即检查书签链接的API请求。
+    :return: 操作结果的JSON响应
+    """
+    logger.info("收到检查书签链接的请求: %s", request.remote_addr)
+    
+    try:
+        return api_scan_bookmark_links()
+    except Exception as e:
+        logger.error("处理检查书签链接请求时发生错误: %s", str(e))
+        return jsonify({"error": "检查书签链接失败"}), 500
+
+@app.route('/api/bookmarks/<id>/icon', methods=['GET'])
+def get_bookmark_icon(id):
+    """
+    处理获取书签图标的API请求。
+    :param id: 书签 id
+    :return: 图标
+    """
+    logger.info("收到获取书签图标的请求: %s", request.remote_addr)
+    
+    try:
+        return api_get_bookmark_icon(id)
+    except Exception as e:
+        logger.error("处理获取书签图标请求时发生错误: %s", str(e))
+        return jsonify({"error": "获取书签图标失败"}), 500
+
+@app.route('/api/bookmarks/events', methods=['GET'])
+def get_bookmark_events():
+    """
+    处理书签变更推送的API请求（server-sent events 或长轮询）。
+    :return: 事件流响应
+    """
+    logger.info("收到书签变更推送的请求: %s", request.remote_addr)
+    
+    try:
+        return api_get_bookmark_events()
+    except Exception as e:
+        logger.error("处理书签变更推送请求时发生错误: %s", str(e))
+        return jsonify({"error": "获取书签变更失败"}), 500
+
 @app.route('/api/bookmarks', methods=['POST'])
 def add_bookmark():
     """
@@ -80,9 +203,8 @@ def add_bookmark():
     logger.info("收到添加书签的请求: %s", request.remote_addr)
     
     try:
-        # 打印请求信息
-        logger.debug("请求头: %s", request.headers)
-        logger.debug("请求体: %s", request.get_data(as_text=True))
+        # 打印请求信息（只在 DEBUG 级别开启时读取）
+        log_request(logger, body=True)
         
         # 调用API处理函数
         response = api_add_bookmark()
@@ -94,6 +216,25 @@ def add_bookmark():
         logger.error("处理添加书签请求时发生错误: %s", str(e))
         return jsonify({"error": "添加书签失败"}), 500
 
+@app.route('/api/bookmarks/batch', methods=['POST'])
+def add_bookmarks_batch():
+    """
+    处理批量添加书签的API请求（JSON 数组或 NDJSON）。
+    :return: 逐条处理结果的JSON响应
+    """
+    logger.info("收到批量添加书签的请求: %s", request.remote_addr)
+    
+    try:
+        # 调用API处理函数
+        response = api_add_bookmarks_batch()
+        
+        # 打印响应信息
+        logger.info("批量添加书签完成")
+        return response
+    except Exception as e:
+        logger.error("处理批量添加书签请求时发生错误: %s", str(e))
+        return jsonify({"error": "批量添加书签失败"}), 500
+
 @app.route('/api/bookmarks/save', methods=['POST'])
 def save_bookmarks():
     """
@@ -103,9 +244,8 @@ def save_bookmarks():
     logger.info("收到保存书签的请求: %s", request.remote_addr)
     
     try:
-        # 打印请求信息
-        logger.debug("请求头: %s", request.headers)
-        logger.debug("请求体: %s", request.get_data(as_text=True))
+        # 打印请求信息（只在 DEBUG 级别开启时读取）
+        log_request(logger, body=True)
         
         # 调用API处理函数
         response = api_save_bookmarks()
@@ -117,6 +257,28 @@ def save_bookmarks():
         logger.error("处理保存书签请求时发生错误: %s", str(e))
         return jsonify({"error": "保存书签失败"}), 500
 
+@app.route('/api/bookmarks', methods=['PATCH'])
+def patch_bookmarks():
+    """
+    处理增量修改书签的API请求。
+    :return: 操作结果的JSON响应
+    """
+    logger.info("收到增量修改书签的请求: %s", request.remote_addr)
+    
+    try:
+        # 打印请求信息（只在 DEBUG 级别开启时读取）
+        log_request(logger, body=True)
+        
+        # 调用API处理函数
+        response = app.make_response(api_patch_bookmarks())
+        
+        # 打印响应信息
+        logger.info("增量修改书签完成，状态码: %s", response.status_code)
+        return response
+    except Exception as e:
+        logger.error("处理增量修改书签请求时发生错误: %s", str(e))
+        return jsonify({"error": "增量修改书签失败"}), 500
+
 @app.route('/api/config/files', methods=['GET'])
 def get_configs():
     """
@@ -127,10 +289,10 @@ def get_configs():
     
     try:
         dir = request.args.get('dir')
-        logger.debug("请求参数: %s", jsonify(request.args))
+        log_request(logger)
         
         # 调用API处理函数
-        response = api_get_configs(dir)
+        response = app.make_response(api_get_configs(dir))
         
         # 打印响应信息
         logger.info("获取配置文件成功，状态码: %s", response.status_code)
@@ -153,7 +315,8 @@ def get_yaml_content():
         logger.debug("请求参数: file_path=%s, file_name=%s", file_path, file_name)
         
         # 调用API处理函数
-        response = api_get_yaml_content(file_path, file_name)
+        # 错误时返回的是 (响应, 状态码)，统一转换为 Response 以便记录状态码
+        response = app.make_response(api_get_yaml_content(file_path, file_name))
         
         # 打印响应信息
         logger.info("获取YAML文件内容成功，状态码: %s", response.status_code)
@@ -161,6 +324,20 @@ def get_yaml_content():
     except Exception as e:
         logger.error("处理获取YAML文件内容请求时发生错误: %s", str(e))
         return jsonify({"error": "获取YAML文件内容失败"}), 500
+
+@app.route('/api/config/cache', methods=['GET'])
+def get_config_cache_stats():
+    """
+    处理获取 YAML 文档缓存统计的API请求。
+    :return: 缓存命中和淘汰统计的JSON响应
+    """
+    logger.info("收到获取 YAML 文档缓存统计的请求: %s", request.remote_addr)
+    
+    try:
+        return api_get_config_cache_stats()
+    except Exception as e:
+        logger.error("处理获取 YAML 文档缓存统计请求时发生错误: %s", str(e))
+        return jsonify({"error": "获取 YAML 文档缓存统计失败"}), 500
     
 
 
@@ -176,8 +353,11 @@ def api_change_page():
     
     try:
         
-        # 调用API处理函数
-        api_change_config.change_page_config()
+        # 调用API处理函数，to 指定时直接跳转到该页面文件（例如 /api/bookmarks/locate 查到的页面）
+        api_change_config.change_page_config(to=request.args.get('to') or None)
+    except ValueError as e:
+        logger.warning("翻页的目标页面不存在: %s", str(e))
+        return jsonify({"error": "翻页的目标页面不存在"}), 404
     except Exception as e:
         logger.error("处理翻页请求时发生错误: %s", str(e))
         return jsonify({"error": "翻页失败"}), 500
@@ -185,4 +365,63 @@ def api_change_page():
         # 打印响应信息
         logger.info("翻页成功，状态码: %s", 200)
         # 返回一个新的页面地址
-        return redirect('http://home.ny.nuc/')
\ No newline at end of file
+        return redirect('http://home.ny.nuc/')
+
+
+
+# ---------------------------------------------------------------------------------------
+# 异步模式（ASYNC_API=1）：只读接口改为 async 视图（需要安装 Flask[async]），
+# 文件读取在有界线程池中执行，相同文件的并发读取合并为一次
+if ASYNC_API:
+    from api_async import api_get_bookmarks_async, api_get_configs_async, api_get_yaml_content_async
+
+    async def get_bookmarks_async():
+        """
+        处理获取书签的API请求（异步）。
+        :return: 书签数据的JSON响应
+        """
+        logger.info("收到获取书签数据的请求: %s", request.remote_addr)
+
+        try:
+            return await api_get_bookmarks_async()
+        except Exception as e:
+            logger.error("处理获取书签请求时发生错误: %s", str(e))
+            return jsonify({"error": "获取书签数据失败"}), 500
+
+    async def get_configs_async():
+        """
+        处理获取配置文件的API请求（异步）。
+        :return: 配置文件的JSON响应
+        """
+        logger.info("收到获取配置文件的请求: %s", request.remote_addr)
+
+        try:
+            return await api_get_configs_async(request.args.get('dir'))
+        except Exception as e:
+            logger.error("处理获取配置文件请求时发生错误: %s", str(e))
+            return jsonify({"error": "获取配置文件失败"}), 500
+
+    async def get_yaml_content_async():
+        """
+        处理获取YAML文件的内容API请求（异步）。
+        :return: YAML文件的内容JSON响应
+        """
+        logger.info("收到获取YAML文件内容的请求: %s", request.remote_addr)
+
+        try:
+            return await api_get_yaml_content_async(request.args.get('file_path'), request.args.get('file_name'))
+        except Exception as e:
+            logger.error("处理获取YAML文件内容请求时发生错误: %s", str(e))
+            return jsonify({"error": "获取YAML文件内容失败"}), 500
+
+    # 路由不变，只替换对应端点的视图函数
+    app.view_functions['get_bookmarks'] = get_bookmarks_async
+    app.view_functions['get_configs'] = get_configs_async
+    app.view_functions['get_yaml_content'] = get_yaml_content_async
+
+
+if __name__ == '__main__':
+    # 开发服务器，生产环境请使用 serve.py
+    from api import start_background_tasks
+    start_background_tasks()
+    app.run(host='0.0.0.0', port=5000, threaded=True)
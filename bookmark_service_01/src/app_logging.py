@@ -0,0 +1,254 @@
+# app_logging.py
+import os
+import re
+import json
+import uuid
+import zlib
+import queue
+import random
+import atexit
+import logging
+import threading
+import contextvars
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from flask import request
+from config import (LOG_FILE, LOG_LEVEL, LOG_FORMAT, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_QUEUE_SIZE,
+                    LOG_INFO_SAMPLE_RATE, LOG_MAX_BODY)
+from atomic_file import file_lock
+from metrics import counter
+
+logger = logging.getLogger(__name__)
+
+# 日志管道：
+#   - 请求线程只把日志记录放进有界队列（QueueHandler），格式化和写文件在后台线程（QueueListener）中进行，
+#     队列满时丢弃记录并计数，不会阻塞请求；
+#   - 每条记录带有请求 ID（X-Request-ID 请求头，没有时随机生成），json 格式为每行一个 JSON 对象；
+#   - 日志文件按大小轮转。多个 worker 写同一个文件，轮转在文件的进程间锁内进行，其他 worker 发现文件被轮转后重新打开；
+#   - INFO 及以下的记录可以按请求采样（同一个请求的记录要么全部保留，要么全部丢弃），WARNING 及以上总是保留；
+#   - 调试用的请求头、请求体只在 DEBUG 级别开启时才读取（log_request）。
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - [%(filename)s] - %(name)s - [%(request_id)s] - %(message)s'
+# 客户端传入的请求 ID 只接受这些字符，避免日志注入
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._:-]{1,64}$')
+
+request_id_var = contextvars.ContextVar('request_id', default='-')
+records_dropped = counter('bookmark_log_records_dropped_total', '没有写入日志文件的记录数（队列已满或被采样丢弃）', ('reason',))
+
+_exception_formatter = logging.Formatter()
+_setup_lock = threading.Lock()
+_listener = None
+
+
+# ---------------------------------------------------------------------------------------
+# 请求 ID
+
+def bind_request_id(value=None):
+    """
+    设置当前请求的 ID。
+    :param value: 客户端传入的请求 ID，为空或不合法时随机生成
+    :return: 用于 reset_request_id 的 token
+    """
+    if not value or not REQUEST_ID_PATTERN.match(value):
+        value = uuid.uuid4().hex[:16]
+    return request_id_var.set(value)
+
+
+def reset_request_id(token):
+    request_id_var.reset(token)
+
+
+def current_request_id():
+    return request_id_var.get()
+
+
+def log_request(logger, body=False):
+    """
+    在 DEBUG 级别开启时记录请求头、请求参数和请求体（最多 LOG_MAX_BODY 个字符）；没有开启时不读取请求内容。
+    :param logger: 调用者的日志记录器
+    :param body: 是否记录请求体
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    logger.debug("请求头: %s", dict(request.headers), stacklevel=2)
+    logger.debug("请求参数: %s", request.args.to_dict(flat=False), stacklevel=2)
+    if body:
+        logger.debug("请求体: %s", request.get_data(as_text=True)[:LOG_MAX_BODY], stacklevel=2)
+
+
+# ---------------------------------------------------------------------------------------
+# 过滤器、格式化和处理器
+
+class RequestContextFilter(logging.Filter):
+    """
+    给日志记录附加请求 ID（在产生日志的线程中执行）。
+    """
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class InfoSampler(logging.Filter):
+    """
+    按比例保留 INFO 及以下的记录。有请求 ID 时按请求 ID 决定，同一个请求的记录要么全部保留，要么全部丢弃。
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.rate >= 1:
+            return True
+        request_id = getattr(record, 'request_id', '-')
+        if request_id == '-':
+            keep = random.random() < self.rate
+        else:
+            keep = zlib.crc32(request_id.encode('utf-8')) % 10000 < self.rate * 10000
+        if not keep:
+            records_dropped.inc(1, 'sampled')
+        return keep
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    每条记录格式化为一行 JSON。
+    """
+
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'file': record.filename,
+            'line': record.lineno,
+            'pid': record.process,
+            'thread': record.threadName,
+            'request_id': getattr(record, 'request_id', '-'),
+            'message': record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    队列满时丢弃记录，不阻塞产生日志的线程。
+    """
+
+    def prepare(self, record):
+        # 参数可能引用请求对象，请求结束后不能再读取，所以在当前线程中合并参数和格式化异常；
+        # 时间等字段的格式化和写文件留给后台线程。根日志记录器只有这一个处理器，直接修改记录，不复制
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            records_dropped.inc(1, 'queue_full')
+
+
+class DrainingQueueListener(QueueListener):
+    """
+    停止时队列已满也会等待后台线程写完剩余的记录（QueueListener 放入结束标记时不等待，队列满时会抛出 queue.Full）。
+    """
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class SharedRotatingFileHandler(RotatingFileHandler):
+    """
+    多个进程共用的按大小轮转的日志文件。
+    """
+
+    def _replaced(self):
+        """
+        当前打开的文件是否已经被其他进程轮转（改名）或删除。
+        """
+        try:
+            return os.stat(self.baseFilename).st_ino != os.fstat(self.stream.fileno()).st_ino
+        except OSError:
+            return True
+
+    def _reopen(self):
+        self.stream.close()
+        self.stream = self._open()
+
+    def emit(self, record):
+        if self.stream is not None and self._replaced():
+            self._reopen()
+        super().emit(record)
+
+    def doRollover(self):
+        with file_lock(self.baseFilename):
+            # 等锁期间其他 worker 可能已经轮转过了，重新打开新文件即可
+            if self.stream is not None and self._replaced():
+                self._reopen()
+                return
+            super().doRollover()
+
+
+# ---------------------------------------------------------------------------------------
+# 配置
+
+def setup_logging(path=LOG_FILE, level=LOG_LEVEL, format=LOG_FORMAT, max_bytes=LOG_MAX_BYTES,
+                  backup_count=LOG_BACKUP_COUNT, queue_size=LOG_QUEUE_SIZE, sample_rate=LOG_INFO_SAMPLE_RATE):
+    """
+    配置根日志记录器并启动后台写日志的线程（每个进程只配置一次，根日志记录器原有的处理器会被移除）。
+    :param path: 日志文件路径
+    :param level: 最低日志级别
+    :param format: text 或 json
+    :param max_bytes: 日志文件达到这个大小（字节）时轮转，0 表示不轮转
+    :param backup_count: 保留的旧日志文件数
+    :param queue_size: 后台队列的长度
+    :param sample_rate: INFO 及以下日志的采样比例
+    :return: QueueListener
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return _listener
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        file_handler = SharedRotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                 encoding='utf-8', delay=True)
+        file_handler.setFormatter(JsonFormatter() if format == 'json' else logging.Formatter(TEXT_FORMAT))
+
+        handler = NonBlockingQueueHandler(queue.Queue(queue_size))
+        handler.addFilter(RequestContextFilter())
+        if sample_rate < 1:
+            handler.addFilter(InfoSampler(sample_rate))
+
+        root = logging.getLogger()
+        for old in root.handlers[:]:
+            root.removeHandler(old)
+        root.setLevel(level)
+        root.addHandler(handler)
+
+        _listener = DrainingQueueListener(handler.queue, file_handler, respect_handler_level=True)
+        _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """
+    写完队列中剩余的记录后停止后台线程。
+    fork 出的 worker 通过 os._exit 退出，不会执行 atexit 注册的函数，需要显式调用。
+    """
+    global _listener
+    with _setup_lock:
+        listener, _listener = _listener, None
+    if listener is None:
+        return
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
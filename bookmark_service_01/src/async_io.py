@@ -0,0 +1,63 @@
+# async_io.py
+import asyncio
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from config import ASYNC_IO_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# 异步视图中的阻塞文件读取（open + YAML 解析）都在这个有界线程池中执行，
+# 配置目录是很慢的网络挂载时，同时进行的文件读取最多 ASYNC_IO_WORKERS 个。
+io_executor = ThreadPoolExecutor(max_workers=ASYNC_IO_WORKERS, thread_name_prefix='async-io')
+
+
+class SingleFlight:
+    """
+    合并相同的并发调用：同一个键正在执行时，后来的调用者不再重复执行，而是等待并共享第一次调用的结果。
+    例如缓存失效后大量请求同时读取同一个文件，只会解析一次。
+    Flask 的每个 async 视图运行在各自的事件循环中，所以这里共享的是线程安全的 concurrent.futures.Future。
+    """
+
+    def __init__(self, executor=io_executor):
+        self.executor = executor
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def _done(self, key, future):
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def submit(self, key, fn, *args):
+        """
+        提交调用，同一个键正在执行时返回已有的 Future。
+        :param key: 调用的键，相同的键表示相同的调用（例如文件路径）
+        :param fn: 阻塞函数，在线程池中执行
+        :return: concurrent.futures.Future
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            self.executed += 1
+            future = self._calls[key] = self.executor.submit(fn, *args)
+        future.add_done_callback(lambda f: self._done(key, f))
+        return future
+
+    async def run(self, key, fn, *args):
+        """
+        在线程池中执行 fn(*args)，合并相同键的并发调用。
+        返回的结果可能被多个调用者共享，调用者不应修改它。
+        """
+        return await asyncio.wrap_future(self.submit(key, fn, *args))
+
+    def stats(self):
+        with self._lock:
+            return {'io_executed': self.executed, 'io_coalesced': self.coalesced, 'io_in_flight': len(self._calls)}
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,171 @@
+# atomic_file.py
+import os
+import stat
+import errno
+import tempfile
+import threading
+import logging
+from contextlib import contextmanager
+from metrics import file_bytes, lock_wait_seconds
+
+try:
+    import fcntl
+except ImportError:  # 非 POSIX 系统（例如 Windows）只能使用进程内的锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 当前线程持有的文件锁: {锁文件路径: [文件描述符, 重入次数, 是否为排他锁]}
+_held = threading.local()
+# 没有 fcntl 时使用的进程内锁
+_fallback_locks = {}
+_fallback_locks_guard = threading.Lock()
+# 新建文件的权限（0666 去掉进程的 umask）。umask 只能通过设置来读取，而且是整个进程共享的，
+# 所以只在导入时（还没有其他线程创建文件）读取一次，写文件时不再修改它
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+NEW_FILE_MODE = 0o666 & ~_UMASK
+
+
+def lock_path_for(path):
+    """
+    获取文件对应的锁文件路径：同目录下的隐藏文件 .<文件名>.lock。
+    符号链接会先被解析，保证指向同一个文件的不同路径使用同一把锁。
+    :param path: 被保护的文件路径
+    :return: 锁文件路径
+    """
+    real = os.path.realpath(path)
+    return os.path.join(os.path.dirname(real), '.' + os.path.basename(real) + '.lock')
+
+
+def _fallback_lock(lock_path):
+    with _fallback_locks_guard:
+        lock = _fallback_locks.get(lock_path)
+        if lock is None:
+            lock = _fallback_locks[lock_path] = threading.RLock()
+        return lock
+
+
+@contextmanager
+def file_lock(path, shared=False):
+    """
+    获取文件的进程间锁（fcntl.flock），用于在多个 gunicorn worker 之间串行化读-改-写。
+    同一线程内可以重入；已持有排他锁时再请求共享锁直接复用。
+    :param path: 被保护的文件路径
+    :param shared: True 表示共享锁（只读），False 表示排他锁
+    """
+    lock_path = lock_path_for(path)
+    held = getattr(_held, 'locks', None)
+    if held is None:
+        held = _held.locks = {}
+
+    entry = held.get(lock_path)
+    if entry is not None:
+        if not shared and not entry[2]:
+            raise RuntimeError(f"不能在持有共享锁时升级为排他锁: {path}")
+        entry[1] += 1
+        try:
+            yield
+        finally:
+            entry[1] -= 1
+        return
+
+    if fcntl is None:
+        lock = _fallback_lock(lock_path)
+        with lock:
+            held[lock_path] = [None, 1, not shared]
+            try:
+                yield
+            finally:
+                del held[lock_path]
+        return
+
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o666)
+    try:
+        with lock_wait_seconds.time('shared' if shared else 'exclusive'):
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        held[lock_path] = [fd, 1, not shared]
+        try:
+            yield
+        finally:
+            del held[lock_path]
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+def file_signature(path):
+    """
+    获取文件的签名（修改时间、大小、inode），用于判断文件是否被修改。
+    :param path: 文件路径
+    :return: (mtime_ns, size, inode)，文件不存在时返回 None
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _fsync_dir(dir_path):
+    """
+    刷新目录项，保证 rename 之后断电也不会丢失。
+    """
+    try:
+        fd = os.open(dir_path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path, content, encoding='utf-8'):
+    """
+    原子地写入文件：先写同目录下的临时文件并刷盘，再用 os.replace 替换目标文件。
+    读者要么看到旧内容，要么看到完整的新内容，不会看到写了一半的文件。
+    目标是符号链接时写入它指向的文件，不会破坏链接。
+    :param path: 目标文件路径
+    :param content: 文件内容，str 或 bytes
+    :param encoding: content 为 str 时使用的编码
+    """
+    target = os.path.realpath(path)
+    dir_path = os.path.dirname(target)
+    data = content.encode(encoding) if isinstance(content, str) else content
+    file_bytes.inc(len(data), 'write')
+
+    try:
+        mode = stat.S_IMODE(os.stat(target).st_mode)
+    except FileNotFoundError:
+        mode = NEW_FILE_MODE
+
+    fd, tmp_path = tempfile.mkstemp(dir=dir_path, prefix='.' + os.path.basename(target) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(tmp_path, mode)
+        try:
+            os.replace(tmp_path, target)
+        except OSError as e:
+            # 单独挂载的文件（docker bind mount）不能被 rename 替换，只能原地写入
+            if e.errno not in (errno.EBUSY, errno.EXDEV, errno.EPERM):
+                raise
+            logger.warning("无法原子替换文件 %s (%s)，改为原地写入", target, e)
+            with open(target, 'wb') as file:
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            os.unlink(tmp_path)
+            return
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    _fsync_dir(dir_path)
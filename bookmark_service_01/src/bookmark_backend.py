@@ -0,0 +1,617 @@
+# bookmark_backend.py
+import os
+import json
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+import yaml_io
+from config import (BOOKMARK_CONFIG_PATH, BOOKMARK_BACKEND, BOOKMARK_SQLITE_PATH, BOOKMARK_SQLITE_SYNCHRONOUS,
+                    BOOKMARK_PAGES_DIR, BOOKMARK_COMPACT_MAX_OPS)
+from bookmark_model import BookmarkModel, Group, Service
+from bookmark_journal import BookmarkJournal, apply_op, put_op, delete_op
+from atomic_file import file_lock, file_signature
+from metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# 书签的存储后端，BookmarkStore 通过它读写持久化的数据：
+#   - YamlBackend：书签配置文件（最近一次合并的快照）+ 写前日志，即原来的存储方式；
+#   - SqliteBackend：SQLite 数据库（WAL 模式，读不阻塞写），分组、服务、页面分别保存在带索引的表中，
+#     单条书签的修改只改动对应的行。书签配置文件（homepage 读取）在后台合并时从数据库导出，
+#     直接编辑书签配置文件（或翻页时复制文件）后，下一次读取会把文件导入数据库。
+# 两个后端提供相同的方法：
+#   groups() / get_service() / upsert() / delete() / list_pages() / load_page()  供脚本（例如 migrate_bookmarks.py）直接使用；
+#   signature() / load() / catch_up() / append() / write() / compact() ...  供 BookmarkStore 使用，调用者需持有书签文件的锁。
+# 页面的翻页、预解析和写回仍然使用页面文件（page_state.py），SQLite 中的页面表是页面文件的索引副本，
+# list_pages() 时按文件签名同步修改过的页面。
+
+# 当前书签数据在 pages 表中的类型和名称（以 . 开头，不会与页面目录中的类型重名）
+ACTIVE_PAGE = ('.active', 'bookmarks')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value
+);
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    type TEXT NOT NULL,
+    name TEXT NOT NULL,
+    position INTEGER NOT NULL DEFAULT 0,
+    signature TEXT,
+    UNIQUE (type, name)
+);
+CREATE TABLE IF NOT EXISTS groups (
+    id INTEGER PRIMARY KEY,
+    page_id INTEGER NOT NULL REFERENCES pages (id) ON DELETE CASCADE,
+    name NOT NULL,
+    position INTEGER NOT NULL,
+    UNIQUE (page_id, name)
+);
+CREATE INDEX IF NOT EXISTS groups_position ON groups (page_id, position);
+CREATE TABLE IF NOT EXISTS services (
+    id INTEGER PRIMARY KEY,
+    group_id INTEGER NOT NULL REFERENCES groups (id) ON DELETE CASCADE,
+    name NOT NULL,
+    position INTEGER NOT NULL,
+    href TEXT,
+    items TEXT NOT NULL,
+    UNIQUE (group_id, name)
+);
+CREATE INDEX IF NOT EXISTS services_position ON services (group_id, position);
+CREATE INDEX IF NOT EXISTS services_href ON services (href);
+CREATE TABLE IF NOT EXISTS ops (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    generation INTEGER NOT NULL,
+    op TEXT NOT NULL
+);
+"""
+
+
+def service_href(items):
+    """
+    服务的第一个链接，保存在 services.href 列中用于按链接查找。
+    """
+    if isinstance(items, list):
+        for item in items:
+            if isinstance(item, dict) and item.get('href'):
+                return str(item['href'])
+    return None
+
+
+def page_names(dir_path):
+    """
+    页面目录中的 YAML 文件名（按名称排序）。
+    """
+    try:
+        return sorted(name for name in os.listdir(dir_path)
+                      if name.endswith(('.yaml', '.yml')) and not name.startswith('.'))
+    except FileNotFoundError:
+        return []
+
+
+class YamlBackend:
+    """
+    书签配置文件 + 写前日志。
+    """
+    name = 'yaml'
+
+    def __init__(self, path=BOOKMARK_CONFIG_PATH, journal=None, pages_dir=BOOKMARK_PAGES_DIR):
+        self.path = path
+        self.journal = journal if journal is not None else BookmarkJournal()
+        self.pages_dir = pages_dir
+        # 已经应用到内存模型的写前日志的末尾偏移量
+        self._offset = 0
+
+    @property
+    def pending(self):
+        return self.journal.pending
+
+    def signature(self):
+        return (file_signature(self.path), file_signature(self.journal.path))
+
+    def load(self):
+        """
+        解析书签文件，并重放写前日志。
+        :return: BookmarkModel
+        """
+        try:
+            model = BookmarkModel.from_list(yaml_io.load_file(self.path) or [])
+        except FileNotFoundError:
+            logger.warning("配置文件不存在: %s，返回空列表", self.path)
+            model = BookmarkModel()
+        replayed, self._offset = self.journal.replay(model)
+        if replayed:
+            logger.info("重放书签写前日志: %s，共 %d 条操作", self.journal.path, replayed)
+        return model
+
+    def catch_up(self, model, old_signature, signature, on_applied=None):
+        """
+        自上次加载以来只有写前日志被追加（书签文件没有变化）时，只重放新增的日志。
+        :param model: 上次加载的 BookmarkModel
+        :param old_signature: 上次加载时的 signature()
+        :param signature: 当前的 signature()
+        :param on_applied: 每条操作应用后的回调 on_applied(op, result)
+        :return: 重放的操作条数，需要完整加载时返回 None
+        """
+        if old_signature is None:
+            return None
+        (yaml_sig, journal_sig), (old_yaml_sig, old_journal_sig) = signature, old_signature
+        if yaml_sig != old_yaml_sig or journal_sig is None:
+            return None
+        if old_journal_sig is not None and journal_sig[2] != old_journal_sig[2]:
+            return None
+        if journal_sig[1] < self._offset:
+            return None
+        replayed, self._offset = self.journal.replay(model, self._offset, on_applied=on_applied)
+        return replayed
+
+    def append(self, ops, model=None, batch=False):
+        """
+        追加一批已经应用到内存模型的操作并刷盘。
+        :param ops: 操作列表
+        :param model: 应用操作后的 BookmarkModel（本后端不需要）
+        :param batch: True 表示整批操作只刷盘一次
+        """
+        self._offset = self.journal.append(ops, fsync='batch' if batch else None)
+
+    def has_pending(self):
+        """
+        是否有尚未合并到书签文件的修改。
+        """
+        return os.path.exists(self.journal.path) and os.path.getsize(self.journal.path) > 0
+
+    def should_compact(self, max_ops):
+        return self.journal.pending >= max_ops
+
+    def write(self, model):
+        """
+        将模型完整写入书签文件，并清空已经包含在其中的写前日志。
+        """
+        yaml_io.dump_file(self.path, model.to_list())
+        self.journal.truncate()
+        self._offset = 0
+
+    def compact(self, model):
+        """
+        把写前日志合并到书签文件中，model 为合并后的模型。
+        """
+        self.write(model)
+
+    def groups(self):
+        """
+        :return: 分组名列表
+        """
+        with file_lock(self.path, shared=True):
+            return self.load().group_names()
+
+    def get_service(self, group_name, service_name):
+        """
+        :return: Service，不存在时返回 None
+        """
+        with file_lock(self.path, shared=True):
+            return self.load().service(group_name, service_name)
+
+    def upsert(self, group_name, service):
+        """
+        新增或覆盖一个书签服务。
+        """
+        with file_lock(self.path):
+            self.append([put_op(group_name, service)])
+
+    def delete(self, group_name, service_name):
+        """
+        删除一个书签服务。
+        """
+        with file_lock(self.path):
+            self.append([delete_op(group_name, service_name)])
+
+    def list_pages(self, type='bookmarks'):
+        """
+        :param type: 页面类型，即页面目录下的子目录名
+        :return: 页面名列表
+        """
+        return page_names(os.path.join(self.pages_dir, type))
+
+    def load_page(self, type, name):
+        """
+        :return: 页面的 BookmarkModel，页面不存在时返回 None
+        """
+        try:
+            return BookmarkModel.from_list(yaml_io.load_file(os.path.join(self.pages_dir, type, name)) or [])
+        except FileNotFoundError:
+            return None
+
+
+class SqliteBackend:
+    """
+    SQLite 数据库（WAL 模式）。
+    每次提交都会增加 meta.version，操作同时记录在 ops 表中，其他进程据此只应用新增的操作；
+    完整替换数据时增加 meta.generation，其他进程需要重新加载。
+    """
+    name = 'sqlite'
+
+    def __init__(self, db_path=BOOKMARK_SQLITE_PATH, path=BOOKMARK_CONFIG_PATH, pages_dir=BOOKMARK_PAGES_DIR,
+                 synchronous=BOOKMARK_SQLITE_SYNCHRONOUS, keep_ops=BOOKMARK_COMPACT_MAX_OPS):
+        self.db_path = db_path
+        # 导出的书签配置文件，同时用作书签的进程间锁
+        self.path = path
+        self.pages_dir = pages_dir
+        self.synchronous = synchronous
+        # 导出后 ops 表中保留的操作条数，落后更多的进程需要重新加载
+        self.keep_ops = keep_ops
+        self._lock = threading.RLock()
+        self._conn = None
+        self._pid = None
+        # 已经应用到内存模型的最后一条操作的 id
+        self._last_op = 0
+        # 自上次导出以来提交的操作条数（仅统计当前进程）
+        self.pending = 0
+
+    def _connect(self):
+        # 连接不能跨 fork 使用，worker 进程中重新打开
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(f'PRAGMA synchronous={self.synchronous}')
+            conn.execute('PRAGMA foreign_keys=ON')
+            conn.executescript(SCHEMA)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    @contextmanager
+    def _transaction(self, write=True):
+        """
+        在一个事务中读写数据库，写事务开始时就获取写锁（BEGIN IMMEDIATE），读事务看到一致的快照。
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.execute('BEGIN IMMEDIATE' if write else 'BEGIN')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    @staticmethod
+    def _meta(conn, key, default=0):
+        row = conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row is not None else default
+
+    @staticmethod
+    def _set_meta(conn, **values):
+        conn.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', values.items())
+
+    @staticmethod
+    def _page_id(conn, type, name, create=True):
+        row = conn.execute('SELECT id FROM pages WHERE type = ? AND name = ?', (type, name)).fetchone()
+        if row is not None or not create:
+            return row and row[0]
+        return conn.execute('INSERT INTO pages (type, name) VALUES (?, ?)', (type, name)).lastrowid
+
+    @staticmethod
+    def _group_id(conn, page_id, group_name, create=False):
+        row = conn.execute('SELECT id FROM groups WHERE page_id = ? AND name = ?', (page_id, group_name)).fetchone()
+        if row is not None or not create:
+            return row and row[0]
+        return conn.execute(
+            'INSERT INTO groups (page_id, name, position) '
+            'VALUES (?, ?, (SELECT COALESCE(MAX(position), -1) + 1 FROM groups WHERE page_id = ?))',
+            (page_id, group_name, page_id)).lastrowid
+
+    def _exported(self, conn):
+        signature = self._meta(conn, 'exported_signature', None)
+        return tuple(json.loads(signature)) if signature else None
+
+    def signature(self):
+        with self._lock:
+            conn = self._connect()
+            rows = dict(conn.execute("SELECT key, value FROM meta WHERE key IN ('generation', 'version')"))
+        return (rows.get('generation', 0), rows.get('version', 0), file_signature(self.path))
+
+    # ---------------------------------------------------------------------------------------
+    # 读写整个页面
+
+    @staticmethod
+    def _read_page(conn, page_id):
+        model = BookmarkModel()
+        groups = {}
+        for group_id, group_name in conn.execute(
+                'SELECT id, name FROM groups WHERE page_id = ? ORDER BY position', (page_id,)):
+            groups[group_id] = model.groups[group_name] = Group(group_name)
+        for group_id, service_name, items in conn.execute(
+                'SELECT s.group_id, s.name, s.items FROM services s JOIN groups g ON g.id = s.group_id '
+                'WHERE g.page_id = ? ORDER BY g.position, s.position', (page_id,)):
+            groups[group_id].services[service_name] = Service(service_name, json.loads(items))
+        return model
+
+    @staticmethod
+    def _write_page(conn, page_id, model):
+        conn.execute('DELETE FROM services WHERE group_id IN (SELECT id FROM groups WHERE page_id = ?)', (page_id,))
+        conn.execute('DELETE FROM groups WHERE page_id = ?', (page_id,))
+        for position, group in enumerate(model.groups.values()):
+            group_id = conn.execute('INSERT INTO groups (page_id, name, position) VALUES (?, ?, ?)',
+                                    (page_id, group.name, position)).lastrowid
+            conn.executemany(
+                'INSERT INTO services (group_id, name, position, href, items) VALUES (?, ?, ?, ?, ?)',
+                ((group_id, service.name, index, service_href(service.items),
+                  json.dumps(service.items, ensure_ascii=False, default=str))
+                 for index, service in enumerate(group.services.values())))
+
+    def _replace(self, conn, model):
+        """
+        在事务中完整替换当前书签数据。
+        :return: 新的版本号
+        """
+        self._write_page(conn, self._page_id(conn, *ACTIVE_PAGE), model)
+        conn.execute('DELETE FROM ops')
+        version = self._meta(conn, 'version') + 1
+        self._set_meta(conn, generation=self._meta(conn, 'generation') + 1, version=version)
+        return version
+
+    def _export(self, model, version):
+        """
+        把模型导出为书签配置文件，并记录导出的版本和文件签名。
+        """
+        yaml_io.dump_file(self.path, model.to_list())
+        with self._transaction() as conn:
+            self._set_meta(conn, exported_version=version,
+                           exported_signature=json.dumps(file_signature(self.path)))
+        self.pending = 0
+
+    @timed('import_bookmarks')
+    def _import_file(self):
+        """
+        把书签配置文件导入数据库（首次使用或者文件被直接修改过）。
+        :return: BookmarkModel
+        """
+        try:
+            model = BookmarkModel.from_list(yaml_io.load_file(self.path) or [])
+        except FileNotFoundError:
+            model = BookmarkModel()
+        with self._transaction() as conn:
+            version = self._replace(conn, model)
+            self._set_meta(conn, exported_version=version,
+                           exported_signature=json.dumps(file_signature(self.path)))
+        logger.info("书签配置文件导入数据库: %s -> %s，共 %d 个书签分组", self.path, self.db_path, len(model))
+        return model
+
+    def load(self):
+        """
+        从数据库读取当前的书签数据。书签配置文件不是最近一次导出的文件时，先把它导入数据库。
+        :return: BookmarkModel
+        """
+        current = file_signature(self.path)
+        with self._transaction(write=False) as conn:
+            page_id = self._page_id(conn, *ACTIVE_PAGE, create=False)
+            exported = self._exported(conn)
+            # 书签配置文件被删除时以数据库为准，下一次合并时重新导出
+            if page_id is not None and (current is None or exported is None or exported == current):
+                self._last_op = self._meta(conn, 'last_op')
+                return self._read_page(conn, page_id)
+        if current is None:
+            return BookmarkModel()
+        model = self._import_file()
+        with self._transaction(write=False) as conn:
+            self._last_op = self._meta(conn, 'last_op')
+        return model
+
+    def catch_up(self, model, old_signature, signature, on_applied=None):
+        """
+        只应用其他进程新提交的操作，参数和返回值与 YamlBackend.catch_up 相同。
+        """
+        if old_signature is None or signature[0] != old_signature[0]:
+            return None
+        with self._transaction(write=False) as conn:
+            if signature[2] != old_signature[2] and signature[2] != self._exported(conn):
+                return None
+            if self._last_op < self._meta(conn, 'ops_floor'):
+                return None
+            rows = conn.execute('SELECT id, op FROM ops WHERE id > ? ORDER BY id', (self._last_op,)).fetchall()
+        for op_id, data in rows:
+            op = json.loads(data)
+            try:
+                result = apply_op(model, op)
+                if on_applied is not None:
+                    on_applied(op, result)
+            except (KeyError, ValueError) as e:
+                logger.warning("忽略无法应用的书签操作: %r %s", op, e)
+            self._last_op = op_id
+        return len(rows)
+
+    def _sync_group(self, conn, page_id, model, group_name):
+        """
+        按内存模型重写一个分组中的服务（移动、调整顺序等涉及位置的操作）。
+        """
+        group = model.group(group_name)
+        if group is None:
+            conn.execute('DELETE FROM groups WHERE page_id = ? AND name = ?', (page_id, group_name))
+            return
+        group_id = self._group_id(conn, page_id, group_name, create=True)
+        conn.execute('DELETE FROM services WHERE group_id = ?', (group_id,))
+        conn.executemany(
+            'INSERT INTO services (group_id, name, position, href, items) VALUES (?, ?, ?, ?, ?)',
+            ((group_id, service.name, index, service_href(service.items),
+              json.dumps(service.items, ensure_ascii=False, default=str))
+             for index, service in enumerate(group.services.values())))
+
+    def _apply_row(self, conn, page_id, op):
+        """
+        按一条不涉及位置的操作修改对应的行。
+        """
+        kind = op['op']
+        if kind == 'put':
+            group_id = self._group_id(conn, page_id, op['group'], create=True)
+            conn.execute(
+                'INSERT INTO services (group_id, name, position, href, items) '
+                'VALUES (?, ?, (SELECT COALESCE(MAX(position), -1) + 1 FROM services WHERE group_id = ?), ?, ?) '
+                'ON CONFLICT (group_id, name) DO UPDATE SET '
+                'position = excluded.position, href = excluded.href, items = excluded.items',
+                (group_id, op['service'], group_id, service_href(op['items']),
+                 json.dumps(op['items'], ensure_ascii=False, default=str)))
+        elif kind == 'delete':
+            conn.execute('DELETE FROM services WHERE name = ? AND group_id = '
+                         '(SELECT id FROM groups WHERE page_id = ? AND name = ?)',
+                         (op['service'], page_id, op['group']))
+        elif kind == 'add_group':
+            self._group_id(conn, page_id, op['group'], create=True)
+        elif kind == 'delete_group':
+            conn.execute('DELETE FROM groups WHERE page_id = ? AND name = ?', (page_id, op['group']))
+        elif kind == 'rename_group':
+            if op['group'] != op['name']:
+                conn.execute('UPDATE OR IGNORE groups SET name = ? WHERE page_id = ? AND name = ?',
+                             (op['name'], page_id, op['group']))
+        else:
+            raise ValueError(f"未知的书签操作: {kind}")
+
+    def append(self, ops, model=None, batch=False):
+        """
+        在一个事务中修改对应的行并记录操作（整批操作原子地提交，batch 参数不需要）。
+        :param ops: 已经应用到内存模型的操作列表
+        :param model: 应用整批操作后的 BookmarkModel，move 和 reorder 操作需要
+        :param batch: 与 YamlBackend 兼容，忽略
+        """
+        with self._transaction() as conn:
+            page_id = self._page_id(conn, *ACTIVE_PAGE)
+            generation = self._meta(conn, 'generation')
+            last_op = self._last_op
+            # move 和 reorder 涉及位置，在整批操作之后按最终的模型重写涉及的分组和分组的顺序
+            resync = set()
+            reordered = False
+            for op in ops:
+                kind = op['op']
+                if kind == 'move':
+                    resync.update((op['group'], op['to_group']))
+                    reordered = True
+                elif kind == 'reorder':
+                    if op.get('group') is not None:
+                        resync.add(op['group'])
+                    reordered = True
+                else:
+                    if kind == 'rename_group' and op['group'] in resync:
+                        resync.discard(op['group'])
+                        resync.add(op['name'])
+                    self._apply_row(conn, page_id, op)
+                last_op = conn.execute('INSERT INTO ops (generation, op) VALUES (?, ?)',
+                                       (generation, json.dumps(op, ensure_ascii=False))).lastrowid
+            if reordered:
+                if model is None:
+                    raise ValueError("move 和 reorder 操作需要应用后的模型")
+                for group_name in resync:
+                    self._sync_group(conn, page_id, model, group_name)
+                conn.executemany('UPDATE groups SET position = ? WHERE page_id = ? AND name = ?',
+                                 ((position, page_id, name) for position, name in enumerate(model.groups)))
+            self._set_meta(conn, version=self._meta(conn, 'version') + 1, last_op=last_op)
+        self._last_op = last_op
+        self.pending += len(ops)
+
+    def has_pending(self):
+        """
+        书签配置文件是否落后于数据库。
+        """
+        if not os.path.exists(self.path):
+            return True
+        with self._transaction(write=False) as conn:
+            return self._meta(conn, 'exported_version', None) != self._meta(conn, 'version')
+
+    def should_compact(self, max_ops):
+        # 导出需要写出全部书签，只由后台线程按间隔执行
+        return False
+
+    def write(self, model):
+        """
+        用模型完整替换数据库中的当前书签数据，并立即导出书签配置文件。
+        """
+        with self._transaction() as conn:
+            version = self._replace(conn, model)
+            self._last_op = self._meta(conn, 'last_op')
+        self._export(model, version)
+
+    def compact(self, model):
+        """
+        导出书签配置文件，并清理导出前的大部分操作记录。model 为与数据库一致的模型。
+        """
+        with self._transaction(write=False) as conn:
+            version = self._meta(conn, 'version')
+        self._export(model, version)
+        with self._transaction() as conn:
+            floor = self._meta(conn, 'last_op') - self.keep_ops
+            if floor > self._meta(conn, 'ops_floor'):
+                conn.execute('DELETE FROM ops WHERE id <= ?', (floor,))
+                self._set_meta(conn, ops_floor=floor)
+
+    def groups(self):
+        with self._transaction(write=False) as conn:
+            return [row[0] for row in conn.execute(
+                'SELECT g.name FROM groups g JOIN pages p ON p.id = g.page_id '
+                'WHERE p.type = ? AND p.name = ? ORDER BY g.position', ACTIVE_PAGE)]
+
+    def get_service(self, group_name, service_name):
+        with self._transaction(write=False) as conn:
+            row = conn.execute(
+                'SELECT s.items FROM services s JOIN groups g ON g.id = s.group_id JOIN pages p ON p.id = g.page_id '
+                'WHERE p.type = ? AND p.name = ? AND g.name = ? AND s.name = ?',
+                ACTIVE_PAGE + (group_name, service_name)).fetchone()
+        return Service(service_name, json.loads(row[0])) if row is not None else None
+
+    def upsert(self, group_name, service):
+        with file_lock(self.path):
+            self.append([put_op(group_name, service)])
+
+    def delete(self, group_name, service_name):
+        with file_lock(self.path):
+            self.append([delete_op(group_name, service_name)])
+
+    def import_page(self, type, name, model, position=0, signature=None):
+        """
+        导入（或替换）一个页面。
+        """
+        with self._transaction() as conn:
+            page_id = self._page_id(conn, type, name)
+            conn.execute('UPDATE pages SET position = ?, signature = ? WHERE id = ?',
+                         (position, json.dumps(signature), page_id))
+            self._write_page(conn, page_id, model)
+
+    def list_pages(self, type='bookmarks'):
+        """
+        同步页面目录中修改过的页面文件后，返回页面名列表。
+        """
+        dir_path = os.path.join(self.pages_dir, type)
+        names = page_names(dir_path)
+        with self._transaction(write=False) as conn:
+            stored = {name: json.loads(signature) if signature else None for name, signature in conn.execute(
+                'SELECT name, signature FROM pages WHERE type = ?', (type,))}
+        for position, name in enumerate(names):
+            path = os.path.join(dir_path, name)
+            signature = file_signature(path)
+            if signature is None or stored.get(name) == list(signature):
+                continue
+            try:
+                model = BookmarkModel.from_list(yaml_io.load_file(path) or [])
+            except Exception as e:
+                logger.warning("导入页面文件失败: %s: %s", path, e)
+                continue
+            self.import_page(type, name, model, position, signature)
+        removed = set(stored) - set(names)
+        if removed:
+            with self._transaction() as conn:
+                conn.executemany('DELETE FROM pages WHERE type = ? AND name = ?', ((type, name) for name in removed))
+        return names
+
+    def load_page(self, type, name):
+        with self._transaction(write=False) as conn:
+            page_id = self._page_id(conn, type, name, create=False)
+            return self._read_page(conn, page_id) if page_id is not None else None
+
+
+def create_backend(name=BOOKMARK_BACKEND):
+    """
+    按配置（BOOKMARK_BACKEND）创建存储后端。
+    """
+    if name == 'sqlite':
+        return SqliteBackend()
+    if name != 'yaml':
+        logger.warning("未知的书签存储后端: %s，使用 yaml", name)
+    return YamlBackend()
@@ -0,0 +1,239 @@
+# bookmark_journal.py
+import os
+import json
+import logging
+from config import BOOKMARK_JOURNAL_PATH, BOOKMARK_JOURNAL_FSYNC
+from bookmark_model import Service, service_change
+from metrics import file_bytes
+
+logger = logging.getLogger(__name__)
+
+# 写前日志（journal）：每行一个 JSON 格式的操作，只追加不修改。
+# 读取时先加载书签配置文件（最近一次合并的快照），再按顺序重放日志中的操作。
+#   {"op": "put", "group": 分组名, "service": 服务名, "items": [{"abbr": ..., "href": ...}]}
+#   {"op": "delete", "group": 分组名, "service": 服务名}
+#   {"op": "add_group", "group": 分组名}
+#   {"op": "delete_group", "group": 分组名}
+#   {"op": "move", "group": 分组名, "service": 服务名, "to_group": 目标分组名, "index": 位置（可选）}
+#   {"op": "rename_group", "group": 分组名, "name": 新分组名}
+#   {"op": "reorder", "group": 分组名（为空时调整分组的顺序）, "order": [名称]}
+# 所有操作都可以重复执行，合并过程中崩溃后再次重放也能得到相同的结果。
+
+
+def put_op(group_name, service):
+    """
+    新增或覆盖书签服务的操作。
+    :param group_name: 分组名
+    :param service: Service
+    """
+    return {'op': 'put', 'group': group_name, 'service': service.name, 'items': service.items}
+
+
+def delete_op(group_name, service_name):
+    """
+    删除书签服务的操作。
+    """
+    return {'op': 'delete', 'group': group_name, 'service': service_name}
+
+
+def add_group_op(group_name):
+    """
+    新增空分组的操作。
+    """
+    return {'op': 'add_group', 'group': group_name}
+
+
+def delete_group_op(group_name):
+    """
+    删除分组的操作。
+    """
+    return {'op': 'delete_group', 'group': group_name}
+
+
+def move_op(group_name, service_name, to_group, index=None):
+    """
+    把书签服务移动到另一个分组或另一个位置的操作。
+    """
+    op = {'op': 'move', 'group': group_name, 'service': service_name, 'to_group': to_group}
+    if index is not None:
+        op['index'] = index
+    return op
+
+
+def rename_group_op(group_name, new_name):
+    """
+    重命名分组的操作。
+    """
+    return {'op': 'rename_group', 'group': group_name, 'name': new_name}
+
+
+def reorder_op(order, group_name=None):
+    """
+    调整分组中服务的顺序（group_name 为空时调整分组的顺序）的操作。
+    """
+    return {'op': 'reorder', 'group': group_name, 'order': list(order)}
+
+
+def apply_op(model, op):
+    """
+    把一条操作应用到书签模型上。
+    :param model: BookmarkModel
+    :param op: 操作字典
+    :return: 操作结果，put 返回 (是否新建了分组, 是否覆盖了已有服务)，
+             move 返回 (是否新建了分组, 移动的服务)，rename_group 返回重命名后的分组（没有修改时为 None），其余返回是否有修改
+    """
+    kind = op['op']
+    if kind == 'put':
+        return model.put_service(op['group'], Service(op['service'], op['items']))
+    if kind == 'delete':
+        return model.remove_service(op['group'], op['service']) is not None
+    if kind == 'add_group':
+        return model.add_group(op['group'])
+    if kind == 'delete_group':
+        return model.remove_group(op['group']) is not None
+    if kind == 'move':
+        return model.move_service(op['group'], op['service'], op['to_group'], op.get('index'))
+    if kind == 'rename_group':
+        return model.rename_group(op['group'], op['name'])
+    if kind == 'reorder':
+        if op.get('group') is None:
+            model.reorder_groups(op['order'])
+        else:
+            group = model.group(op['group'])
+            if group is None:
+                raise KeyError(f"书签分组不存在: {op['group']}")
+            group.reorder(op['order'])
+        return True
+    raise ValueError(f"未知的书签操作: {kind}")
+
+
+def op_changes(op, result):
+    """
+    把已经应用的操作转换为变更推送使用的紧凑字典。
+    :param op: 操作字典
+    :param result: apply_op 的返回值
+    :return: 变化列表，操作没有产生变化时为空
+    """
+    kind = op['op']
+    if kind == 'put':
+        created, replaced = result
+        service = Service(op['service'], op['items'])
+        changes = [{'op': 'group_added', 'group': op['group']}] if created else []
+        changes.append(service_change('service_updated' if replaced else 'service_added', op['group'], service))
+        return changes
+    if not result:
+        return []
+    if kind == 'delete':
+        return [{'op': 'service_removed', 'group': op['group'], 'service': op['service']}]
+    if kind == 'add_group':
+        return [{'op': 'group_added', 'group': op['group']}]
+    if kind == 'delete_group':
+        return [{'op': 'group_removed', 'group': op['group']}]
+    if kind == 'move':
+        created, service = result
+        changes = [{'op': 'service_removed', 'group': op['group'], 'service': op['service']}]
+        if created:
+            changes.append({'op': 'group_added', 'group': op['to_group']})
+        changes.append(service_change('service_added', op['to_group'], service))
+        return changes
+    if kind == 'rename_group':
+        changes = [{'op': 'group_removed', 'group': op['group']}, {'op': 'group_added', 'group': result.name}]
+        changes.extend(service_change('service_added', result.name, service) for service in result.services.values())
+        return changes
+    if kind == 'reorder':
+        return [{'op': 'reordered', 'group': op.get('group'), 'order': list(op['order'])}]
+    return []
+
+
+class BookmarkJournal:
+    """
+    书签的追加日志文件。
+    """
+
+    def __init__(self, path=BOOKMARK_JOURNAL_PATH, fsync=BOOKMARK_JOURNAL_FSYNC):
+        self.path = path
+        self.fsync = fsync
+        # 自上次合并以来追加的操作条数（仅统计当前进程）
+        self.pending = 0
+
+    def append(self, ops, fsync=None):
+        """
+        追加一批操作并刷盘，返回后操作已经持久化。
+        :param ops: 操作列表
+        :param fsync: 刷盘策略，op 或 batch，默认使用 BOOKMARK_JOURNAL_FSYNC
+        :return: 追加后日志的末尾偏移量
+        """
+        fsync = fsync or self.fsync
+        with open(self.path, 'a+b') as file:
+            # 上一次写入在中途崩溃时末尾会留下半行，先补上换行，避免和新的操作拼成一行
+            if file.seek(0, os.SEEK_END) > 0:
+                file.seek(-1, os.SEEK_END)
+                if file.read(1) != b'\n':
+                    file.write(b'\n')
+            start = file.tell()
+            for op in ops:
+                file.write((json.dumps(op, ensure_ascii=False) + '\n').encode('utf-8'))
+                if fsync == 'op':
+                    file.flush()
+                    os.fsync(file.fileno())
+            if fsync != 'op':
+                file.flush()
+                os.fsync(file.fileno())
+            end = file.tell()
+        self.pending += len(ops)
+        file_bytes.inc(end - start, 'write')
+        return end
+
+    def read(self, offset=0):
+        """
+        从指定偏移量开始读取日志中的操作。
+        末尾没有换行的行（其他进程正在写入或写入时崩溃）不会被读取，下次从它的开头继续；
+        中间损坏的行会被跳过。
+        :param offset: 开始读取的偏移量
+        :return: (操作列表, 已读取部分的末尾偏移量)
+        """
+        ops = []
+        try:
+            with open(self.path, 'rb') as file:
+                file.seek(offset)
+                data = file.read()
+        except FileNotFoundError:
+            return ops, 0
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                ops.append(json.loads(line))
+            except ValueError:
+                logger.warning("忽略损坏的书签日志行: %s: %r", self.path, line[:80])
+        return ops, offset + end
+
+    def replay(self, model, offset=0, on_applied=None):
+        """
+        在书签模型上重放日志中的操作。
+        :param model: BookmarkModel
+        :param offset: 开始重放的偏移量，0 表示从头重放
+        :param on_applied: 每条操作应用后的回调 on_applied(op, result)
+        :return: (重放的操作条数, 已重放部分的末尾偏移量)
+        """
+        ops, end = self.read(offset)
+        for op in ops:
+            try:
+                result = apply_op(model, op)
+                if on_applied is not None:
+                    on_applied(op, result)
+            except (KeyError, ValueError) as e:
+                logger.warning("忽略无法重放的书签日志操作: %r %s", op, e)
+        self.pending = len(ops) if offset == 0 else self.pending + len(ops)
+        return len(ops), end
+
+    def truncate(self):
+        """
+        清空日志，在操作已经合并到书签配置文件之后调用。
+        """
+        with open(self.path, 'wb') as file:
+            file.flush()
+            os.fsync(file.fileno())
+        self.pending = 0
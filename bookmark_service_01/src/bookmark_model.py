@@ -0,0 +1,379 @@
+# bookmark_model.py
+import logging
+
+logger = logging.getLogger(__name__)
+
+# bookmarks.yaml 的结构（homepage 使用的格式）：
+# - 分组名:
+#   - 服务名:
+#     - abbr: 缩写
+#       href: 链接
+# 每一层都是“只有一个键的字典”组成的列表，按名称查找需要线性扫描。
+# 这里把它转换为按名称索引的有序字典，查找为 O(1)，并且可以原样序列化回去。
+
+
+class BookmarkFormatError(ValueError):
+    """
+    书签数据的结构无法被模型原样表示（例如重复的分组或服务、不是字典的条目），
+    加载后再写回会改变文件的内容，所以拒绝加载，需要先手动修正。
+    """
+
+
+class Service:
+    """
+    书签服务，对应分组下的一个 {服务名: [{abbr, href}]} 条目。
+    """
+    __slots__ = ('name', 'items')
+
+    def __init__(self, name, items=None):
+        self.name = name
+        # 原始的属性列表，通常只有一个 {abbr, href} 字典，保留其余字段以便原样写回
+        self.items = items if items is not None else []
+
+    @classmethod
+    def create(cls, name, abbr=None, url=None):
+        """
+        按 add_bookmark 的约定创建服务。
+        :param name: 服务名
+        :param abbr: 缩写名
+        :param url: 链接
+        :return: Service
+        """
+        return cls(name, [{'abbr': abbr if abbr else '', 'href': url if url else ''}])
+
+    @property
+    def info(self):
+        """
+        服务的第一个属性字典，即 {abbr, href}。
+        """
+        if isinstance(self.items, list) and self.items and isinstance(self.items[0], dict):
+            return self.items[0]
+        return None
+
+    @property
+    def abbr(self):
+        info = self.info
+        return info.get('abbr', '') if info else ''
+
+    @property
+    def href(self):
+        info = self.info
+        return info.get('href', '') if info else ''
+
+    def to_dict(self):
+        if isinstance(self.items, list):
+            items = [dict(item) if isinstance(item, dict) else item for item in self.items]
+        else:
+            items = self.items
+        return {self.name: items}
+
+    def __repr__(self):
+        return f"Service({self.name!r}, {self.items!r})"
+
+
+class Group:
+    """
+    书签分组，服务按名称保存在有序字典中。
+    """
+    __slots__ = ('name', 'services')
+
+    def __init__(self, name, services=None):
+        self.name = name
+        self.services = {}
+        for service in services or []:
+            self.services[service.name] = service
+
+    def get(self, service_name):
+        return self.services.get(service_name)
+
+    def put(self, service):
+        """
+        添加服务，同名服务会被移除后追加到末尾（与原 add_bookmark 的行为一致）。
+        :param service: Service
+        :return: 是否覆盖了已有的服务
+        """
+        replaced = self.services.pop(service.name, None) is not None
+        self.services[service.name] = service
+        return replaced
+
+    def remove(self, service_name):
+        return self.services.pop(service_name, None)
+
+    def insert(self, service, index=None):
+        """
+        在指定位置插入服务，同名服务会被先移除。
+        :param service: Service
+        :param index: 插入位置，为空时追加到末尾
+        """
+        self.services.pop(service.name, None)
+        if index is None or index >= len(self.services):
+            self.services[service.name] = service
+            return
+        items = list(self.services.items())
+        items.insert(max(index, 0), (service.name, service))
+        self.services = dict(items)
+
+    def reorder(self, names):
+        """
+        调整服务的顺序：names 中的服务按给定顺序排在前面，其余服务保持原来的相对顺序。
+        :param names: 服务名列表，不存在的名称会被忽略
+        """
+        self.services = reorder_dict(self.services, names)
+
+    def service_names(self):
+        return list(self.services)
+
+    def to_dict(self):
+        return {self.name: [service.to_dict() for service in self.services.values()]}
+
+    def __len__(self):
+        return len(self.services)
+
+    def __repr__(self):
+        return f"Group({self.name!r}, {len(self.services)} services)"
+
+
+class BookmarkModel:
+    """
+    书签数据的内存模型，分组按名称保存在有序字典中。
+    """
+    __slots__ = ('groups',)
+
+    def __init__(self, groups=None):
+        self.groups = {}
+        for group in groups or []:
+            self.groups[group.name] = group
+
+    @classmethod
+    def from_list(cls, data):
+        """
+        从 yaml 加载得到的列表构建模型，to_list() 可以原样得到同样的列表（空分组写回时为 []）。
+        :param data: [{分组名: [{服务名: [...]}]}]
+        :return: BookmarkModel
+        :raise BookmarkFormatError: 数据中有模型无法原样表示的部分：不是单键字典的分组或服务条目、
+                重复的分组名、同一分组中重复的服务名
+        """
+        if data is not None and not isinstance(data, list):
+            raise BookmarkFormatError(f"书签数据应为分组列表，实际为 {type(data).__name__}")
+        model = cls()
+        problems = []
+        for position, entry in enumerate(data or [], 1):
+            if not isinstance(entry, dict) or len(entry) != 1:
+                problems.append(f"第 {position} 个分组条目不是“分组名: 服务列表”: {entry!r:.80}")
+                continue
+            [(group_name, services)] = entry.items()
+            if group_name in model.groups:
+                problems.append(f"分组重复: {group_name}")
+                continue
+            if services is not None and not isinstance(services, list):
+                problems.append(f"分组 {group_name} 的服务不是列表: {services!r:.80}")
+                continue
+            group = model.groups[group_name] = Group(group_name)
+            for service_entry in services or []:
+                if not isinstance(service_entry, dict) or len(service_entry) != 1:
+                    problems.append(f"分组 {group_name} 中的条目不是“服务名: 属性”: {service_entry!r:.80}")
+                    continue
+                [(service_name, items)] = service_entry.items()
+                if service_name in group.services:
+                    problems.append(f"分组 {group_name} 中服务重复: {service_name}")
+                    continue
+                group.services[service_name] = Service(service_name, items)
+        if problems:
+            shown = '；'.join(problems[:10])
+            more = f"，另有 {len(problems) - 10} 处" if len(problems) > 10 else ''
+            raise BookmarkFormatError(f"书签数据无法原样加载，请先修正: {shown}{more}")
+        return model
+
+    def to_list(self):
+        """
+        序列化为 homepage 使用的列表格式。
+        :return: [{分组名: [{服务名: [...]}]}]
+        """
+        return [group.to_dict() for group in self.groups.values()]
+
+    def group(self, group_name):
+        return self.groups.get(group_name)
+
+    def group_names(self):
+        return list(self.groups)
+
+    def service(self, group_name, service_name):
+        group = self.groups.get(group_name)
+        return group.get(service_name) if group is not None else None
+
+    def add_group(self, group_name):
+        """
+        添加空分组。
+        :param group_name: 分组名
+        :return: 分组已存在时返回 False
+        """
+        if group_name in self.groups:
+            return False
+        self.groups[group_name] = Group(group_name)
+        return True
+
+    def put_service(self, group_name, service):
+        """
+        添加服务，分组不存在时自动创建。
+        :param group_name: 分组名
+        :param service: Service
+        :return: (是否新建了分组, 是否覆盖了已有服务)
+        """
+        group = self.groups.get(group_name)
+        created = group is None
+        if created:
+            group = self.groups[group_name] = Group(group_name)
+        return created, group.put(service)
+
+    def remove_service(self, group_name, service_name):
+        group = self.groups.get(group_name)
+        return group.remove(service_name) if group is not None else None
+
+    def remove_group(self, group_name):
+        return self.groups.pop(group_name, None)
+
+    def move_service(self, group_name, service_name, to_group, index=None):
+        """
+        把服务移动到另一个分组（或同一分组中的另一个位置），目标分组不存在时自动创建。
+        服务已经在目标分组中、并且不在原分组中时（重复执行）不做修改。
+        :param group_name: 原分组名
+        :param service_name: 服务名
+        :param to_group: 目标分组名
+        :param index: 在目标分组中的位置，为空时追加到末尾
+        :return: (是否新建了分组, 移动的 Service)，没有修改时为 None
+        :raise KeyError: 服务不存在
+        """
+        service = self.service(group_name, service_name)
+        if service is None:
+            if self.service(to_group, service_name) is not None:
+                return None
+            raise KeyError(f"书签服务不存在: {group_name}/{service_name}")
+        self.groups[group_name].remove(service_name)
+        group = self.groups.get(to_group)
+        created = group is None
+        if created:
+            group = self.groups[to_group] = Group(to_group)
+        group.insert(service, index)
+        return created, service
+
+    def rename_group(self, group_name, new_name):
+        """
+        重命名分组，分组的位置不变。
+        新名称已经存在、原分组不存在时（重复执行）不做修改。
+        :param group_name: 原分组名
+        :param new_name: 新分组名
+        :return: 重命名后的 Group，没有修改时为 None
+        :raise KeyError: 分组不存在
+        :raise ValueError: 新名称已被其他分组使用
+        """
+        group = self.groups.get(group_name)
+        if group is None:
+            if new_name in self.groups:
+                return None
+            raise KeyError(f"书签分组不存在: {group_name}")
+        if new_name == group_name:
+            return None
+        if new_name in self.groups:
+            raise ValueError(f"书签分组已存在: {new_name}")
+        group.name = new_name
+        self.groups = {(new_name if name == group_name else name): value for name, value in self.groups.items()}
+        return group
+
+    def reorder_groups(self, names):
+        """
+        调整分组的顺序，规则与 Group.reorder 相同。
+        """
+        self.groups = reorder_dict(self.groups, names)
+
+    def service_count(self):
+        return sum(len(group) for group in self.groups.values())
+
+    def __len__(self):
+        return len(self.groups)
+
+    def __repr__(self):
+        return f"BookmarkModel({len(self.groups)} groups)"
+
+
+def reorder_dict(items, names):
+    """
+    按名称列表调整有序字典的顺序：列出的键按给定顺序排在前面，其余键保持原来的相对顺序。
+    :return: 新的字典
+    """
+    ordered = {name: items[name] for name in names if name in items}
+    for name, value in items.items():
+        if name not in ordered:
+            ordered[name] = value
+    return ordered
+
+
+def annotate_services(bookmarks, extra):
+    """
+    在书签数据（homepage 的列表格式）的每个服务的 {abbr, href} 中附加字段，不修改原数据。
+    :param bookmarks: 书签数据，可以是只读快照
+    :param extra: extra(info) 返回要附加的字段字典，info 为服务的 {abbr, href}
+    :return: 新的书签数据
+    """
+    annotated = []
+    for group in bookmarks:
+        if not isinstance(group, dict):
+            annotated.append(group)
+            continue
+        new_group = {}
+        for group_name, services in group.items():
+            new_services = []
+            for service in services or []:
+                if not isinstance(service, dict):
+                    new_services.append(service)
+                    continue
+                new_service = {}
+                for service_name, items in service.items():
+                    if isinstance(items, list) and items and isinstance(items[0], dict):
+                        info = dict(items[0])
+                        info.update(extra(info))
+                        items = [info] + list(items[1:])
+                    new_service[service_name] = items
+                new_services.append(new_service)
+            new_group[group_name] = new_services
+        annotated.append(new_group)
+    return annotated
+
+
+def service_change(op, group_name, service):
+    """
+    描述服务变化的紧凑字典，用于变更推送。
+    :param op: service_added / service_updated
+    :param group_name: 分组名
+    :param service: Service
+    """
+    return {'op': op, 'group': group_name, 'service': service.name, 'abbr': service.abbr, 'href': service.href}
+
+
+def diff_models(old, new):
+    """
+    比较两个书签模型，得到分组和服务的增删改（不包含顺序的变化）。
+    :param old: 旧的 BookmarkModel
+    :param new: 新的 BookmarkModel
+    :return: 变化列表
+    """
+    changes = []
+    for group_name in old.groups:
+        if group_name not in new.groups:
+            changes.append({'op': 'group_removed', 'group': group_name})
+    for group_name, group in new.groups.items():
+        old_group = old.groups.get(group_name)
+        if old_group is None:
+            changes.append({'op': 'group_added', 'group': group_name})
+            for service in group.services.values():
+                changes.append(service_change('service_added', group_name, service))
+            continue
+        for service_name in old_group.services:
+            if service_name not in group.services:
+                changes.append({'op': 'service_removed', 'group': group_name, 'service': service_name})
+        for service_name, service in group.services.items():
+            old_service = old_group.services.get(service_name)
+            if old_service is None:
+                changes.append(service_change('service_added', group_name, service))
+            elif old_service.items != service.items:
+                changes.append(service_change('service_updated', group_name, service))
+    return changes
@@ -0,0 +1,279 @@
+# bookmark_search.py
+import re
+import heapq
+import bisect
+import threading
+import logging
+from array import array
+from bookmark_store import bookmark_store
+
+logger = logging.getLogger(__name__)
+
+# 书签搜索索引：对分组名、服务名、abbr 和 href 建立三元组（trigram）倒排索引和词前缀索引。
+#   - 查询词长度 >= 3 时，取查询词的三元组中倒排列表最短的一个作为候选，再逐个校验子串，不需要扫描全部书签；
+#   - 查询词长度 < 3 时，在排序后的词表中二分查找以它为前缀的词；
+#   - 多个查询词之间是“与”的关系，按字段权重和匹配方式（完全相同 > 前缀 > 子串）打分排序。
+# 倒排列表是只追加的整数数组，删除和修改只把旧文档标记为失效，失效文档过多时重建索引。
+# 索引通过 bookmark_store.subscribe 增量更新，无法给出具体变化时（reset）在下一次查询时重建。
+
+# 字段权重：服务名 > abbr > 分组名 > 链接
+FIELD_WEIGHTS = (4, 3, 2, 1)
+# 匹配方式的倍数
+EXACT, PREFIX, SUBSTRING = 3, 2, 1
+# 最多校验和打分的候选文档数，超出时（例如只输入一两个字母）只在前面的候选中排序，结果标记为 truncated
+MAX_CANDIDATES = 10000
+# 链接中没有区分度的前缀不参与索引和匹配
+HREF_PREFIX = re.compile(r'^[a-z][a-z0-9+.-]*://(www\.)?')
+TOKEN_SPLIT = re.compile(r'[^0-9a-zÀ-￿]+')
+
+
+def normalize_href(href):
+    return HREF_PREFIX.sub('', str(href or '').lower())
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def tokens(text):
+    return {token for token in TOKEN_SPLIT.split(text) if token}
+
+
+class BookmarkSearchIndex:
+    """
+    书签的内存搜索索引。
+    """
+
+    def __init__(self, store=bookmark_store):
+        self.store = store
+        self._lock = threading.RLock()
+        self._stale = True
+        # 索引对应的书签数据版本号
+        self.version = -1
+        # 重建期间收到的变化，重建后重放版本号更大的部分
+        self._rebuilding = 0
+        self._pending = []
+        self._clear()
+        self.builds = 0
+        store.subscribe(self._on_changed)
+
+    def _clear(self):
+        self._next_id = 0
+        # {文档 id: (分组名, 服务名, abbr, href, 小写的字段元组)}
+        self._docs = {}
+        # {(分组名, 服务名): 文档 id}
+        self._ids = {}
+        # {三元组: array('I', 文档 id)}，{词: array('I', 文档 id)} 以及排序后的词表
+        self._grams = {}
+        self._tokens = {}
+        self._token_list = []
+        self._dead = 0
+
+    # -----------------------------------------------------------------------------------
+    # 索引维护（调用者需持有锁）
+
+    def _add(self, group, service, abbr, href):
+        self._remove(group, service)
+        doc_id = self._next_id
+        self._next_id += 1
+        # YAML 中的名称可能是数字等非字符串的值
+        fields = (str(service).lower(), str(abbr or '').lower(), str(group).lower(), normalize_href(href))
+        self._docs[doc_id] = (group, service, abbr or '', href or '', fields)
+        self._ids[(group, service)] = doc_id
+        grams = set()
+        words = set()
+        for field in fields:
+            grams |= trigrams(field)
+            words |= tokens(field)
+        for gram in grams:
+            posting = self._grams.get(gram)
+            if posting is None:
+                posting = self._grams[gram] = array('I')
+            posting.append(doc_id)
+        for word in words:
+            posting = self._tokens.get(word)
+            if posting is None:
+                posting = self._tokens[word] = array('I')
+                bisect.insort(self._token_list, word)
+            posting.append(doc_id)
+
+    def _remove(self, group, service):
+        doc_id = self._ids.pop((group, service), None)
+        if doc_id is not None:
+            del self._docs[doc_id]
+            self._dead += 1
+
+    def _remove_group(self, group):
+        for key in [key for key in self._ids if key[0] == group]:
+            self._remove(*key)
+
+    def _build(self, entries):
+        self._clear()
+        for entry in entries:
+            self._add(*entry)
+        self._stale = False
+        self.builds += 1
+
+    def _compact(self):
+        """
+        失效文档过多时去掉倒排列表中的失效 id。
+        """
+        if self._dead <= max(1000, len(self._docs) // 4):
+            return
+        entries = [doc[:4] for doc in self._docs.values()]
+        self._build(entries)
+        logger.info("重建书签搜索索引（清理失效文档）: %d 个书签", len(entries))
+
+    def _apply(self, changes):
+        for change in changes:
+            op = change.get('op')
+            if op in ('service_added', 'service_updated'):
+                self._add(change['group'], change['service'], change.get('abbr'), change.get('href'))
+            elif op == 'service_removed':
+                self._remove(change['group'], change['service'])
+            elif op == 'group_removed':
+                self._remove_group(change['group'])
+            elif op == 'reset':
+                self._stale = True
+                return
+
+    def _on_changed(self, version, changes):
+        """
+        bookmark_store 的订阅回调（在书签锁内同步调用）。
+        """
+        with self._lock:
+            if self._stale:
+                if self._rebuilding:
+                    self._pending.append((version, changes))
+                return
+            self._apply(changes)
+            self.version = version
+
+    @staticmethod
+    def _entries(model):
+        return [(group.name, service.name, service.abbr, service.href)
+                for group in model.groups.values() for service in group.services.values()]
+
+    def _ensure_fresh(self):
+        """
+        检查书签文件是否被其他进程修改，索引过期时从书签数据重建。
+        不能在持有索引锁时调用：书签锁内会回调 _on_changed。
+        """
+        self.store.current_version()
+        with self._lock:
+            if not self._stale:
+                return
+            self._rebuilding += 1
+        try:
+            version, entries = self.store.export(self._entries)
+        finally:
+            with self._lock:
+                self._rebuilding -= 1
+        with self._lock:
+            if not self._stale:
+                return
+            self._build(entries)
+            self.version = version
+            pending, self._pending = self._pending, []
+            for change_version, changes in pending:
+                if change_version > version:
+                    self._apply(changes)
+                    self.version = change_version
+            logger.info("构建书签搜索索引: %d 个书签", len(self._docs))
+
+    # -----------------------------------------------------------------------------------
+    # 查询
+
+    def _candidates(self, word):
+        """
+        获取可能包含查询词的文档 id（可能包含失效的 id 和不匹配的文档，需要校验）。
+        :return: 文档 id 的集合
+        """
+        if len(word) >= 3:
+            postings = [self._grams.get(gram) for gram in trigrams(word)]
+            if any(posting is None for posting in postings):
+                return set()
+            postings.sort(key=len)
+            ids = set(postings[0])
+            # 再和第二短的倒排列表求交集，进一步缩小需要校验的范围
+            if len(postings) > 1 and len(ids) > 64:
+                ids.intersection_update(postings[1])
+            return ids
+        start = bisect.bisect_left(self._token_list, word)
+        ids = set()
+        for token in self._token_list[start:]:
+            if not token.startswith(word):
+                break
+            ids.update(self._tokens[token])
+        return ids
+
+    @staticmethod
+    def _score(fields, words):
+        """
+        计算文档的得分，有任何一个查询词不匹配时返回 0。
+        """
+        total = 0
+        for word in words:
+            best = 0
+            for weight, field in zip(FIELD_WEIGHTS, fields):
+                if word in field:
+                    kind = EXACT if field == word else PREFIX if field.startswith(word) else SUBSTRING
+                    if weight * kind > best:
+                        best = weight * kind
+            if not best:
+                return 0
+            total += best
+        return total
+
+    def search(self, query, limit=20):
+        """
+        搜索书签。
+        :param query: 查询字符串，空格分隔的多个词需要同时匹配
+        :param limit: 最多返回的结果数
+        :return: {'results': [{'group', 'service', 'abbr', 'href', 'score'}], 'total': 匹配的书签数, 'truncated': 是否只在部分候选中搜索}
+        """
+        words = [word for word in query.lower().split() if word]
+        # 链接中的协议和 www. 不参与索引，查询词里的也去掉
+        words = [normalize_href(word) or word for word in words]
+        if not words:
+            return {'results': [], 'total': 0, 'truncated': False}
+        self._ensure_fresh()
+        with self._lock:
+            # 多个查询词时先对各自的候选求交集
+            candidates = None
+            for ids in sorted((self._candidates(word) for word in words), key=len):
+                candidates = ids if candidates is None else candidates & ids
+                if not candidates:
+                    break
+            truncated = len(candidates) > MAX_CANDIDATES
+            if truncated:
+                candidates = heapq.nsmallest(MAX_CANDIDATES, candidates)
+            scored = []
+            for doc_id in candidates:
+                doc = self._docs.get(doc_id)
+                if doc is None:
+                    continue
+                score = self._score(doc[4], words)
+                if score:
+                    # 得分相同时先添加的书签排在前面，结果稳定
+                    scored.append((score, -doc_id))
+            results = []
+            for score, doc_id in heapq.nlargest(limit, scored):
+                group, service, abbr, href, _ = self._docs[-doc_id]
+                results.append({'group': group, 'service': service, 'abbr': abbr, 'href': href, 'score': score})
+            self._compact()
+            return {'results': results, 'total': len(scored), 'truncated': truncated}
+
+    def stats(self):
+        with self._lock:
+            return {
+                'documents': len(self._docs),
+                'dead': self._dead,
+                'trigrams': len(self._grams),
+                'tokens': len(self._tokens),
+                'version': self.version,
+                'builds': self.builds,
+            }
+
+
+search_index = BookmarkSearchIndex()
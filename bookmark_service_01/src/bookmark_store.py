@@ -0,0 +1,404 @@
+# bookmark_store.py
+import atexit
+import threading
+import logging
+from contextlib import contextmanager
+from config import BOOKMARK_CONFIG_PATH, BOOKMARK_COMPACT_INTERVAL, BOOKMARK_COMPACT_MAX_OPS
+from bookmark_model import BookmarkModel, diff_models
+from bookmark_journal import apply_op, op_changes
+from bookmark_backend import YamlBackend, create_backend
+from atomic_file import file_lock
+from readonly import freeze
+from metrics import timed
+
+logger = logging.getLogger(__name__)
+
+
+class BookmarkConflict(Exception):
+    """
+    书签数据已经被修改，与客户端提交修改时所基于的版本不一致（乐观并发控制）。
+    """
+
+
+class BookmarkStore:
+    """
+    进程内的书签缓存。
+    持久化的数据（存储后端的签名，例如书签文件和写前日志的修改时间、大小、inode）变化时才会被重新加载，
+    其余情况直接返回内存中的 BookmarkModel。
+    单条书签的修改只追加到写前日志（或 SQLite 数据库），由后台线程定期合并（导出）到书签文件。
+    所有写操作都持有书签文件的进程间锁，书签文件通过临时文件 + os.replace 原子替换。
+    """
+
+    def __init__(self, path=BOOKMARK_CONFIG_PATH, journal=None,
+                 compact_interval=BOOKMARK_COMPACT_INTERVAL, compact_max_ops=BOOKMARK_COMPACT_MAX_OPS, backend=None):
+        """
+        :param path: 书签文件，指定 backend 时忽略
+        :param journal: 写前日志，指定 backend 时忽略
+        :param backend: 存储后端（bookmark_backend.py），默认为 YamlBackend(path, journal)
+        """
+        self.backend = backend if backend is not None else YamlBackend(path, journal)
+        self.path = self.backend.path
+        self.compact_interval = compact_interval
+        self.compact_max_ops = compact_max_ops
+        self._compactor = None
+        self._stop = threading.Event()
+        self._lock = threading.RLock()
+        self._signature = None
+        self._model = None
+        self._snapshot = None
+        # 数据版本号，内存中的数据每次变化都会加一，用于缓存编码后的响应等派生数据
+        self.version = 0
+        # 翻页后内存中的模型比书签文件新，尚未写回（见 swap / flush）
+        self._dirty = False
+        # 当前模型换入时的版本号，用于判断换出时页面是否被修改过
+        self._page_version = None
+        # 数据变化的订阅者 (listener(version, changes), source)
+        self._listeners = []
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def subscribe(self, listener, source=None):
+        """
+        订阅书签数据的变化，每次变化后调用 listener(version, changes)。
+        回调在持有书签锁时同步执行，应尽快返回。
+        changes 中 op 为 reset 时表示无法给出具体变化，订阅者应重新获取全部数据。
+        :param listener: 回调函数
+        :param source: local 只通知当前进程所做的修改，external 只通知从存储后端重新加载的修改
+                       （其他进程写入或直接编辑了书签文件），为空时全部通知
+        """
+        with self._lock:
+            self._listeners.append((listener, source))
+
+    @property
+    def signature(self):
+        """
+        内存中的数据对应的存储后端签名，在订阅回调中读取时为本次变化之后的签名。
+        """
+        return self._signature
+
+    def _changed(self, changes=None, external=False):
+        """
+        内存中的数据发生了变化：丢弃只读快照、增加版本号并通知订阅者。调用者需持有锁。
+        :param changes: 具体的变化列表，为空时不通知（例如合并日志，内容没有变化）
+        :param external: 变化是否从存储后端重新加载而来
+        """
+        self._snapshot = None
+        self.version += 1
+        if not changes:
+            return
+        skip = 'local' if external else 'external'
+        for listener, source in self._listeners:
+            if source == skip:
+                continue
+            try:
+                listener(self.version, changes)
+            except Exception as e:
+                logger.error("书签变化通知失败: %s", str(e), exc_info=True)
+
+    def _signature_now(self):
+        return self.backend.signature()
+
+    @timed('parse_bookmarks')
+    def _parse(self):
+        """
+        从存储后端完整加载书签数据。
+        :return: BookmarkModel
+        """
+        return self.backend.load()
+
+    def _refresh(self):
+        """
+        检查文件签名，必要时重新加载。调用者需持有锁。
+        """
+        signature = self._signature_now()
+        if self._model is not None and (self._dirty or signature == self._signature):
+            self.hits += 1
+            return
+        self.misses += 1
+        # 解析期间持有共享锁，避免读到其他进程合并到一半的书签文件和日志
+        with file_lock(self.path, shared=True):
+            signature = self._signature_now()
+            # 自上次加载以来只有新追加的操作时，只应用这些操作，不必重新加载全部数据
+            if self._model is not None:
+                changes = []
+                applied = self.backend.catch_up(self._model, self._signature, signature,
+                                                on_applied=lambda op, result: changes.extend(op_changes(op, result)))
+                if applied is not None:
+                    self._signature = signature
+                    self._changed(changes, external=True)
+                    return
+            old_model = self._model
+            self._model = self._parse()
+            # 加载时存储后端可能导入了被直接修改的书签文件（见 SqliteBackend.load），重新读取签名
+            signature = self._signature_now()
+        self._signature = signature
+        self.reloads += 1
+        logger.info("重新加载书签配置文件: %s，共 %d 个书签分组", self.path, len(self._model))
+        if old_model is not None:
+            self._changed(diff_models(old_model, self._model), external=True)
+        else:
+            self._changed([{'op': 'reset'}] if self.reloads > 1 else None, external=True)
+
+    @timed('write_bookmarks')
+    def _write(self, changes=None, compact=False):
+        """
+        将内存中的模型完整写入存储后端（书签文件），并清空已经包含在其中的写前日志。调用者需持有锁。
+        写入失败时丢弃缓存，避免内存与磁盘不一致。
+        :param changes: 写入前对模型所做的修改，用于通知订阅者
+        :param compact: True 表示内存中的模型与存储后端一致，只需要合并写前日志（导出书签文件）
+        """
+        self._snapshot = None
+        # 只是把内存中的内容写回文件（例如合并日志）时，不算作页面被修改
+        unmodified = changes is None and self._page_version == self.version
+        try:
+            if compact:
+                self.backend.compact(self._model)
+            else:
+                self.backend.write(self._model)
+            self._dirty = False
+        except BaseException:
+            self._model = None
+            self._signature = None
+            raise
+        self._signature = self._signature_now()
+        self._changed(changes)
+        if unmodified:
+            self._page_version = self.version
+
+    def model(self):
+        """
+        获取当前的书签模型，调用者不应修改它，修改请使用 transaction()。
+        :return: BookmarkModel
+        """
+        with self._lock:
+            self._refresh()
+            return self._model
+
+    def current_version(self):
+        """
+        检查文件是否被修改，并返回当前的数据版本号（命中缓存时只需要一次 stat）。
+        :return: 版本号
+        """
+        with self._lock:
+            self._refresh()
+            return self.version
+
+    def snapshot(self):
+        """
+        获取书签数据的只读快照（homepage 的列表格式），适合只读的 API 直接返回。
+        快照在数据变化后第一次访问时重新生成。
+        :return: 只读的书签数据
+        """
+        with self._lock:
+            self._refresh()
+            if self._snapshot is None:
+                self._snapshot = freeze(self._model.to_list())
+            return self._snapshot
+
+    def load(self):
+        """
+        获取书签数据的可修改副本（homepage 的列表格式）。
+        :return: 书签数据的副本
+        """
+        with self._lock:
+            self._refresh()
+            return self._model.to_list()
+
+    def export(self, fn):
+        """
+        在书签锁内读取模型，得到与某个版本号一致的派生数据（例如重建搜索索引）。
+        之后的变化会以更大的版本号通知订阅者。
+        :param fn: fn(model)，不应修改模型
+        :return: (版本号, fn 的返回值)
+        """
+        with self._lock:
+            self._refresh()
+            return self.version, fn(self._model)
+
+    @contextmanager
+    def transaction(self):
+        """
+        读-改-写事务：在锁内提供最新的模型，正常退出时写回文件。
+        发生异常时丢弃缓存，下一次读取会从磁盘重新加载。
+        """
+        with self._lock, file_lock(self.path):
+            self._refresh()
+            try:
+                yield self._model
+            except BaseException:
+                self._model = None
+                self._snapshot = None
+                self._signature = None
+                raise
+            self._write([{'op': 'reset'}])
+
+    def apply(self, ops, batch=False, precondition=None):
+        """
+        应用一批书签操作：先修改内存中的模型，再追加到写前日志并刷盘，不重写书签文件。
+        任何一条操作失败时整批都不会生效（丢弃内存中的模型，重新从磁盘加载）。
+        :param ops: bookmark_journal 中定义的操作列表
+        :param batch: True 表示整批操作只刷盘一次
+        :param precondition: 在锁内、应用操作之前调用 precondition(version)，返回 False 时不应用
+        :return: 每条操作的结果列表
+        :raise BookmarkConflict: precondition 返回 False
+        """
+        with self._lock, file_lock(self.path):
+            self._refresh()
+            if precondition is not None and not precondition(self.version):
+                raise BookmarkConflict(f"书签数据已被修改: {self.path}")
+            # 写前日志是相对于书签文件的，翻页后尚未写回时先写回书签文件
+            self.flush()
+            self._snapshot = None
+            try:
+                results = [apply_op(self._model, op) for op in ops]
+                self.backend.append(ops, self._model, batch=batch)
+            except BaseException:
+                self._model = None
+                self._signature = None
+                raise
+            self._signature = self._signature_now()
+            self._changed([change for op, result in zip(ops, results) for change in op_changes(op, result)])
+            if self.backend.should_compact(self.compact_max_ops):
+                self.compact()
+            else:
+                self._start_compactor()
+            return results
+
+    def compact(self):
+        """
+        把写前日志合并到书签文件中。
+        :return: 是否执行了合并
+        """
+        with self._lock, file_lock(self.path):
+            if self.flush():
+                return True
+            if not self.backend.has_pending():
+                return False
+            self._refresh()
+            pending = self.backend.pending
+            self._write(compact=True)
+            logger.info("合并书签写前日志到配置文件: %s，共 %d 条操作", self.path, pending)
+            return True
+
+    def _start_compactor(self):
+        """
+        启动后台合并线程（每个进程只启动一次）。
+        """
+        if self._compactor is not None or self.compact_interval <= 0:
+            return
+        self._compactor = threading.Thread(target=self._compact_loop, name='bookmark-compactor', daemon=True)
+        self._compactor.start()
+        atexit.register(self.stop)
+
+    def _compact_loop(self):
+        while not self._stop.wait(self.compact_interval):
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error("合并书签写前日志失败: %s", str(e), exc_info=True)
+
+    def stop(self):
+        """
+        停止后台合并线程，并把剩余的日志合并到书签文件。
+        """
+        self._stop.set()
+        try:
+            self.compact()
+        except Exception as e:
+            logger.error("合并书签写前日志失败: %s", str(e), exc_info=True)
+
+    def swap(self, model):
+        """
+        翻页：把内存中的模型直接替换为另一个页面的模型（指针交换），不读写任何文件。
+        书签文件由 flush() 稍后在后台写回，在此之前当前进程的读取直接使用新的模型。
+        :param model: 新页面的 BookmarkModel
+        :return: (换出的旧模型, 旧模型自换入以来是否被修改过)
+        """
+        with self._lock, file_lock(self.path):
+            self._refresh()
+            old_model = self._model
+            dirty = self._page_version is None or self._page_version != self.version
+            self._model = model
+            self._dirty = True
+            self._changed([{'op': 'reset'}])
+            self._page_version = self.version
+            return old_model, dirty
+
+    def flush(self):
+        """
+        把翻页后尚未写回的模型写入书签文件。
+        :return: 是否执行了写入
+        """
+        with self._lock, file_lock(self.path):
+            if not self._dirty:
+                return False
+            self._write()
+            logger.info("翻页后写回书签配置文件: %s", self.path)
+            return True
+
+    @contextmanager
+    def locked(self):
+        """
+        持有书签锁（线程锁和书签文件的进程间锁），期间其他线程和进程不能修改书签数据，
+        例如翻页时在锁内依次修改翻页配置、交换页面并安排写回。
+        """
+        with self._lock, file_lock(self.path):
+            yield
+
+    @contextmanager
+    def exclusive(self):
+        """
+        在持有书签锁期间由外部直接修改书签文件（例如翻页时复制页面文件）。
+        进入前先合并写前日志，保证书签文件是最新的；退出后丢弃缓存。
+        """
+        with self._lock, file_lock(self.path):
+            self.flush()
+            self.compact()
+            try:
+                yield
+            finally:
+                self.invalidate()
+
+    def save(self, bookmarks):
+        """
+        用完整的书签数据替换文件内容，并直接更新缓存。
+        :param bookmarks: 书签数据（homepage 的列表格式）
+        """
+        with self._lock, file_lock(self.path):
+            self._refresh()
+            old_model = self._model
+            self._model = BookmarkModel.from_list(bookmarks)
+            self._write(diff_models(old_model, self._model))
+
+    def invalidate(self):
+        """
+        丢弃缓存，下一次读取时强制重新加载。
+        """
+        with self._lock:
+            self._model = None
+            self._changed()
+            self._signature = None
+            self._dirty = False
+            self._page_version = None
+
+    def stats(self):
+        """
+        获取缓存的命中统计。
+        :return: 统计信息字典
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'path': self.path,
+                'hits': self.hits,
+                'misses': self.misses,
+                'reloads': self.reloads,
+                'backend': self.backend.name,
+                'journal_pending': self.backend.pending,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+# 进程级别的书签缓存，存储后端由 BOOKMARK_BACKEND 选择
+bookmark_store = BookmarkStore(backend=create_backend())
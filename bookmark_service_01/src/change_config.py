@@ -1,8 +1,10 @@
 # change_config.py
 import os
-import yaml
+import yaml_io
 import logging
 import sys
+from atomic_file import file_lock
+from metrics import timed
 
 # 配置日志
 # logging.basicConfig(
@@ -12,6 +14,9 @@ import sys
 # )
 logger = logging.getLogger(__name__)
 
+# 配置目录：默认为本文件所在目录下的 configs（容器中即 /app/configs），设置了 BOOKMARK_CONFIG_DIR 时使用该目录
+CONFIG_BASE_DIR = os.environ.get('BOOKMARK_CONFIG_DIR') or os.path.join(os.path.dirname(__file__), 'configs')
+
 
 def get_abs_path(file_path, types=""):
     """
@@ -22,21 +27,17 @@ def get_abs_path(file_path, types=""):
     Returns:
         str: 文件的绝对路径
     """
-    # 开发指定相对路径的文件夹，
-    path = "configs" + types
-    # 实际容器中使用的相对路径
+    # 相对路径相对于配置目录（CONFIG_BASE_DIR）下的 types 子目录
     # 容器中的路径：/app/configs/other/next_setting.yaml
     # path = "configs/other"
-    logging.debug(f"获取 {file_path} 文件的绝对路径! ")
+    logger.debug("获取 %s 文件的绝对路径! ", file_path)
     if os.path.isabs(file_path):
-        logging.debug(f"{file_path} 是绝对路径! ")
+        logger.debug("%s 是绝对路径! ", file_path)
         return file_path
     else:
-        # 获取当前脚本所在目录
-        base_dir = os.path.dirname(__file__)
-        base_dir = os.path.join(base_dir, path)
+        base_dir = CONFIG_BASE_DIR + types
         result = os.path.join(base_dir, file_path)
-        logging.debug(f"{file_path} 是相对路径! 转换为绝对路径: {result}")
+        logger.debug("%s 是相对路径! 转换为绝对路径: %s", file_path, result)
         return result
 
 
@@ -56,63 +57,66 @@ def get_config_file_content(file_path, type, config_item):
     """
     config_file_path = get_abs_path(file_path)
     filename = os.path.basename(config_file_path)
-    logging.debug(f"获取配置文件内容: {filename}, 类型: {type}, 配置项: {config_item}")
+    logger.debug("获取配置文件内容: %s, 类型: %s, 配置项: %s", filename, type, config_item)
     try:
         with open(config_file_path, 'r', encoding='utf-8') as f:
             # 读取文件
-            config_file_content = yaml.safe_load(f)
+            config_file_content = yaml_io.load(f)
             # 返回读取的指定值
             result = config_file_content[type][config_item]
-            logging.debug(f"获取配置文件内容: {filename}, 类型: {type}, 配置项: {config_item}, 成功！ 值: {result}")
+            logger.debug("获取配置文件内容: %s, 类型: %s, 配置项: %s, 成功！ 值: %s", filename, type, config_item, result)
             return result
         # yaml 的配置，使用不同的配置，加载出来的是 dist和list， 使用了 - 开头加载出来的就是  list
     except Exception as e:
-        logger.error(f"获取配置文件内容失败！{config_file_path} {e}")
+        logger.error("获取配置文件内容失败！%s %s", config_file_path, e)
 
 
 # 修改配置文件中 指定类型 的配置项的值
 def change_config_file_content(file_path, type, config_item, config_value):
     config_file_path = get_abs_path(file_path)
     filename = os.path.basename(config_file_path)
-    logging.debug(f"修改配置文件内容: {filename}, 类型: {type}, 配置项: {config_item},  新值: {config_value}")
+    logger.debug("修改配置文件内容: %s, 类型: %s, 配置项: %s,  新值: %s", filename, type, config_item, config_value)
     try:
         old_value = {}
-        with open(config_file_path, 'r', encoding='utf-8') as f:
-            # 指定使用 FullLoader 加载器，这是一种安全的加载方式，可以防止潜在的代码执行漏洞
-            config_file_content = yaml.load(f, Loader=yaml.FullLoader)
-            # 修改指定配置项的值
-            old_value = config_file_content[type][config_item]
-            config_file_content[type][config_item] = config_value  
-        # 将修改后的内容写回文件
-        with open(config_file_path, 'w', encoding='utf-8') as f:
-            yaml.dump(config_file_content, f, allow_unicode=True)
+        # 读-改-写期间持有进程间锁，避免多个 worker 同时修改时丢失更新
+        with file_lock(config_file_path):
+            with open(config_file_path, 'r', encoding='utf-8') as f:
+                # 使用安全加载器（优先 libyaml 的 C 实现），可以防止潜在的代码执行漏洞
+                config_file_content = yaml_io.load(f)
+                # 修改指定配置项的值
+                old_value = config_file_content[type][config_item]
+                config_file_content[type][config_item] = config_value  
+            # 将修改后的内容原子地写回文件，读者不会看到写了一半的文件
+            yaml_io.dump_file(config_file_path, config_file_content)
         
-        logging.debug(f"修改配置文件内容: {filename}, 类型: {type}, 配置项: {config_item},  新值: {config_value} 成功！ 原值：{old_value}")
+        logger.debug("修改配置文件内容: %s, 类型: %s, 配置项: %s,  新值: %s 成功！ 原值：%s", filename, type, config_item, config_value, old_value)
     except Exception as e:
-        logger.error(f"修改配置文件失败！{config_file_path} {e}")
+        logger.error("修改配置文件失败！%s %s", config_file_path, e)
 
 
 # 复制指定配置到指定文件
 # 获取配置文件1内容，覆盖配置文件2的内容。
+@timed('copy_config_file_content')
 def copy_config_file_content(config_file_path_1, config_file_path_2):
     try:
         file1 = get_abs_path(config_file_path_1)
         file2 = get_abs_path(config_file_path_2)
         # 检查文件是否存在
         if not os.path.exists(file1):
-            logger.error(f"源配置文件不存在: {file1}")
+            logger.error("源配置文件不存在: %s", file1)
             return
         if not os.path.exists(os.path.dirname(file2)):
-            logger.error(f"目标配置文件目录不存在: {os.path.dirname(file2)}")
+            logger.error("目标配置文件目录不存在: %s", os.path.dirname(file2))
             return
-        with open(file1, 'r', encoding='utf-8') as f:
-            config_file_content_1 = yaml.load(f, Loader=yaml.FullLoader)
-        with open(file2, 'w', encoding='utf-8') as f:
-            # allow_unicode=True 可以让 PyYAML 输出中文而不是 \u 形式
-            yaml.dump(config_file_content_1, f, allow_unicode=True)
-        logger.info(f"复制配置文件成功！{file1} -> {file2}")
+        with file_lock(file1, shared=True):
+            with open(file1, 'r', encoding='utf-8') as f:
+                config_file_content_1 = yaml_io.load(f)
+        with file_lock(file2):
+            # yaml_io.dump 使用 allow_unicode=True，输出中文而不是 \u 形式
+            yaml_io.dump_file(file2, config_file_content_1)
+        logger.info("复制配置文件成功！%s -> %s", file1, file2)
     except Exception as e:
-        logger.error(f"复制配置文件失败！{file1} -> {file2} {e}")
+        logger.error("复制配置文件失败！%s -> %s %s", file1, file2, e)
 
 # 复制多个配置文件的内容到指定文件：
 def copy_configs_file_content(config_file_path_1, *config_file_paths):
@@ -122,7 +126,7 @@ def copy_configs_file_content(config_file_path_1, *config_file_paths):
         2. 读取每个配置文件的内容
         3. 合并所有配置文件的内容
         4. 将合并后的内容写入目标文件
-        注意：当前实现存在逻辑问题，all_file_content被设计为列表但yaml.load可能返回字典，
+        注意：当前实现存在逻辑问题，all_file_content被设计为列表但yaml_io.load可能返回字典，
         直接extend会导致数据结构错误，需要根据实际数据结构调整合并方式
     """
     # 读取多个配置文件的内容，合并到指定文件
@@ -130,21 +134,21 @@ def copy_configs_file_content(config_file_path_1, *config_file_paths):
     for path in config_file_paths:
         try:
             with open(path, 'r', encoding='utf-8') as f:
-                current_file_content = yaml.load(f, Loader=yaml.FullLoader)
+                current_file_content = yaml_io.load(f)
                 # 合并多个配置文件的内容
                 all_file_content.extend(current_file_content)
-                logger.debug(f"读取配置文件成功！{path} 成功！")
+                logger.debug("读取配置文件成功！%s 成功！", path)
         except Exception as e:
-            logger.error(f"读取配置文件失败！{path} {e}")
+            logger.error("读取配置文件失败！%s %s", path, e)
     if not all_file_content:
         try: 
             with open(config_file_path_1, 'w', encoding='utf-8') as f:
-                yaml.dump([], f)
-                logger.debug(f"清空配置文件成功！{config_file_path_1}")
-                yaml.dump(all_file_content, f, encoding='utf-8')
-                logger.debug(f"写入配置文件成功！{config_file_path_1}")
+                yaml_io.dump([], f)
+                logger.debug("清空配置文件成功！%s", config_file_path_1)
+                yaml_io.dump(all_file_content, f)
+                logger.debug("写入配置文件成功！%s", config_file_path_1)
         except Exception as e:
-            logger.error(f"清空配置文件失败！{config_file_path_1} {e}")
+            logger.error("清空配置文件失败！%s %s", config_file_path_1, e)
         return
 
 
@@ -0,0 +1,263 @@
+# change_feed.py
+import os
+import json
+import time
+import threading
+import logging
+from collections import deque
+from config import CHANGE_FEED_PATH, CHANGE_FEED_BACKLOG, CHANGE_FEED_POLL_INTERVAL, CHANGE_FEED_KEEPALIVE
+from bookmark_store import bookmark_store
+from atomic_file import atomic_write, file_lock
+
+logger = logging.getLogger(__name__)
+
+# 书签变更推送：书签或页面每次变化都会生成一个事件 {id, version, changes}。
+# 事件追加到所有 worker 共享的事件日志文件（CHANGE_FEED_PATH）中，id 是日志中的序号，在所有 worker 之间通用：
+# 客户端断线重连到任意一个 worker 时带上最后收到的 id 即可只获取之后的事件；
+# id 超出保留的历史（或者事件日志被删除重建）时，会收到 reset 事件，需要重新获取全部书签。
+# 每个 worker 只发布自己所做的修改（包括翻页），其他 worker 的事件通过定期读取事件日志获得；
+# 从存储后端重新加载的修改（例如直接编辑了书签文件）按存储后端的签名去重，只由第一个发现的 worker 发布。
+# version 是发布事件的 worker 的书签数据版本号，只在同一个 worker 内有意义。
+
+
+class ChangeFeed:
+    """
+    多进程共享的变更事件队列，内存中保留最近的若干条事件供断线重连使用。
+    """
+
+    def __init__(self, path=CHANGE_FEED_PATH, backlog=CHANGE_FEED_BACKLOG):
+        self.path = path
+        self.backlog = backlog
+        self._seq = 0
+        self._events = deque(maxlen=backlog)
+        self._cond = threading.Condition()
+        # 已经读取到的事件日志位置（inode, 偏移量）和行数
+        self._inode = None
+        self._offset = 0
+        self._lines = 0
+
+    @property
+    def last_id(self):
+        with self._cond:
+            self._read()
+            return str(self._seq)
+
+    def _read(self):
+        """
+        读取事件日志中其他 worker 新追加的事件，有新事件时唤醒所有等待的连接。调用者需持有锁。
+        """
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if st.st_ino != self._inode or st.st_size < self._offset:
+            # 事件日志被截断重写，从头读取，序号不大于已读事件的行会被跳过
+            self._inode, self._offset, self._lines = st.st_ino, 0, 0
+        if st.st_size == self._offset:
+            return
+        try:
+            with open(self.path, 'rb') as file:
+                file.seek(self._offset)
+                data = file.read()
+        except FileNotFoundError:
+            return
+        # 只处理完整的行，写了一半的行下次再读
+        data = data[:data.rfind(b'\n') + 1]
+        self._offset += len(data)
+        added = False
+        for line in data.splitlines():
+            self._lines += 1
+            try:
+                event = json.loads(line)
+            except ValueError:
+                logger.warning("忽略无法解析的变更事件: %s", line[:200])
+                continue
+            if event['seq'] > self._seq:
+                self._seq = event['seq']
+                self._events.append(event)
+                added = True
+        if added:
+            self._cond.notify_all()
+
+    def sync(self):
+        """
+        读取其他 worker 发布的事件。
+        """
+        with self._cond:
+            self._read()
+
+    def publish(self, changes, version=None, key=None, dedupe=False):
+        """
+        在事件日志的进程间锁内追加一个变更事件，并唤醒所有等待的连接。
+        :param changes: 变化列表
+        :param version: 书签数据版本号
+        :param key: 变化对应的存储后端签名
+        :param dedupe: 保留的事件中已经有相同 key 的事件时不发布
+        :return: 事件字典，被去重时返回 None
+        """
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self._cond, file_lock(self.path):
+            self._read()
+            if dedupe and key is not None and any(event.get('key') == key for event in self._events):
+                return None
+            event = {'id': str(self._seq + 1), 'seq': self._seq + 1, 'version': version, 'changes': changes, 'key': key}
+            data = (json.dumps(event, ensure_ascii=False) + '\n').encode('utf-8')
+            with open(self.path, 'ab') as file:
+                file.write(data)
+            self._read()
+            if self._lines >= 2 * self.backlog:
+                self._truncate()
+            return event
+
+    def _truncate(self):
+        """
+        事件日志只保留最近的 backlog 条事件（原子替换，其他 worker 发现 inode 变化后重新读取）。调用者需持有两个锁。
+        """
+        atomic_write(self.path, ''.join(json.dumps(event, ensure_ascii=False) + '\n' for event in self._events))
+        st = os.stat(self.path)
+        self._inode, self._offset, self._lines = st.st_ino, st.st_size, len(self._events)
+
+    def _since(self, last_id):
+        """
+        获取指定事件之后的所有事件。调用者需持有锁。
+        :return: 事件列表，无法续传时返回 None
+        """
+        if not (last_id or '').isdigit():
+            return None
+        seq = int(last_id)
+        if seq > self._seq:
+            return None
+        if seq == self._seq:
+            return []
+        if not self._events or seq < self._events[0]['seq'] - 1:
+            return None
+        return [event for event in self._events if event['seq'] > seq]
+
+    def wait(self, last_id, timeout):
+        """
+        等待指定事件之后的新事件（当前进程发布的事件立即唤醒，其他 worker 的事件在超时后读取）。
+        :param last_id: 客户端最后收到的事件 id
+        :param timeout: 最长等待时间（秒）
+        :return: 事件列表（超时为空列表），无法续传时返回 None
+        """
+        with self._cond:
+            self._read()
+            events = self._since(last_id)
+            if events == []:
+                self._cond.wait(timeout)
+                self._read()
+                events = self._since(last_id)
+            return events
+
+
+change_feed = ChangeFeed()
+
+
+def _event_key():
+    return repr(bookmark_store.signature)
+
+
+def _on_bookmarks_changed(version, changes):
+    change_feed.publish(changes, version, key=_event_key())
+
+
+def _on_bookmarks_loaded(version, changes):
+    # 其他 worker 的修改已经由它自己发布，这里只发布日志中还没有的（例如直接编辑书签文件）
+    change_feed.publish(changes, version, key=_event_key(), dedupe=True)
+
+
+# 书签的所有写入路径（add_bookmark、save_bookmarks、翻页后的重新加载、其他进程的修改）都会经过 bookmark_store
+bookmark_store.subscribe(_on_bookmarks_changed, source='local')
+bookmark_store.subscribe(_on_bookmarks_loaded, source='external')
+
+
+def publish_page_changed(type, index, active):
+    """
+    发布翻页事件（所有 worker 的连接都会收到）。
+    :param type: 配置类型，例如 bookmarks
+    :param index: 新的页码
+    :param active: 新的活动文件
+    """
+    change_feed.publish([{'op': 'page_changed', 'type': type, 'index': index, 'active': active}])
+
+
+def poll_external_changes():
+    """
+    检查书签文件是否被其他进程修改，有修改时会通过订阅触发变更事件。
+    """
+    try:
+        bookmark_store.current_version()
+    except Exception as e:
+        logger.error("检查书签变化失败: %s", str(e))
+
+
+def reset_event():
+    return {'id': change_feed.last_id, 'version': None, 'changes': [{'op': 'reset'}]}
+
+
+def format_sse(event):
+    """
+    格式化为 server-sent events 的文本。
+    """
+    data = json.dumps({'version': event['version'], 'changes': event['changes']}, ensure_ascii=False)
+    return f"id: {event['id']}\nevent: change\ndata: {data}\n\n"
+
+
+def stream_events(last_id=None, poll_interval=CHANGE_FEED_POLL_INTERVAL, keepalive=CHANGE_FEED_KEEPALIVE):
+    """
+    生成 server-sent events 流。
+    :param last_id: 断线重连时客户端最后收到的事件 id，为空时只推送之后的新事件
+    """
+    yield "retry: 3000\n\n"
+    if last_id:
+        events = change_feed.wait(last_id, 0)
+        if events is None:
+            event = reset_event()
+            last_id = event['id']
+            yield format_sse(event)
+        else:
+            for event in events:
+                last_id = event['id']
+                yield format_sse(event)
+    else:
+        last_id = change_feed.last_id
+        yield f"id: {last_id}\nevent: ready\ndata: {{}}\n\n"
+
+    idle_since = time.monotonic()
+    while True:
+        poll_external_changes()
+        events = change_feed.wait(last_id, poll_interval)
+        if events is None:
+            events = [reset_event()]
+        for event in events:
+            last_id = event['id']
+            yield format_sse(event)
+        if events:
+            idle_since = time.monotonic()
+        elif time.monotonic() - idle_since >= keepalive:
+            idle_since = time.monotonic()
+            yield ": keepalive\n\n"
+
+
+def long_poll(last_id=None, timeout=30.0, poll_interval=CHANGE_FEED_POLL_INTERVAL):
+    """
+    长轮询：等待指定事件之后的新事件，超时返回空列表。
+    :param last_id: 客户端最后收到的事件 id，为空时返回当前的 id 作为起点
+    :param timeout: 最长等待时间（秒）
+    :return: {'last_id': ..., 'events': [...], 'reset': bool}
+    """
+    if not last_id:
+        return {'last_id': change_feed.last_id, 'events': [], 'reset': False}
+    deadline = time.monotonic() + timeout
+    while True:
+        poll_external_changes()
+        remaining = deadline - time.monotonic()
+        events = change_feed.wait(last_id, max(0.0, min(poll_interval, remaining)))
+        if events is None:
+            return {'last_id': change_feed.last_id, 'events': [], 'reset': True}
+        if events or remaining <= 0:
+            return {
+                'last_id': events[-1]['id'] if events else last_id,
+                'events': [{'id': e['id'], 'version': e['version'], 'changes': e['changes']} for e in events],
+                'reset': False,
+            }
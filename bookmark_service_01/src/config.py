@@ -1,7 +1,9 @@
 # config.py
 import os
-import yaml
 import logging
+from dir_index import dir_index_cache
+from yaml_cache import yaml_cache
+from metrics import timed
 
 # 配置日志
 # logging.basicConfig(
@@ -10,63 +12,173 @@ import logging
 # )
 logger = logging.getLogger(__name__)
 
-# 书签配置文件的路径
-BOOKMARK_CONFIG_PATH = os.path.join(os.getcwd(), '/app/configs/bookmarks.yaml')
+# 书签配置文件的路径，配置目录可以用 BOOKMARK_CONFIG_DIR 指定（例如压测时使用生成的数据集）
+BOOKMARK_CONFIG_PATH = os.path.join(os.environ.get('BOOKMARK_CONFIG_DIR', '/app/configs'), 'bookmarks.yaml')
 BOOKMARK_DIRS = os.path.dirname(BOOKMARK_CONFIG_PATH)
 
-def get_all_filenames(path=BOOKMARK_DIRS):
+# 书签写前日志（journal）的路径，新增/修改/删除书签时只追加到日志，由后台定期合并到书签配置文件
+BOOKMARK_JOURNAL_PATH = os.path.join(BOOKMARK_DIRS, '.bookmarks.yaml.journal')
+# 后台合并的间隔（秒），以及触发立即合并的日志条数
+BOOKMARK_COMPACT_INTERVAL = float(os.environ.get('BOOKMARK_COMPACT_INTERVAL', '5'))
+BOOKMARK_COMPACT_MAX_OPS = int(os.environ.get('BOOKMARK_COMPACT_MAX_OPS', '1000'))
+# 日志刷盘策略： op 每条操作刷盘一次，batch 每批操作刷盘一次
+BOOKMARK_JOURNAL_FSYNC = os.environ.get('BOOKMARK_JOURNAL_FSYNC', 'op')
+
+# 书签的存储后端（bookmark_backend.py）：yaml 为书签配置文件 + 写前日志，sqlite 为 SQLite 数据库（WAL 模式），
+# 书签配置文件在后台合并时从数据库导出。已有数据用 migrate_bookmarks.py 导入
+BOOKMARK_BACKEND = os.environ.get('BOOKMARK_BACKEND', 'yaml').lower()
+BOOKMARK_SQLITE_PATH = os.environ.get('BOOKMARK_SQLITE_PATH', os.path.join(BOOKMARK_DIRS, 'bookmarks.db'))
+# SQLite 的刷盘策略（PRAGMA synchronous）：FULL 每次提交刷盘，NORMAL 只在检查点刷盘（断电时可能丢失最近的提交）
+BOOKMARK_SQLITE_SYNCHRONOUS = os.environ.get('BOOKMARK_SQLITE_SYNCHRONOUS', 'FULL').upper()
+# 翻页的页面文件所在的目录（其下按类型分子目录，例如 other/bookmarks/page1.yaml）
+BOOKMARK_PAGES_DIR = os.path.join(BOOKMARK_DIRS, 'other')
+
+# 生产环境启动（serve.py）：监听地址、worker 进程数和每个进程的线程数
+SERVE_BIND = os.environ.get('SERVE_BIND', '0.0.0.0:5000')
+SERVE_WORKERS = int(os.environ.get('SERVE_WORKERS', '1'))
+SERVE_THREADS = int(os.environ.get('SERVE_THREADS', '8'))
+
+# 配置文件列表（/api/config/files）的默认每页文件数和最大每页文件数
+CONFIG_FILES_PAGE_SIZE = int(os.environ.get('CONFIG_FILES_PAGE_SIZE', '200'))
+CONFIG_FILES_MAX_PAGE_SIZE = int(os.environ.get('CONFIG_FILES_MAX_PAGE_SIZE', '1000'))
+
+# 异步模式（ASYNC_API=1）：只读接口使用 async 视图，文件读取在有界线程池中执行（最多 ASYNC_IO_WORKERS 个线程），
+# 相同文件的并发读取合并为一次
+ASYNC_API = os.environ.get('ASYNC_API', '0').lower() in ('1', 'true', 'yes')
+ASYNC_IO_WORKERS = int(os.environ.get('ASYNC_IO_WORKERS', '8'))
+
+# 翻页后是否在后台延迟写回页面文件和书签配置文件（翻页本身只在内存中交换已解析的页面）。
+# 延迟写回要求只有一个进程修改页面文件，多进程部署时默认关闭，改为在翻页请求中同步写回。
+PAGE_PERSIST_LAZY = os.environ.get('PAGE_PERSIST_LAZY', '1' if SERVE_WORKERS <= 1 else '0').lower() in ('1', 'true', 'yes')
+
+# 书签变更推送（/api/bookmarks/events）：所有 worker 共享的事件日志文件、保留的历史事件条数、
+# 检查其他进程修改的间隔（秒）和心跳间隔（秒）
+CHANGE_FEED_PATH = os.path.join(BOOKMARK_DIRS, '.change_feed.jsonl')
+CHANGE_FEED_BACKLOG = int(os.environ.get('CHANGE_FEED_BACKLOG', '1000'))
+CHANGE_FEED_POLL_INTERVAL = float(os.environ.get('CHANGE_FEED_POLL_INTERVAL', '1'))
+CHANGE_FEED_KEEPALIVE = float(os.environ.get('CHANGE_FEED_KEEPALIVE', '15'))
+# 没有指定 mode 参数时的推送方式：sse 或 poll（长轮询）。每个 server-sent events 连接在整个连接期间占用一个
+# worker 线程（gthread），SERVE_THREADS 个连接就会占满一个 worker；多进程部署时默认使用长轮询，
+# 每个请求最多占用线程 timeout 秒（最长 60 秒）
+CHANGE_FEED_MODE = os.environ.get('CHANGE_FEED_MODE', 'sse' if SERVE_WORKERS <= 1 else 'poll').lower()
+
+# 是否在后台访问书签链接（链接检查和图标抓取），离线部署或压测时可以关闭，关闭后仍然可以通过接口手动触发
+BACKGROUND_FETCH = os.environ.get('BACKGROUND_FETCH', '1').lower() in ('1', 'true', 'yes')
+
+# 链接检查（link_checker.py）：结果缓存文件、结果的有效期（秒）、后台扫描的间隔（秒，0 表示只在新增书签和手动触发时检查）、
+# 同时检查的链接数、每个主机同时检查的链接数，以及每个链接的超时时间（秒）
+LINK_CHECK_PATH = os.path.join(BOOKMARK_DIRS, '.link_check.json')
+LINK_CHECK_TTL = float(os.environ.get('LINK_CHECK_TTL', str(24 * 3600)))
+LINK_CHECK_INTERVAL = float(os.environ.get('LINK_CHECK_INTERVAL', str(6 * 3600)))
+LINK_CHECK_CONCURRENCY = int(os.environ.get('LINK_CHECK_CONCURRENCY', '32'))
+LINK_CHECK_PER_HOST = int(os.environ.get('LINK_CHECK_PER_HOST', '4'))
+LINK_CHECK_TIMEOUT = float(os.environ.get('LINK_CHECK_TIMEOUT', '10'))
+
+# 书签图标和标题（favicon_cache.py）：缓存目录、图标文件的总大小上限（字节）、元数据的有效期（秒）、
+# 抓取的线程数、每次请求的超时时间（秒），以及单个网页或图标读取的最大字节数
+FAVICON_CACHE_DIR = os.path.join(BOOKMARK_DIRS, '.favicons')
+FAVICON_CACHE_MAX_BYTES = int(os.environ.get('FAVICON_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+FAVICON_TTL = float(os.environ.get('FAVICON_TTL', str(7 * 24 * 3600)))
+FAVICON_FETCH_WORKERS = int(os.environ.get('FAVICON_FETCH_WORKERS', '4'))
+FAVICON_FETCH_TIMEOUT = float(os.environ.get('FAVICON_FETCH_TIMEOUT', '10'))
+FAVICON_MAX_FETCH_BYTES = int(os.environ.get('FAVICON_MAX_FETCH_BYTES', str(512 * 1024)))
+
+# 日志（app_logging.py）：日志文件、最低级别、格式（text 或 json，每行一个 JSON 对象）、按大小轮转的文件大小（字节）和保留的旧文件数、
+# 后台写日志的队列长度（队列满时丢弃）、INFO 及以下日志按请求采样的比例（1 表示全部保留），以及调试时记录的请求体的最大字符数
+LOG_FILE = os.environ.get('LOG_FILE', 'configs/logs/add_bookmark.log')
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'WARNING').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', '5'))
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+LOG_INFO_SAMPLE_RATE = float(os.environ.get('LOG_INFO_SAMPLE_RATE', '1'))
+LOG_MAX_BODY = int(os.environ.get('LOG_MAX_BODY', '4096'))
+
+def get_all_filenames(path=BOOKMARK_DIRS, pattern=None):
     """
-    获取指定路径下的所有文件的文件名。
+    获取指定路径下的所有文件的文件名（按名称排序，不包含以 . 开头的文件）。
+    目录的文件列表会被缓存，目录内容变化时才重新扫描（见 dir_index.py）。
     :param path: 指定的路径
+    :param pattern: glob 通配符，例如 *.yaml
     :return: 文件名列表
     """
     if not path:
         path = BOOKMARK_DIRS
-        logger.debug(f"路径为空,使用默认配置文件路径！ {BOOKMARK_DIRS}")
+        logger.debug("路径为空,使用默认配置文件路径！ %s", BOOKMARK_DIRS)
     # 确保路径是绝对路径
     path = os.path.abspath(path)  
-    if not os.path.exists(path):
+    if not os.path.isdir(path):
         return []
 
     try:
-        if os.path.exists(path) and os.path.isdir(path):
-            # os.listdir(path)：列出给定路径 path 下的所有文件和子目录的名称（不包含完整路径）。
-            # os.path.join(path, f)：将 path 和文件名 f 拼接成完整路径，用于后续判断是否为文件。
-            # os.path.isFile(...)：判断拼接后的路径是否为文件（而不是目录）。
-            # [f for f in ... if ...]：这是一个列表推导式，遍历所有文件名，仅保留满足条件（是文件）的文件名。
-            # 总结：这行代码返回一个列表，包含 path 目录下的所有文件名（不包括子目录）。
-            result = [f for f in os.listdir(path) if os.path.isfile(os.path.join(path, f))]
-            logger.debug(f"获取到 {len(result)} 个文件名: {result}")
-            return result
-        return []
+        result = dir_index_cache.get(path).names(pattern)
+        logger.debug("获取到 %s 个文件名", len(result))
+        return result
     except Exception as e:
-        logger.error(f"错误的获取文件名列表: {e}")
+        logger.error("错误的获取文件名列表: %s", e)
         return []
 
+def list_config_files(path=BOOKMARK_DIRS, pattern=None, offset=0, limit=CONFIG_FILES_PAGE_SIZE):
+    """
+    分页获取指定路径下的文件及其大小、修改时间。
+    :param path: 指定的路径
+    :param pattern: glob 通配符，例如 *.yaml
+    :param offset: 起始位置
+    :param limit: 每页的文件数，为空时返回全部
+    :return: {'files': [{'name', 'size', 'mtime'}], 'total', 'offset', 'limit', 'next_offset'}
+    """
+    path = os.path.abspath(path or BOOKMARK_DIRS)
+    if not os.path.isdir(path):
+        return {'files': [], 'total': 0, 'offset': offset, 'limit': limit, 'next_offset': None}
+    return dir_index_cache.get(path).page(pattern, offset, limit)
+
+def config_files_version(path=BOOKMARK_DIRS):
+    """
+    获取指定路径下文件列表的版本号，文件被创建、删除或改名时变化（目录未修改时只需要一次 stat）。
+    :param path: 指定的路径
+    :return: 版本号，目录不存在时返回 None
+    """
+    path = os.path.abspath(path or BOOKMARK_DIRS)
+    if not os.path.isdir(path):
+        return None
+    return dir_index_cache.get(path).current_version()
+
+def get_yaml_file_path(dirs=BOOKMARK_DIRS, file_name="bookmarks.yaml"):
+    """
+    获取指定文件路径下指定 YAML 文件的完整路径。
+    :param dirs: 指定的文件路径
+    :param file_name: 默认为 bookmarks.yaml
+    :return: 文件路径，文件不存在或者不是 YAML 文件时返回 None
+    """
+    # 判断 dirs 路径是否存在，如果不存在则使用默认配置路径  
+    if not dirs:
+        dirs = BOOKMARK_DIRS
+        logger.warning("目录路径为空, 使用默认配置目录 %s", dirs)
+    # 判断 file_name 是否存在
+    if not file_name:
+        file_name = "bookmarks.yaml"
+        logger.warning("文件名不存在, 使用默认文件名 %s", file_name)
+    # 拼接完整的文件路径
+    file_path = os.path.join(dirs, file_name)
+
+    if os.path.exists(file_path) and file_path.endswith(('.yaml', '.yml')):
+        return file_path
+    return None
+
+@timed('get_yaml_file_content')
 def get_yaml_file_content(dirs=BOOKMARK_DIRS, file_name="bookmarks.yaml"):
     """
-    获取指定文件路径下指定 YAML 文件的内容。
+    获取指定文件路径下指定 YAML 文件的内容（只读，需要修改时请先用 readonly.thaw() 复制）。
     :param dirs: 指定的文件路径
     :param file_name: 默认为 bookmarks.yaml
     :return: YAML 文件内容，如果读取失败则返回 None
     """
     try:
-        # 判断 dirs 路径是否存在，如果不存在则使用默认配置路径  
-        if not dirs:
-            dirs = BOOKMARK_DIRS
-            logger.warning("目录路径为空, 使用默认配置目录 {dirs}")
-        # 判断 file_name 是否存在
-        if not file_name:
-            file_name = "bookmarks.yaml"
-            logger.warning("文件名不存在, 使用默认文件名 {file_name}")
-        # 拼接完整的文件路径
-        file_path = os.path.join(dirs, file_name)
-
-
-        if os.path.exists(file_path) and file_path.endswith(('.yaml', '.yml')):
-            with open(file_path, 'r', encoding='utf-8') as file:
-                return yaml.safe_load(file)
+        file_path = get_yaml_file_path(dirs, file_name)
+        if file_path is not None:
+            # 文件未修改时直接返回缓存的只读数据（见 yaml_cache.py）
+            return yaml_cache.get(file_path)
         return None
     except Exception as e:
         print(f"错误的获取文件内容: {e}")
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,221 @@
+# dir_index.py
+import os
+import time
+import fnmatch
+import threading
+import logging
+from collections import OrderedDict
+from atomic_file import file_signature
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # watchdog 是可选依赖，没有安装时每次访问都检查目录签名
+    Observer = None
+    FileSystemEventHandler = object
+
+logger = logging.getLogger(__name__)
+
+# 配置目录的文件索引缓存。
+# 目录用 os.scandir 扫描一次（文件类型来自目录项本身，不需要逐个 stat），文件名排序后缓存；
+# 大小和修改时间不缓存，每次返回某一页时只 stat 这一页的文件（原地修改文件内容不会改变目录的修改时间，
+# 也不会让索引失效）。
+# 目录中的文件被创建、删除或者通过 os.replace 原子替换时，目录本身的修改时间都会变化：
+#   - 安装了 watchdog 时由 inotify 等事件直接让索引失效，另外每隔 DIR_INDEX_POLL_INTERVAL 秒检查一次目录签名
+#     （NFS 等网络文件系统收不到其他主机上的修改事件）；
+#   - 没有安装 watchdog 时每次访问检查一次目录签名（一次 stat）。
+# 以 . 开头的文件（锁文件、写前日志、快照、写入中的临时文件）不会出现在索引中。
+DIR_INDEX_WATCH = os.environ.get('DIR_INDEX_WATCH', '1').lower() in ('1', 'true', 'yes')
+DIR_INDEX_POLL_INTERVAL = float(os.environ.get('DIR_INDEX_POLL_INTERVAL', '2'))
+DIR_INDEX_MAX_DIRS = int(os.environ.get('DIR_INDEX_MAX_DIRS', '64'))
+
+
+class _InvalidateHandler(FileSystemEventHandler):
+    def __init__(self, index):
+        super().__init__()
+        self.index = index
+
+    def on_any_event(self, event):
+        self.index.invalidate()
+
+
+class DirectoryIndex:
+    """
+    单个目录的文件索引。
+    """
+
+    def __init__(self, path, watched=False):
+        self.path = path
+        self.watched = watched
+        self._lock = threading.Lock()
+        self._signature = None
+        self._checked = 0.0
+        self._valid = False
+        # 排序后的文件名，以及 {文件名: os.DirEntry}
+        self._names = []
+        self._entries = {}
+        self.scans = 0
+        # 文件列表的版本号，文件被创建、删除或改名时加一，用于缓存渲染好的页面等派生数据
+        self.version = 0
+
+    def invalidate(self):
+        self._valid = False
+
+    def _scan(self):
+        """
+        扫描目录。调用者需持有锁。
+        """
+        signature = file_signature(self.path)
+        entries = {}
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    if entry.is_file():
+                        entries[entry.name] = entry
+                except OSError:
+                    continue
+        names = sorted(entries)
+        if names != self._names:
+            self.version += 1
+        self._entries = entries
+        self._names = names
+        self._signature = signature
+        self._checked = time.monotonic()
+        self._valid = True
+        self.scans += 1
+        logger.debug("扫描配置目录: %s，共 %d 个文件", self.path, len(self._names))
+
+    def _refresh(self):
+        """
+        必要时重新扫描目录。调用者需持有锁。
+        """
+        if self._valid:
+            if self.watched and time.monotonic() - self._checked < DIR_INDEX_POLL_INTERVAL:
+                return
+            self._checked = time.monotonic()
+            if file_signature(self.path) == self._signature:
+                return
+        self._scan()
+
+    def current_version(self):
+        """
+        检查目录是否被修改，并返回文件列表的版本号。
+        :return: 版本号
+        """
+        with self._lock:
+            self._refresh()
+            return self.version
+
+    def names(self, pattern=None):
+        """
+        获取文件名列表（按名称排序）。
+        :param pattern: glob 通配符，例如 *.yaml
+        :return: 文件名列表
+        """
+        with self._lock:
+            self._refresh()
+            names = self._names
+        if pattern:
+            names = fnmatch.filter(names, pattern)
+        return list(names)
+
+    def page(self, pattern=None, offset=0, limit=None):
+        """
+        分页获取文件及其大小、修改时间。
+        :param pattern: glob 通配符
+        :param offset: 起始位置
+        :param limit: 最多返回的文件数，为空时返回全部
+        :return: {'files': [{'name', 'size', 'mtime'}], 'total', 'offset', 'limit', 'next_offset'}
+        """
+        with self._lock:
+            self._refresh()
+            names = self._names
+            entries = self._entries
+        if pattern:
+            names = fnmatch.filter(names, pattern)
+        offset = max(0, offset or 0)
+        end = len(names) if limit is None else offset + max(0, limit)
+        files = []
+        for name in names[offset:end]:
+            try:
+                # 不使用 DirEntry.stat()：它缓存的是扫描时的结果，文件被原地修改后大小和修改时间会过时
+                st = os.stat(entries[name].path)
+            except OSError:
+                continue
+            files.append({'name': name, 'size': st.st_size, 'mtime': st.st_mtime})
+        return {
+            'files': files,
+            'total': len(names),
+            'offset': offset,
+            'limit': limit,
+            'next_offset': end if end < len(names) else None,
+        }
+
+
+class DirectoryIndexCache:
+    """
+    按目录路径缓存 DirectoryIndex，最多保留 DIR_INDEX_MAX_DIRS 个目录（LRU）。
+    """
+
+    def __init__(self, max_dirs=DIR_INDEX_MAX_DIRS, watch=DIR_INDEX_WATCH):
+        self.max_dirs = max_dirs
+        self._lock = threading.Lock()
+        self._indexes = OrderedDict()
+        self._observer = None
+        self._watches = {}
+        if watch and Observer is not None:
+            self._observer = Observer()
+            self._observer.daemon = True
+            self._observer.start()
+
+    def _watch(self, index):
+        """
+        为目录注册文件系统事件，失败时（例如 inotify 数量超出限制）退回轮询。调用者需持有锁。
+        """
+        if self._observer is None:
+            return
+        try:
+            self._watches[index.path] = self._observer.schedule(_InvalidateHandler(index), index.path, recursive=False)
+            index.watched = True
+        except Exception as e:
+            logger.warning("无法监听配置目录: %s，改为轮询: %s", index.path, e)
+
+    def _unwatch(self, path):
+        watch = self._watches.pop(path, None)
+        if watch is not None:
+            try:
+                self._observer.unschedule(watch)
+            except Exception as e:
+                logger.debug("取消监听配置目录失败: %s %s", path, e)
+
+    def get(self, path):
+        """
+        获取目录的索引。
+        :param path: 目录路径
+        :return: DirectoryIndex
+        """
+        path = os.path.realpath(path)
+        with self._lock:
+            index = self._indexes.get(path)
+            if index is not None:
+                self._indexes.move_to_end(path)
+                return index
+            index = self._indexes[path] = DirectoryIndex(path)
+            self._watch(index)
+            while len(self._indexes) > self.max_dirs:
+                evicted, _ = self._indexes.popitem(last=False)
+                self._unwatch(evicted)
+            return index
+
+    def stats(self):
+        with self._lock:
+            return {
+                'dirs': len(self._indexes),
+                'watched': sum(1 for index in self._indexes.values() if index.watched),
+                'scans': sum(index.scans for index in self._indexes.values()),
+            }
+
+
+dir_index_cache = DirectoryIndexCache()
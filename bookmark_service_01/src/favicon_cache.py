@@ -0,0 +1,486 @@
+# favicon_cache.py
+import os
+import json
+import time
+import hashlib
+import threading
+import logging
+import urllib.request
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from config import (FAVICON_CACHE_DIR, FAVICON_CACHE_MAX_BYTES, FAVICON_TTL, FAVICON_FETCH_WORKERS,
+                    FAVICON_FETCH_TIMEOUT, FAVICON_MAX_FETCH_BYTES)
+from atomic_file import atomic_write, file_lock, file_signature
+from bookmark_store import bookmark_store
+from bookmark_model import annotate_services
+from api_change_config import bookmark_page_index
+
+logger = logging.getLogger(__name__)
+
+# 书签的图标和网页标题：每个 href 只抓取一次，保存在服务端，首页不再逐个向外部站点请求图标。
+#   - 新增或修改书签时（bookmark_store.subscribe）立即排队抓取，启动后在后台补齐所有页面中缺少的书签；
+#   - 图标按内容的 sha256 保存在 <缓存目录>/blobs/ 中（内容寻址），多个书签使用同一个图标时只保存一份；
+#   - 图标文件的总大小超过上限时，淘汰最久没有被访问的图标，之后再被访问时重新抓取；
+#   - 元数据（标题、图标的哈希）保存在 <缓存目录>/index.json 中，多个 worker 共用，保存时持有它的进程间锁并合并。
+# 书签的 id 是 href 的哈希（bookmark_id），图标通过 /api/bookmarks/<id>/icon 访问。
+USER_AGENT = 'Mozilla/5.0 (compatible; bookmark-service-favicon/1.0)'
+# 后台补齐的间隔（秒）
+BACKFILL_INTERVAL = 3600
+# 可以识别的图标格式（文件头）
+IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\x00\x00\x01\x00', 'image/x-icon'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+)
+
+
+def bookmark_id(href):
+    """
+    书签的 id：href 的哈希，与分组和页面无关，同一个链接在任何页面中的 id 都相同。
+    """
+    return hashlib.sha1(str(href or '').strip().encode('utf-8')).hexdigest()[:16]
+
+
+def sniff_image(body):
+    """
+    根据文件头判断图标格式。
+    :return: 图标的 Content-Type，不是图片时返回 None
+    """
+    for signature, content_type in IMAGE_SIGNATURES:
+        if body.startswith(signature):
+            return content_type
+    if body[:4] == b'RIFF' and body[8:12] == b'WEBP':
+        return 'image/webp'
+    head = body[:512].lstrip().lower()
+    if head.startswith(b'<svg') or (head.startswith(b'<?xml') and b'<svg' in head):
+        return 'image/svg+xml'
+    return None
+
+
+class PageMetadataParser(HTMLParser):
+    """
+    从网页的 <head> 中读取标题和图标链接，读到 </head> 或 <body> 后忽略剩余内容。
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = None
+        self.icons = []
+        self._in_title = False
+        self._title_parts = []
+        self._done = False
+
+    def handle_starttag(self, tag, attrs):
+        if self._done:
+            return
+        if tag == 'body':
+            self._done = True
+        elif tag == 'title' and self.title is None:
+            self._in_title = True
+        elif tag == 'link':
+            attrs = dict(attrs)
+            rel = (attrs.get('rel') or '').lower().split()
+            if attrs.get('href') and ('icon' in rel or 'apple-touch-icon' in rel):
+                # rel="icon" 优先，其次是 apple-touch-icon
+                self.icons.append((0 if 'icon' in rel else 1, attrs['href']))
+
+    def handle_endtag(self, tag):
+        if tag == 'title' and self._in_title:
+            self._in_title = False
+            self.title = ' '.join(''.join(self._title_parts).split())[:200] or None
+        elif tag == 'head':
+            self._done = True
+
+    def handle_data(self, data):
+        if self._in_title:
+            self._title_parts.append(data)
+
+
+def fetch(url, timeout=FAVICON_FETCH_TIMEOUT, max_bytes=FAVICON_MAX_FETCH_BYTES):
+    """
+    下载网页或图标，超过 max_bytes 的部分不读取。
+    :return: (重定向后的链接, Content-Type, 内容)
+    """
+    request = urllib.request.Request(url, headers={'User-Agent': USER_AGENT, 'Accept': '*/*'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.geturl(), response.headers.get('Content-Type', ''), response.read(max_bytes)
+
+
+def fetch_metadata(href, timeout=FAVICON_FETCH_TIMEOUT, max_bytes=FAVICON_MAX_FETCH_BYTES):
+    """
+    抓取书签的网页标题和图标：先从网页中找图标链接，找不到或下载失败时使用站点根目录的 /favicon.ico。
+    :param href: 书签链接
+    :return: {'title', 'icon_url', 'content_type', 'body', 'error'}，没有图标时 body 为 None
+    """
+    result = {'title': None, 'icon_url': None, 'content_type': None, 'body': None, 'error': None}
+    candidates = []
+    base = href
+    try:
+        base, content_type, page = fetch(href, timeout, max_bytes)
+        if 'html' in content_type.lower() or page.lstrip()[:1] == b'<':
+            parser = PageMetadataParser()
+            charset = 'utf-8'
+            if 'charset=' in content_type.lower():
+                charset = content_type.lower().split('charset=', 1)[1].split(';')[0].strip() or charset
+            try:
+                parser.feed(page.decode(charset, errors='replace'))
+            except LookupError:
+                parser.feed(page.decode('utf-8', errors='replace'))
+            result['title'] = parser.title
+            candidates.extend(urljoin(base, link) for _, link in sorted(parser.icons, key=lambda icon: icon[0]))
+    except Exception as e:
+        result['error'] = str(e) or type(e).__name__
+    candidates.append(urljoin(base, '/favicon.ico'))
+
+    for url in dict.fromkeys(candidates):
+        if urlsplit(url).scheme not in ('http', 'https'):
+            continue
+        try:
+            _, _, body = fetch(url, timeout, max_bytes)
+        except Exception as e:
+            result['error'] = str(e) or type(e).__name__
+            continue
+        content_type = sniff_image(body)
+        if content_type is not None:
+            result.update(icon_url=url, content_type=content_type, body=body, error=None)
+            break
+    return result
+
+
+class FaviconCache:
+    """
+    书签图标和标题的内容寻址缓存。
+    """
+
+    def __init__(self, sources, cache_dir=FAVICON_CACHE_DIR, max_bytes=FAVICON_CACHE_MAX_BYTES, ttl=FAVICON_TTL,
+                 workers=FAVICON_FETCH_WORKERS, timeout=FAVICON_FETCH_TIMEOUT):
+        # sources() 返回需要抓取的全部链接
+        self.sources = sources
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.workers = workers
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        # {href: {'id', 'title', 'hash', 'content_type', 'icon_url', 'fetched_at', 'error'}}
+        self._entries = {}
+        # {图标哈希: {'size', 'content_type', 'used_at'}}
+        self._blobs = {}
+        # {书签 id: href}
+        self._ids = {}
+        self._signature = None
+        self._pending = set()
+        # 元数据的版本号，变化时加一，用于缓存带图标和标题的响应
+        self.version = 0
+        self.fetched = 0
+        self.evictions = 0
+        self.hits = 0
+        self.misses = 0
+
+    # -----------------------------------------------------------------------------------
+    # 索引文件和图标文件
+
+    def blob_path(self, digest):
+        return os.path.join(self.cache_dir, 'blobs', digest[:2], digest)
+
+    def _load(self):
+        """
+        其他 worker 更新了索引文件时重新读取。
+        """
+        signature = file_signature(self.index_path)
+        with self._lock:
+            if signature == self._signature:
+                return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            data = {}
+        except Exception as e:
+            logger.warning("读取书签图标索引失败: %s %s", self.index_path, e)
+            return
+        with self._lock:
+            self._merge(data.get('entries', {}), data.get('blobs', {}))
+            self._signature = signature
+            self.version += 1
+
+    def _merge(self, entries, blobs):
+        """
+        合并索引文件中的内容，同一个链接保留较新的抓取结果。调用者需持有锁。
+        """
+        for href, entry in entries.items():
+            current = self._entries.get(href)
+            if current is None or entry.get('fetched_at', 0) > current.get('fetched_at', 0):
+                self._entries[href] = entry
+                self._ids[entry['id']] = href
+        for digest, blob in blobs.items():
+            current = self._blobs.get(digest)
+            if current is None:
+                self._blobs[digest] = blob
+            else:
+                current['used_at'] = max(current.get('used_at', 0), blob.get('used_at', 0))
+
+    def _save(self, keep=None):
+        """
+        在索引文件的进程间锁内合并其他 worker 的修改，淘汰超出大小上限的图标，再写回索引文件。
+        :param keep: 仍然被书签引用的链接，为空时保留全部
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with file_lock(self.index_path):
+            self._signature = None
+            self._load()
+            with self._lock:
+                if keep is not None:
+                    self._entries = {href: entry for href, entry in self._entries.items() if href in keep}
+                    self._ids = {entry['id']: href for href, entry in self._entries.items()}
+                removed = self._evict()
+                data = json.dumps({'entries': self._entries, 'blobs': self._blobs}, ensure_ascii=False)
+            for digest in removed:
+                try:
+                    os.remove(self.blob_path(digest))
+                except FileNotFoundError:
+                    pass
+            atomic_write(self.index_path, data)
+            with self._lock:
+                self._signature = file_signature(self.index_path)
+                self.version += 1
+
+    def _evict(self):
+        """
+        删除没有被引用的图标，总大小超过上限时再淘汰最久没有被访问的图标。调用者需持有锁。
+        :return: 需要删除的图标哈希列表
+        """
+        used = {entry.get('hash') for entry in self._entries.values()}
+        removed = [digest for digest in self._blobs if digest not in used]
+        for digest in removed:
+            del self._blobs[digest]
+        total = sum(blob['size'] for blob in self._blobs.values())
+        for digest, blob in sorted(self._blobs.items(), key=lambda item: item[1].get('used_at', 0)):
+            if total <= self.max_bytes:
+                break
+            total -= blob['size']
+            del self._blobs[digest]
+            removed.append(digest)
+            self.evictions += 1
+        if removed:
+            gone = set(removed)
+            for entry in self._entries.values():
+                if entry.get('hash') in gone:
+                    # 图标被淘汰，下次访问时重新抓取
+                    entry['hash'] = None
+                    entry['fetched_at'] = 0
+        return removed
+
+    def _store_blob(self, body, content_type):
+        """
+        保存图标，内容相同的图标只保存一份。
+        :return: 图标的哈希
+        """
+        digest = hashlib.sha256(body).hexdigest()
+        path = self.blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_write(path, body)
+        with self._lock:
+            blob = self._blobs.setdefault(digest, {'size': len(body), 'content_type': content_type})
+            blob['used_at'] = time.time()
+        return digest
+
+    # -----------------------------------------------------------------------------------
+    # 抓取
+
+    def _fetch_one(self, href):
+        metadata = fetch_metadata(href, self.timeout)
+        digest = self._store_blob(metadata['body'], metadata['content_type']) if metadata['body'] else None
+        entry = {
+            'id': bookmark_id(href),
+            'title': metadata['title'],
+            'hash': digest,
+            'content_type': metadata['content_type'],
+            'icon_url': metadata['icon_url'],
+            'fetched_at': time.time(),
+            'error': metadata['error'],
+        }
+        with self._lock:
+            self._entries[href] = entry
+            self._ids[entry['id']] = href
+            self.fetched += 1
+
+    def _stale(self, hrefs, now):
+        with self._lock:
+            return [href for href in hrefs
+                    if href not in self._entries or now - self._entries[href].get('fetched_at', 0) >= self.ttl]
+
+    def refresh(self, hrefs=None):
+        """
+        抓取没有缓存或已经过期的链接，在调用线程中执行（抓取本身在线程池中并发进行）。
+        :param hrefs: 需要检查的链接，为空时检查所有页面中的链接
+        :return: 抓取的链接数
+        """
+        full = hrefs is None
+        hrefs = {str(href).strip() for href in (self.sources() if full else hrefs) if href}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # 抓取期间持有索引文件的进程间锁，其他 worker 等待后重新读取索引，只抓取仍然过期的链接
+        with file_lock(self.index_path):
+            self._load()
+            urls = [href for href in sorted(self._stale(hrefs, time.time())) if urlsplit(href).scheme in ('http', 'https')]
+            if urls:
+                with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='favicon-fetch') as executor:
+                    for href, error in zip(urls, executor.map(self._safe_fetch, urls)):
+                        if error:
+                            logger.warning("抓取书签图标失败: %s %s", href, error)
+            if urls or full:
+                # 没有取得任何链接时（例如页面索引还没有构建完成）不清理索引
+                self._save(hrefs if full and hrefs else None)
+        if urls:
+            logger.info("抓取书签图标和标题: %d 个", len(urls))
+        return len(urls)
+
+    def _safe_fetch(self, href):
+        try:
+            self._fetch_one(href)
+            return None
+        except Exception as e:
+            return str(e)
+
+    # -----------------------------------------------------------------------------------
+    # 后台线程
+
+    def _on_changed(self, version, changes):
+        """
+        bookmark_store 的订阅回调：新增或修改的书签排队抓取。
+        """
+        urls = {change.get('href') for change in changes if change.get('op') in ('service_added', 'service_updated')}
+        urls.discard(None)
+        urls.discard('')
+        if urls and self._thread is not None:
+            with self._lock:
+                self._pending |= urls
+            self._wake.set()
+
+    def _run(self):
+        full = True
+        while True:
+            try:
+                with self._lock:
+                    pending, self._pending = self._pending, set()
+                if full:
+                    self.refresh()
+                # 已经抓取过的链接不会重复抓取
+                if pending:
+                    self.refresh(pending)
+            except Exception as e:
+                logger.error("抓取书签图标失败: %s", str(e), exc_info=True)
+            # 被唤醒时只处理排队的链接，超时时补齐全部
+            full = not self._wake.wait(BACKFILL_INTERVAL)
+            self._wake.clear()
+
+    def start(self, store=bookmark_store):
+        """
+        启动后台抓取线程（每个进程只启动一次）。
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='favicon-cache', daemon=True)
+        store.subscribe(self._on_changed)
+        self._thread.start()
+
+    def schedule(self, href):
+        """
+        把链接排队抓取（在后台线程中执行）。
+        """
+        with self._lock:
+            self._pending.add(href)
+        self.start()
+        self._wake.set()
+
+    # -----------------------------------------------------------------------------------
+    # 查询
+
+    def _resolve(self, id):
+        """
+        根据书签 id 找到链接，索引中没有时在所有页面的链接中查找。
+        """
+        self._load()
+        with self._lock:
+            href = self._ids.get(id)
+        if href is not None:
+            return href
+        for href in self.sources():
+            if bookmark_id(href) == id:
+                return str(href).strip()
+        return None
+
+    def icon(self, id):
+        """
+        获取书签的图标。没有缓存时在后台抓取。
+        :param id: 书签 id
+        :return: (图标哈希, Content-Type, 内容)；书签不存在时返回 None，图标暂时没有时返回 (None, None, None)
+        """
+        href = self._resolve(id)
+        if href is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(href)
+            digest = entry.get('hash') if entry else None
+            blob = self._blobs.get(digest) if digest else None
+            if blob is not None:
+                blob['used_at'] = time.time()
+        if blob is not None:
+            try:
+                with open(self.blob_path(digest), 'rb') as file:
+                    body = file.read()
+                with self._lock:
+                    self.hits += 1
+                return digest, blob['content_type'], body
+            except FileNotFoundError:
+                # 图标已被其他 worker 淘汰，重新抓取
+                entry = None
+        with self._lock:
+            self.misses += 1
+        if entry is None or not entry.get('fetched_at') or time.time() - entry['fetched_at'] >= self.ttl:
+            self.schedule(href)
+        return None, None, None
+
+    def metadata(self, href):
+        with self._lock:
+            return self._entries.get(str(href or '').strip())
+
+    def annotate(self, bookmarks):
+        """
+        在书签数据的每个服务的 {abbr, href} 中附加 id、title 和 icon（图标的访问路径，没有图标时为 None）。
+        """
+        self._load()
+
+        def extra(info):
+            href = str(info.get('href') or '').strip()
+            id = bookmark_id(href)
+            entry = self.metadata(href) or {}
+            return {'id': id, 'title': entry.get('title'),
+                    'icon': f"/api/bookmarks/{id}/icon" if entry.get('hash') else None}
+
+        return annotate_services(bookmarks, extra)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'icons': len(self._blobs),
+                'bytes': sum(blob['size'] for blob in self._blobs.values()),
+                'max_bytes': self.max_bytes,
+                'fetched': self.fetched,
+                'evictions': self.evictions,
+                'hits': self.hits,
+                'misses': self.misses,
+                'version': self.version,
+            }
+
+
+favicon_cache = FaviconCache(bookmark_page_index.hrefs)
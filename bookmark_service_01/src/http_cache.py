@@ -0,0 +1,93 @@
+# http_cache.py
+import gzip
+import hashlib
+import threading
+import logging
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # brotli 是可选依赖，没有安装时只提供 gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+
+class EncodedBody:
+    """
+    编码好的响应体，以及预先压缩好的 gzip / brotli 版本。
+    ETag 是响应体内容的哈希，多个 worker 对相同的内容会得到相同的 ETag。
+    """
+    __slots__ = ('body', 'mimetype', 'etag', 'encoded')
+
+    def __init__(self, body, mimetype='application/json'):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.sha1(body).hexdigest()
+        # {编码: (压缩后的内容, 该表示的 ETag)}，不同的表示使用不同的强 ETag
+        self.encoded = {'identity': (body, self.etag)}
+        self.encoded['gzip'] = (gzip.compress(body, compresslevel=6, mtime=0), self.etag + '-gzip')
+        if brotli is not None:
+            self.encoded['br'] = (brotli.compress(body), self.etag + '-br')
+
+    def etags(self):
+        return [etag for _, etag in self.encoded.values()]
+
+
+def cached_response(entry, cache_control='no-cache'):
+    """
+    根据请求的 If-None-Match 和 Accept-Encoding 返回 304 或预先压缩好的响应。
+    :param entry: EncodedBody
+    :param cache_control: Cache-Control 响应头，默认要求客户端每次都重新验证
+    :return: Flask Response
+    """
+    encoding = request.accept_encodings.best_match(list(entry.encoded), default='identity')
+    body, etag = entry.encoded.get(encoding) or entry.encoded['identity']
+
+    if any(request.if_none_match.contains_weak(tag) for tag in entry.etags()):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype=entry.mimetype)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+class ResponseCache:
+    """
+    按数据版本号缓存编码好的响应体，版本号变化时才重新编码。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version, build):
+        """
+        获取指定版本的响应体，不存在时调用 build() 生成并缓存。
+        :param key: 缓存键，例如路由名
+        :param version: 数据版本号
+        :param build: 生成 EncodedBody 的函数
+        :return: EncodedBody
+        """
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached[0] == version:
+                self.hits += 1
+                return cached[1]
+        entry = build()
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (version, entry)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,350 @@
+# link_checker.py
+import ssl
+import json
+import time
+import asyncio
+import threading
+import logging
+from urllib.parse import urlsplit, urljoin
+from config import (LINK_CHECK_PATH, LINK_CHECK_TTL, LINK_CHECK_INTERVAL, LINK_CHECK_CONCURRENCY,
+                    LINK_CHECK_PER_HOST, LINK_CHECK_TIMEOUT)
+from atomic_file import atomic_write, file_lock, file_signature
+from bookmark_store import bookmark_store
+from bookmark_model import annotate_services
+from api_change_config import bookmark_page_index
+
+logger = logging.getLogger(__name__)
+
+# 书签链接检查：在后台线程的事件循环中并发检查所有页面中的 href，找出失效的链接。
+#   - 同时检查的链接数不超过 concurrency，同一个主机同时检查的链接数不超过 per_host；
+#   - 先发送 HEAD 请求，失败（4xx/5xx，很多站点不支持 HEAD）时再用 GET 请求确认，GET 只读取响应头；
+#   - 跟随最多 MAX_REDIRECTS 次重定向，每个链接的总耗时不超过 timeout；
+#   - 结果保存在 LINK_CHECK_PATH（JSON）中，有效期内不会重复检查。多个 worker 共用这个文件，
+#     扫描期间持有它的进程间锁，其他 worker 等待后直接使用已经保存的结果。
+# 新增或修改的书签通过 bookmark_store.subscribe 立即排队检查。
+MAX_REDIRECTS = 5
+USER_AGENT = 'bookmark-service-link-checker/1.0'
+
+
+class LinkCheckError(Exception):
+    """
+    链接无法检查（不支持的协议、响应格式错误等）。
+    """
+
+
+async def fetch_status(url, method, timeout):
+    """
+    发送一次 HTTP 请求，只读取状态行和响应头。
+    :param url: 链接
+    :param method: HEAD 或 GET
+    :param timeout: 超时时间（秒）
+    :return: (状态码, 小写键名的响应头字典)
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise LinkCheckError(f"不支持的链接: {url}")
+    https = parts.scheme == 'https'
+    port = parts.port or (443 if https else 80)
+    host = parts.hostname if parts.port is None else f"{parts.hostname}:{parts.port}"
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    context = ssl.create_default_context() if https else None
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(parts.hostname, port, ssl=context, server_hostname=parts.hostname if https else None),
+        timeout)
+    try:
+        writer.write((f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: {USER_AGENT}\r\n"
+                      f"Accept: */*\r\nConnection: close\r\n\r\n").encode('latin-1'))
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        fields = status_line.decode('latin-1').split(None, 2)
+        if len(fields) < 2 or not fields[0].startswith('HTTP/') or not fields[1].isdigit():
+            raise LinkCheckError(f"无法识别的响应: {status_line[:80]!r}")
+        headers = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout)
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return int(fields[1]), headers
+    finally:
+        writer.close()
+
+
+async def check_url(url, timeout=LINK_CHECK_TIMEOUT):
+    """
+    检查一个链接：HEAD 失败时用 GET 重试，跟随重定向。
+    重定向超过 MAX_REDIRECTS 次（例如重定向循环）或 3xx 响应没有 Location 头时视为失效。
+    :param url: 链接
+    :param timeout: 超时时间（秒）
+    :return: {'ok', 'status', 'method', 'final_url', 'error'}
+    """
+    result = {'ok': False, 'status': None, 'method': None, 'final_url': url, 'error': None}
+    for method in ('HEAD', 'GET'):
+        # 每种方法单独处理网络错误：有些主机对 HEAD 直接断开连接或不响应，仍然用 GET 重试
+        target = url
+        status = None
+        error = None
+        try:
+            for _ in range(MAX_REDIRECTS + 1):
+                status, headers = await fetch_status(target, method, timeout)
+                if not 300 <= status < 400:
+                    break
+                location = headers.get('location')
+                if not location:
+                    error = 'redirect without location'
+                    break
+                target = urljoin(target, location)
+            else:
+                error = 'too many redirects'
+        except asyncio.TimeoutError:
+            error = 'timeout'
+        except (OSError, LinkCheckError, ValueError) as e:
+            error = str(e) or type(e).__name__
+        result.update(status=status, method=method, final_url=target,
+                      ok=error is None and status is not None and 200 <= status < 300, error=error)
+        if result['ok']:
+            break
+    return result
+
+
+def link_summary(result):
+    """
+    检查结果中附加到书签数据上的部分。
+    """
+    if result is None:
+        return None
+    return {'ok': result.get('ok'), 'status': result.get('status'), 'error': result.get('error'),
+            'checked_at': result.get('checked_at')}
+
+
+def annotate_links(bookmarks, results):
+    """
+    在书签数据的每个服务的 {abbr, href} 中附加 link 字段（链接检查结果），不修改原数据。
+    :param bookmarks: 书签数据，可以是只读快照
+    :param results: {链接: 检查结果}
+    :return: 新的书签数据
+    """
+    return annotate_services(bookmarks, lambda info: {
+        'link': link_summary(results.get(str(info.get('href') or '').strip()))})
+
+
+class LinkChecker:
+    """
+    书签链接的后台检查器和结果缓存。
+    """
+
+    def __init__(self, sources, path=LINK_CHECK_PATH, ttl=LINK_CHECK_TTL, interval=LINK_CHECK_INTERVAL,
+                 concurrency=LINK_CHECK_CONCURRENCY, per_host=LINK_CHECK_PER_HOST, timeout=LINK_CHECK_TIMEOUT):
+        # sources() 返回需要检查的全部链接
+        self.sources = sources
+        self.path = path
+        self.ttl = ttl
+        self.interval = interval
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        # {链接: {'ok', 'status', 'method', 'final_url', 'error', 'checked_at', 'elapsed_ms'}}
+        self._results = {}
+        self._signature = None
+        # 新增或修改的书签，下一轮立即检查
+        self._pending = set()
+        self._force = False
+        # 检查结果的版本号，结果变化时加一，用于缓存带检查结果的响应
+        self.version = 0
+        self.scanning = False
+        self.scans = 0
+        self.checked = 0
+        self.last_scan_at = None
+        self.last_scan_seconds = None
+
+    # -----------------------------------------------------------------------------------
+    # 结果缓存文件
+
+    def _load(self):
+        """
+        其他 worker 更新了结果文件时重新读取。
+        """
+        signature = file_signature(self.path)
+        with self._lock:
+            if signature == self._signature:
+                return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                results = json.load(file)
+        except FileNotFoundError:
+            results = {}
+        except Exception as e:
+            logger.warning("读取链接检查结果失败: %s %s", self.path, e)
+            return
+        with self._lock:
+            self._results = results if isinstance(results, dict) else {}
+            self._signature = signature
+            self.version += 1
+
+    def _save(self, keep):
+        """
+        保存结果，只保留仍然被书签引用的链接。
+        """
+        with self._lock:
+            self._results = {url: result for url, result in self._results.items() if url in keep}
+            data = json.dumps(self._results, ensure_ascii=False)
+        atomic_write(self.path, data)
+        with self._lock:
+            self._signature = file_signature(self.path)
+
+    # -----------------------------------------------------------------------------------
+    # 检查
+
+    async def _check_all(self, urls):
+        """
+        并发检查一组链接，总并发和每个主机的并发都有上限。
+        """
+        limit = asyncio.Semaphore(self.concurrency)
+        hosts = {}
+
+        async def check(url):
+            host = (urlsplit(url).hostname or '').lower()
+            host_limit = hosts.get(host)
+            if host_limit is None:
+                host_limit = hosts[host] = asyncio.Semaphore(self.per_host)
+            async with host_limit, limit:
+                start = time.monotonic()
+                try:
+                    result = await asyncio.wait_for(check_url(url, self.timeout), self.timeout * 3)
+                except asyncio.TimeoutError:
+                    result = {'ok': False, 'status': None, 'method': None, 'final_url': url, 'error': 'timeout'}
+                result['checked_at'] = time.time()
+                result['elapsed_ms'] = round((time.monotonic() - start) * 1000, 1)
+                with self._lock:
+                    self._results[url] = result
+                    self.checked += 1
+
+        await asyncio.gather(*(check(url) for url in urls))
+
+    def _stale(self, urls, now):
+        with self._lock:
+            return [url for url in urls
+                    if url not in self._results or now - self._results[url].get('checked_at', 0) >= self.ttl]
+
+    def scan(self, force=False):
+        """
+        检查所有过期或没有检查过的链接（以及排队的新链接），在调用线程中执行。
+        :param force: 忽略有效期，重新检查全部链接
+        :return: 检查的链接数
+        """
+        hrefs = {str(href).strip() for href in self.sources() if href}
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        # 扫描期间持有结果文件的进程间锁，其他 worker 等待后直接使用保存的结果
+        with file_lock(self.path):
+            self._load()
+            now = time.time()
+            urls = sorted(hrefs) if force else sorted(set(self._stale(hrefs, now)) | (pending & hrefs))
+            urls = [url for url in urls if urlsplit(url).scheme in ('http', 'https')]
+            if not urls:
+                return 0
+            self.scanning = True
+            start = time.monotonic()
+            try:
+                asyncio.run(self._check_all(urls))
+                self._save(hrefs)
+            finally:
+                self.scanning = False
+        with self._lock:
+            self.version += 1
+            self.scans += 1
+            self.last_scan_at = time.time()
+            self.last_scan_seconds = round(time.monotonic() - start, 3)
+        broken = sum(1 for url in urls if not self._results.get(url, {}).get('ok'))
+        logger.info("检查书签链接: %d 个，失效 %d 个，用时 %.1fs", len(urls), broken, self.last_scan_seconds)
+        return len(urls)
+
+    # -----------------------------------------------------------------------------------
+    # 后台线程
+
+    def _on_changed(self, version, changes):
+        """
+        bookmark_store 的订阅回调：新增或修改的链接排队检查。
+        """
+        urls = {change.get('href') for change in changes if change.get('op') in ('service_added', 'service_updated')}
+        urls.discard(None)
+        urls.discard('')
+        if urls and self._thread is not None:
+            with self._lock:
+                self._pending |= urls
+            self._wake.set()
+
+    def _run(self):
+        # 没有定期扫描时，只在新增书签或手动触发时检查
+        wait = self.interval <= 0
+        while True:
+            if wait:
+                self._wake.wait(self.interval if self.interval > 0 else None)
+                self._wake.clear()
+            wait = True
+            try:
+                with self._lock:
+                    force, self._force = self._force, False
+                self.scan(force)
+            except Exception as e:
+                logger.error("检查书签链接失败: %s", str(e), exc_info=True)
+
+    def start(self, store=bookmark_store):
+        """
+        启动后台检查线程（每个进程只启动一次）。
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='link-checker', daemon=True)
+        store.subscribe(self._on_changed)
+        self._thread.start()
+
+    def trigger(self, force=False):
+        """
+        立即开始一轮检查（在后台线程中执行）。
+        :param force: 忽略有效期，重新检查全部链接
+        """
+        with self._lock:
+            self._force = self._force or force
+        self.start()
+        self._wake.set()
+
+    # -----------------------------------------------------------------------------------
+    # 查询
+
+    def results(self):
+        """
+        获取全部检查结果。
+        :return: {链接: 结果}
+        """
+        self._load()
+        with self._lock:
+            return dict(self._results)
+
+    def result(self, url):
+        with self._lock:
+            return self._results.get(url)
+
+    def stats(self):
+        with self._lock:
+            broken = sum(1 for result in self._results.values() if not result.get('ok'))
+            return {
+                'links': len(self._results),
+                'broken': broken,
+                'checked': self.checked,
+                'scans': self.scans,
+                'scanning': self.scanning,
+                'last_scan_at': self.last_scan_at,
+                'last_scan_seconds': self.last_scan_seconds,
+                'version': self.version,
+            }
+
+
+link_checker = LinkChecker(bookmark_page_index.hrefs)
@@ -0,0 +1,217 @@
+# metrics.py
+import os
+import time
+import bisect
+import threading
+import functools
+from contextlib import contextmanager
+
+# 进程内的运行指标，以 Prometheus 文本格式从 /metrics 导出（不依赖 prometheus_client）。
+#   - Counter / Histogram 在热路径上只做一次加锁的加法（直方图再加一次二分查找），没有人抓取时没有其他开销；
+#   - 缓存命中率等已经由各模块自己统计的数值通过 register_collector 注册，只在抓取时读取；
+#   - 每个 worker 进程的指标是独立的，样本带有 pid 标签，多进程部署时需要分别抓取或在采集端汇总。
+# 本模块不依赖其他模块，atomic_file、yaml_io 等底层模块也可以直接使用。
+
+# 默认的耗时分桶（秒）
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    只增不减的计数器。
+    """
+    type = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, *values):
+        """
+        :param amount: 增加的数量
+        :param values: 标签值，顺序与 labels 相同
+        """
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for values, value in items:
+            yield self.name, self.labels, values, value
+
+
+class Histogram:
+    """
+    分桶统计的直方图，例如请求耗时。
+    """
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # {标签值: [各个桶的计数（不累加）, 总和, 次数]}
+        self._values = {}
+
+    def observe(self, value, *values):
+        """
+        :param value: 观测值
+        :param values: 标签值，顺序与 labels 相同
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(values)
+            if entry is None:
+                entry = self._values[values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, *values):
+        """
+        统计代码块的耗时（秒）。
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *values)
+
+    def samples(self):
+        with self._lock:
+            items = [(values, list(entry[0]), entry[1], entry[2]) for values, entry in self._values.items()]
+        for values, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                yield self.name + '_bucket', self.labels + ('le',), values + (format_value(float(bound)),), cumulative
+            yield self.name + '_sum', self.labels, values, total
+            yield self.name + '_count', self.labels, values, count
+
+
+class Registry:
+    """
+    指标注册表，render() 生成 Prometheus 文本格式。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._collectors = []
+
+    def register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def register_collector(self, collector):
+        """
+        注册抓取时才读取的指标。
+        :param collector: collector() 返回 [(名称, 类型, 说明, [(标签字典, 数值)])]
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        """
+        :return: Prometheus 文本格式（text/plain; version=0.0.4）
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        # fork 出来的 worker 进程的 pid 与导入本模块时不同，每次抓取时读取
+        pid = (('pid', os.getpid()),)
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, values, value in metric.samples():
+                lines.append(f'{name}{format_labels(labels, values, pid)} {format_value(value)}')
+        families = {}
+        for collector in collectors:
+            try:
+                for name, type, help, samples in collector():
+                    family = families.setdefault(name, (type, help, []))
+                    family[2].extend(samples)
+            except Exception as e:
+                lines.append(f'# collector error: {_escape(e)}')
+        for name, (type, help, samples) in families.items():
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {type}')
+            for labels, value in samples:
+                if value is None:
+                    continue
+                lines.append(f'{name}{format_labels(labels.keys(), labels.values(), pid)} {format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def counter(name, help, labels=()):
+    return registry.register(Counter(name, help, labels))
+
+
+def histogram(name, help, labels=(), buckets=DEFAULT_BUCKETS):
+    return registry.register(Histogram(name, help, labels, buckets))
+
+
+def register_collector(collector):
+    registry.register_collector(collector)
+
+
+# 常用的指标
+request_seconds = histogram('bookmark_http_request_seconds', '按路由统计的请求耗时（秒）', ('route', 'method', 'status'))
+operation_seconds = histogram('bookmark_operation_seconds', '热点操作的耗时（秒）', ('op',))
+operation_errors = counter('bookmark_operation_errors_total', '热点操作抛出的异常次数', ('op',))
+file_bytes = counter('bookmark_file_bytes_total', '配置文件和写前日志读写的字节数', ('direction',))
+lock_wait_seconds = histogram('bookmark_file_lock_wait_seconds', '等待文件进程间锁的时间（秒）', ('mode',),
+                              buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0))
+
+
+def timed(op):
+    """
+    装饰器：统计函数的耗时和异常次数。
+    :param op: 操作名，作为 op 标签
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                operation_errors.inc(1, op)
+                raise
+            finally:
+                operation_seconds.observe(time.perf_counter() - start, op)
+        return wrapper
+    return decorator
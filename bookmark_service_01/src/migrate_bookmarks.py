@@ -0,0 +1,85 @@
+# migrate_bookmarks.py
+# 书签存储后端的迁移工具（见 bookmark_backend.py）：
+#   - 导入（默认）：把书签配置文件（连同尚未合并的写前日志）和页面目录中的页面文件导入 SQLite 数据库，
+#     之后设置 BOOKMARK_BACKEND=sqlite 启动服务。页面文件按签名同步，重复执行只导入修改过的页面；
+#   - 导出（--export）：把 SQLite 数据库中的书签数据写回书签配置文件，用于切换回 yaml 后端。
+# 迁移期间持有书签文件的进程间锁，服务可以不停止，但切换后端需要重启。
+#
+# 用法（在 src 目录下）：
+#   python migrate_bookmarks.py
+#   python migrate_bookmarks.py --db /data/bookmarks.db --types bookmarks services
+#   python migrate_bookmarks.py --export
+import os
+import argparse
+import logging
+from config import BOOKMARK_CONFIG_PATH, BOOKMARK_SQLITE_PATH, BOOKMARK_PAGES_DIR
+from bookmark_backend import YamlBackend, SqliteBackend
+from bookmark_journal import BookmarkJournal
+from atomic_file import file_lock
+
+logger = logging.getLogger(__name__)
+
+
+def page_types(pages_dir):
+    """
+    页面目录下的页面类型（子目录名）。
+    """
+    try:
+        return sorted(name for name in os.listdir(pages_dir)
+                      if os.path.isdir(os.path.join(pages_dir, name)) and not name.startswith('.'))
+    except FileNotFoundError:
+        return []
+
+
+def import_yaml(yaml_backend, sqlite_backend, types):
+    """
+    把书签配置文件和页面文件导入数据库。
+    :return: (导入的 BookmarkModel, {页面类型: 页面数})
+    """
+    with file_lock(yaml_backend.path):
+        model = yaml_backend.load()
+        sqlite_backend.write(model)
+        # 日志中的操作已经包含在导出的书签配置文件中，切换回 yaml 后端时不能再次重放
+        yaml_backend.journal.truncate()
+    pages = {type: len(sqlite_backend.list_pages(type)) for type in types}
+    return model, pages
+
+
+def export_yaml(sqlite_backend, yaml_backend):
+    """
+    把数据库中的书签数据写回书签配置文件。
+    :return: 导出的 BookmarkModel
+    """
+    with file_lock(yaml_backend.path):
+        model = sqlite_backend.load()
+        yaml_backend.write(model)
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description='在 YAML 文件和 SQLite 数据库之间迁移书签数据')
+    parser.add_argument('--config', default=BOOKMARK_CONFIG_PATH, help='书签配置文件')
+    parser.add_argument('--db', default=BOOKMARK_SQLITE_PATH, help='SQLite 数据库文件')
+    parser.add_argument('--pages-dir', default=BOOKMARK_PAGES_DIR, help='页面目录')
+    parser.add_argument('--types', nargs='*', help='导入的页面类型，默认为页面目录下的所有子目录')
+    parser.add_argument('--export', action='store_true', help='把数据库导出为书签配置文件')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+
+    journal = BookmarkJournal(os.path.join(os.path.dirname(args.config), '.' + os.path.basename(args.config) + '.journal'))
+    yaml_backend = YamlBackend(args.config, journal, pages_dir=args.pages_dir)
+    sqlite_backend = SqliteBackend(args.db, args.config, pages_dir=args.pages_dir)
+    if args.export:
+        model = export_yaml(sqlite_backend, yaml_backend)
+        print(f"导出: {args.db} -> {args.config}，{len(model)} 个分组，{model.service_count()} 个服务")
+        return
+
+    types = args.types if args.types is not None else page_types(args.pages_dir)
+    model, pages = import_yaml(yaml_backend, sqlite_backend, types)
+    print(f"导入: {args.config} -> {args.db}，{len(model)} 个分组，{model.service_count()} 个服务")
+    for type, count in pages.items():
+        print(f"  页面 {type}: {count} 个")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+# page_index.py
+import os
+import json
+import time
+import threading
+import logging
+from atomic_file import atomic_write, file_signature
+
+logger = logging.getLogger(__name__)
+
+# 跨页面的全局书签索引：服务名、链接 -> (页面文件, 分组)。
+# 书签分散在 next_setting.yaml 的 files 列出的多个页面文件中，当前活动页的最新内容在 bookmarks.yaml（bookmark_store）里。
+#   - 活动页：书签数据版本号变化时从 bookmark_store 重新提取；
+#   - 其他页面：优先使用 PageSnapshots 中已解析的模型（包括刚换出、尚未写回的页面），
+#     否则文件签名与旁路文件中记录的一致时直接使用旁路文件中的条目，只有被修改过的页面才重新解析；
+#   - 非活动页面的条目和文件签名保存在旁路文件（<页面目录>/.page_index.json）中，进程重启后不需要重新解析全部页面。
+PAGE_INDEX_REFRESH_INTERVAL = float(os.environ.get('PAGE_INDEX_REFRESH_INTERVAL', '1'))
+SIDECAR_VERSION = 1
+
+
+def normalize_url(url):
+    """
+    规范化链接用于查找：小写，去掉协议、www. 和末尾的 /。
+    """
+    url = str(url or '').strip().lower()
+    _, sep, rest = url.partition('://')
+    url = rest if sep else url
+    if url.startswith('www.'):
+        url = url[4:]
+    return url.rstrip('/')
+
+
+def model_entries(model):
+    """
+    提取模型中所有书签的 [分组名, 服务名, 链接]。
+    """
+    return [[group.name, service.name, service.href]
+            for group in model.groups.values() for service in group.services.values()]
+
+
+class PageIndex:
+    """
+    某个配置类型（configs/other/<type>/）下所有页面的全局书签索引。
+    """
+
+    def __init__(self, dir_path, page_state, snapshots, store, type='bookmarks', interval=PAGE_INDEX_REFRESH_INTERVAL):
+        self.dir_path = dir_path
+        self.page_state = page_state
+        self.snapshots = snapshots
+        self.store = store
+        self.type = type
+        self.interval = interval
+        self.sidecar_path = os.path.join(dir_path, '.page_index.json')
+        self._lock = threading.RLock()
+        self._ready = threading.Event()
+        # {页面文件名: {'signature', 'entries', 'model'}}，model 为条目来源的已解析模型（来自旁路文件时为 None）
+        self._pages = {}
+        self._files = []
+        self._active = None
+        self._active_version = None
+        self._checked = 0.0
+        # {服务名（小写）: [(页面文件名, 分组名, 服务名, 链接)]}，{规范化的链接: [...]}
+        self._by_service = {}
+        self._by_url = {}
+        self.parses = 0
+
+    # -----------------------------------------------------------------------------------
+    # 旁路文件
+
+    def _load_sidecar(self):
+        try:
+            with open(self.sidecar_path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning("读取全局书签索引失败: %s %s", self.sidecar_path, e)
+            return {}
+        if data.get('version') != SIDECAR_VERSION:
+            return {}
+        return {name: {'signature': tuple(page['signature']), 'entries': page['entries'], 'model': None}
+                for name, page in data.get('pages', {}).items() if page.get('signature')}
+
+    def _save_sidecar(self):
+        """
+        保存非活动页面的条目。调用者需持有锁。
+        """
+        pages = {}
+        for name, page in self._pages.items():
+            signature = file_signature(os.path.join(self.dir_path, name))
+            # 活动页和尚未写回的页面，文件内容与条目不一致，不保存
+            if name == self._active or signature is None or page['signature'] != signature:
+                continue
+            pages[name] = {'signature': list(signature), 'entries': page['entries']}
+        try:
+            atomic_write(self.sidecar_path, json.dumps({'version': SIDECAR_VERSION, 'pages': pages}, ensure_ascii=False))
+        except Exception as e:
+            logger.warning("保存全局书签索引失败: %s %s", self.sidecar_path, e)
+
+    # -----------------------------------------------------------------------------------
+    # 索引维护（调用者需持有锁）
+
+    def _set_page(self, name, signature, entries, model):
+        old = self._pages.get(name)
+        if old is not None:
+            self._unindex(name, old['entries'])
+        self._pages[name] = {'signature': signature, 'entries': entries, 'model': model}
+        for group, service, href in entries:
+            item = (name, group, service, href)
+            self._by_service.setdefault(str(service).lower(), []).append(item)
+            url = normalize_url(href)
+            if url:
+                self._by_url.setdefault(url, []).append(item)
+
+    def _unindex(self, name, entries):
+        for group, service, href in entries:
+            for index, key in ((self._by_service, str(service).lower()), (self._by_url, normalize_url(href))):
+                items = index.get(key)
+                if not items:
+                    continue
+                items[:] = [item for item in items if item[0] != name]
+                if not items:
+                    del index[key]
+
+    def _drop_page(self, name):
+        page = self._pages.pop(name, None)
+        if page is not None:
+            self._unindex(name, page['entries'])
+
+    def _refresh_active(self):
+        """
+        活动页的条目来自 bookmark_store，数据版本号变化时重新提取。
+        """
+        version = self.store.current_version()
+        if self._active is None or (version == self._active_version and self._active in self._pages):
+            return
+        version, entries = self.store.export(model_entries)
+        self._set_page(self._active, None, entries, None)
+        self._active_version = version
+
+    def _refresh_page(self, name, sidecar):
+        """
+        检查非活动页面，页面被修改过时更新条目。
+        :return: 是否更新了条目
+        """
+        path = os.path.join(self.dir_path, name)
+        current = self._pages.get(name)
+        model = self.snapshots.cached(name)
+        if model is not None:
+            if current is not None and current['model'] is model:
+                return False
+            self._set_page(name, file_signature(path), model_entries(model), model)
+            return True
+        signature = file_signature(path)
+        if signature is None:
+            if current is not None:
+                self._drop_page(name)
+                return True
+            return False
+        if current is not None and current['model'] is None and current['signature'] == signature:
+            return False
+        cached = sidecar.get(name)
+        if cached is not None and cached['signature'] == signature:
+            self._set_page(name, signature, cached['entries'], None)
+            return True
+        model = self.snapshots.get(name)
+        self.parses += 1
+        self._set_page(name, signature, model_entries(model), model)
+        return True
+
+    def refresh(self, force=False, sidecar=None):
+        """
+        检查所有页面，只重新处理有变化的页面。
+        :param force: 忽略检查间隔
+        """
+        with self._lock:
+            section = self.page_state.get(self.type) or {}
+            files = list(section.get('files') or [])
+            active = section.get('action')
+            if active != self._active:
+                # 翻页后旧的活动页改为从 PageSnapshots 或文件中读取
+                if self._active is not None:
+                    self._drop_page(self._active)
+                self._active = active
+                self._active_version = None
+                force = True
+            self._refresh_active()
+            if not force and time.monotonic() - self._checked < self.interval:
+                return
+            self._checked = time.monotonic()
+            sidecar = sidecar if sidecar is not None else {}
+            changed = False
+            for name in set(self._pages) - set(files):
+                self._drop_page(name)
+                changed = True
+            for name in files:
+                if name == active:
+                    continue
+                try:
+                    changed |= self._refresh_page(name, sidecar)
+                except Exception as e:
+                    logger.error("更新全局书签索引失败: %s %s", name, e)
+            self._files = files
+            if changed or sidecar:
+                self._save_sidecar()
+
+    def _build(self):
+        try:
+            self.refresh(force=True, sidecar=self._load_sidecar())
+            logger.info("构建全局书签索引: %d 个页面，解析了 %d 个页面", len(self._pages), self.parses)
+        except Exception as e:
+            logger.error("构建全局书签索引失败: %s", str(e), exc_info=True)
+        finally:
+            self._ready.set()
+
+    def start(self):
+        """
+        在后台线程中构建索引。
+        """
+        threading.Thread(target=self._build, name='page-index', daemon=True).start()
+
+    # -----------------------------------------------------------------------------------
+    # 查询
+
+    def lookup(self, service=None, url=None, timeout=30):
+        """
+        查找书签所在的页面。
+        :param service: 服务名（不区分大小写）
+        :param url: 链接（忽略协议、www. 和末尾的 /）
+        :param timeout: 等待后台构建完成的最长时间（秒）
+        :return: [{'file', 'index', 'active', 'group', 'service', 'href'}]
+        """
+        self._ready.wait(timeout)
+        self.refresh()
+        with self._lock:
+            items = []
+            if service:
+                items.extend(self._by_service.get(str(service).lower(), []))
+            if url:
+                url_items = self._by_url.get(normalize_url(url), [])
+                items = [item for item in items if item in url_items] if service else list(url_items)
+            results = []
+            for name, group, service_name, href in items:
+                results.append({
+                    'file': name,
+                    'index': self._files.index(name) + 1 if name in self._files else None,
+                    'active': name == self._active,
+                    'group': group,
+                    'service': service_name,
+                    'href': href,
+                })
+            results.sort(key=lambda result: (result['index'] or 0, str(result['group']), str(result['service'])))
+            return results
+
+    def hrefs(self):
+        """
+        获取所有页面中的全部链接（去重）。
+        """
+        self._ready.wait(30)
+        self.refresh()
+        with self._lock:
+            return {href for page in self._pages.values() for _, _, href in page['entries'] if href}
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pages': len(self._pages),
+                'services': len(self._by_service),
+                'urls': len(self._by_url),
+                'parses': self.parses,
+                'active': self._active,
+            }
@@ -0,0 +1,258 @@
+# page_state.py
+import os
+import atexit
+import threading
+import logging
+import yaml_io
+from config import PAGE_PERSIST_LAZY
+from atomic_file import file_lock, file_signature
+from bookmark_model import BookmarkModel
+
+logger = logging.getLogger(__name__)
+
+# 翻页配置（configs/other/next_setting.yaml）的结构：
+# bookmarks:           # 配置类型，另外还有 services / settings
+#   index: 1           # 当前页码，从 1 开始
+#   action: page1.yaml # 当前活动的页面文件（位于 configs/other/<type>/ 下）
+#   files: [page1.yaml, page2.yaml]
+#   target: bookmarks.yaml  # homepage 读取的标准配置文件
+
+
+class PageLoadError(Exception):
+    """
+    翻页的目标页面不存在或无法解析，翻页配置没有被修改。
+    """
+
+
+class PageState:
+    """
+    翻页配置的内存缓存。
+    文件只有在修改时间、大小或 inode 变化时才会重新解析；翻页时在一个事务中同时修改页码和活动文件，只写一次文件。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._signature = None
+        self._config = None
+
+    def _refresh(self):
+        """
+        检查文件签名，必要时重新加载。调用者需持有锁。
+        """
+        signature = file_signature(self.path)
+        if self._config is not None and signature == self._signature:
+            return
+        with file_lock(self.path, shared=True):
+            signature = file_signature(self.path)
+            self._config = yaml_io.load_file(self.path) or {}
+        self._signature = signature
+        logger.debug("重新加载翻页配置: %s", self.path)
+
+    def get(self, type):
+        """
+        获取指定类型的翻页配置（副本）。
+        :param type: 配置类型，例如 bookmarks
+        :return: 配置字典，不存在时返回 None
+        """
+        with self._lock:
+            self._refresh()
+            section = self._config.get(type)
+            return dict(section) if isinstance(section, dict) else None
+
+    def flip(self, type, next=True, to=None, prepare=None):
+        """
+        翻到下一页或上一页：在进程间锁内读取、修改页码和活动文件，并写回一次。
+        :param type: 配置类型，例如 bookmarks
+        :param next: True 表示下一页，False 表示上一页
+        :param to: 直接跳转到的页面文件名，指定时忽略 next
+        :param prepare: 写回翻页配置之前调用 prepare(page)（例如加载并检查新的页面），抛出异常时不修改翻页配置
+        :return: {'type', 'old_index', 'old_active', 'index', 'active', 'files', 'target', 'prepared'}，
+                 prepared 为 prepare 的返回值
+        """
+        with self._lock, file_lock(self.path):
+            self._refresh()
+            section = self._config.get(type)
+            if not isinstance(section, dict):
+                raise KeyError(f"翻页配置中不存在类型: {type}")
+            files = section.get('files') or []
+            if not files:
+                raise ValueError(f"翻页配置中没有页面文件: {type}")
+            old_index = section.get('index') or 1
+            old_active = section.get('action')
+            if to is not None:
+                if to not in files:
+                    raise ValueError(f"翻页配置中没有页面文件: {to}")
+                index = files.index(to) + 1
+            else:
+                # 页码从 1 开始，首尾循环
+                index = (old_index - 1 + (1 if next else -1)) % len(files) + 1
+            active = files[index - 1]
+            page = {
+                'type': type,
+                'old_index': old_index,
+                'old_active': old_active,
+                'index': index,
+                'active': active,
+                'files': list(files),
+                'target': section.get('target'),
+            }
+            page['prepared'] = prepare(page) if prepare is not None else None
+
+            section['index'] = index
+            section['action'] = active
+            try:
+                yaml_io.dump_file(self.path, self._config)
+            except BaseException:
+                self._config = None
+                self._signature = None
+                raise
+            self._signature = file_signature(self.path)
+            logger.info("翻页: %s %s -> %s (第 %d 页)", type, old_active, active, index)
+            return page
+
+
+class PagePersister:
+    """
+    后台写回线程。同一个键的多次写回请求会合并，只执行最后一次。
+    关闭延迟写回（PAGE_PERSIST_LAZY=0）时在调用线程中立即执行。
+    """
+
+    def __init__(self, lazy=PAGE_PERSIST_LAZY):
+        self.lazy = lazy
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def schedule(self, key, task):
+        """
+        安排一次写回。
+        :param key: 写回的目标，通常是文件路径
+        :param task: 无参数的写回函数
+        """
+        if not self.lazy:
+            task()
+            return
+        with self._cond:
+            self._pending.pop(key, None)
+            self._pending[key] = task
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='page-persister', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+            self._cond.notify()
+
+    def _take(self):
+        with self._cond:
+            tasks = list(self._pending.values())
+            self._pending.clear()
+            return tasks
+
+    def _execute(self, tasks):
+        for task in tasks:
+            try:
+                task()
+            except Exception as e:
+                logger.error("页面写回失败: %s", str(e), exc_info=True)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            self._execute(self._take())
+
+    def flush(self):
+        """
+        立即执行所有等待中的写回。
+        """
+        self._execute(self._take())
+
+
+class PageSnapshots:
+    """
+    某个配置类型（configs/other/<type>/）下所有页面的已解析快照，按文件名索引。
+    不是活动页的快照不会被修改；页面文件在磁盘上被修改时（签名变化）重新解析。
+    """
+
+    def __init__(self, dir_path, persister):
+        self.dir_path = dir_path
+        self.persister = persister
+        self._lock = threading.Lock()
+        # {文件名: [文件签名, BookmarkModel]}，签名为 None 表示内存中的版本较新、正在等待写回
+        self._pages = {}
+
+    def path(self, name):
+        return os.path.join(self.dir_path, name)
+
+    def get(self, name):
+        """
+        获取页面的模型，已缓存且文件未被修改时为 O(1)。
+        :param name: 页面文件名
+        :return: BookmarkModel
+        """
+        path = self.path(name)
+        with self._lock:
+            entry = self._pages.get(name)
+            if entry is not None and (entry[0] is None or entry[0] == file_signature(path)):
+                return entry[1]
+        with file_lock(path, shared=True):
+            signature = file_signature(path)
+            model = BookmarkModel.from_list(yaml_io.load_file(path) or [])
+        with self._lock:
+            self._pages[name] = [signature, model]
+        logger.debug("解析页面文件: %s", path)
+        return model
+
+    def cached(self, name):
+        """
+        获取已经解析过、并且文件未被修改的页面模型，不会解析文件。
+        :param name: 页面文件名
+        :return: BookmarkModel，没有缓存时返回 None
+        """
+        path = self.path(name)
+        with self._lock:
+            entry = self._pages.get(name)
+            if entry is not None and (entry[0] is None or entry[0] == file_signature(path)):
+                return entry[1]
+        return None
+
+    def put(self, name, model, dirty):
+        """
+        放回换出的页面，被修改过的页面安排在后台写回。
+        :param name: 页面文件名
+        :param model: BookmarkModel
+        :param dirty: 是否被修改过
+        """
+        path = self.path(name)
+        if not dirty:
+            with self._lock:
+                self._pages[name] = [file_signature(path), model]
+            return
+        # 换出后模型不再被修改，这里先生成列表，序列化和写文件放到后台
+        data = model.to_list()
+        with self._lock:
+            self._pages[name] = [None, model]
+        self.persister.schedule(path, lambda: self._persist(name, model, data))
+
+    def _persist(self, name, model, data):
+        path = self.path(name)
+        with file_lock(path):
+            yaml_io.dump_file(path, data)
+            signature = file_signature(path)
+        with self._lock:
+            entry = self._pages.get(name)
+            if entry is not None and entry[1] is model:
+                entry[0] = signature
+        logger.info("写回页面文件: %s", path)
+
+    def warm(self, names):
+        """
+        预先解析页面，之后的翻页不再需要解析文件。
+        :param names: 页面文件名列表
+        """
+        for name in names:
+            try:
+                self.get(name)
+            except Exception as e:
+                logger.warning("预加载页面失败: %s %s", name, e)
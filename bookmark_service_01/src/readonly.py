@@ -0,0 +1,58 @@
+# readonly.py
+
+# 缓存的数据会被多个请求共享，对外只暴露只读的视图，避免调用者修改缓存。
+READONLY_MESSAGE = "缓存的数据是只读的，请先用 thaw() 或 load_bookmarks() 获取可修改的副本"
+
+
+class ReadOnlyDict(dict):
+    """
+    只读字典，用于对外暴露的缓存数据（书签快照、YAML 文档缓存），任何修改操作都会抛出 TypeError。
+    """
+    def _readonly(self, *args, **kwargs):
+        raise TypeError(READONLY_MESSAGE)
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+    __ior__ = _readonly
+
+
+class ReadOnlyList(list):
+    """
+    只读列表，用于对外暴露的缓存数据（书签快照、YAML 文档缓存），任何修改操作都会抛出 TypeError。
+    """
+    def _readonly(self, *args, **kwargs):
+        raise TypeError(READONLY_MESSAGE)
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+    append = extend = insert = pop = remove = clear = sort = reverse = _readonly
+
+
+def freeze(data):
+    """
+    递归地把 YAML 数据转换为只读结构（仍然可以被 jsonify 序列化）。
+    :param data: YAML 解析得到的数据
+    :return: 只读数据
+    """
+    if isinstance(data, dict):
+        frozen = ReadOnlyDict()
+        for key, value in data.items():
+            dict.__setitem__(frozen, key, freeze(value))
+        return frozen
+    if isinstance(data, list):
+        frozen = ReadOnlyList()
+        list.extend(frozen, (freeze(item) for item in data))
+        return frozen
+    return data
+
+
+def thaw(data):
+    """
+    把只读结构递归地复制为普通的字典和列表，得到可修改的副本。
+    :param data: 只读数据
+    :return: 可修改的副本
+    """
+    if isinstance(data, dict):
+        return {key: thaw(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [thaw(item) for item in data]
+    return data
@@ -0,0 +1,204 @@
+# serve.py
+# 生产环境的启动入口，替代 `python app.py` / `flask run` 的单进程开发服务器。
+#
+# 用法（在 /app 目录下）：
+#   python serve.py                          # 使用 SERVE_BIND / SERVE_WORKERS / SERVE_THREADS 环境变量
+#   python serve.py --workers 4 --threads 8  # 4 个 worker 进程，每个进程 8 个线程
+#   python serve.py --server prefork         # 不使用 gunicorn，使用内置的多进程服务器
+#
+# 多个 worker 进程之间的一致性：
+#   - 书签（bookmark_store）和翻页配置（page_state）在每次请求时比较文件签名，其他进程的修改会被自动重新加载；
+#   - 所有写操作都持有书签文件的进程间锁（fcntl.flock），文件通过临时文件 + os.replace 原子替换；
+#   - 多进程时关闭翻页后的延迟写回（PAGE_PERSIST_LAZY），页面文件和书签配置文件在翻页请求中同步写回；
+#   - 应用在 worker 进程中导入（不预加载），后台线程和锁不会跨 fork 继承；
+#   - 变更推送的事件写入共享的事件日志（change_feed.py），事件 id 在所有 worker 之间通用；每个 server-sent events
+#     连接一直占用一个线程，多进程时 /api/bookmarks/events 默认使用长轮询（CHANGE_FEED_MODE）；
+#   - 后台的链接检查和图标抓取在 worker 启动时开始（load_app），每个链接由持有结果文件锁的 worker 访问一次。
+import os
+import sys
+import signal
+import socket
+import argparse
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def parse_bind(bind):
+    """
+    解析监听地址。
+    :param bind: host:port
+    :return: (host, port)
+    """
+    host, _, port = bind.rpartition(':')
+    return host or '0.0.0.0', int(port)
+
+
+def load_app():
+    """
+    在 worker 进程中导入应用，并启动后台的链接检查和图标抓取。
+    """
+    from app import app
+    from api import start_background_tasks
+
+    start_background_tasks()
+    return app
+
+
+def run_gunicorn(bind, workers, threads):
+    """
+    使用 gunicorn 启动（gthread worker）。
+    """
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', [bind])
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', threads)
+            self.cfg.set('worker_class', 'gthread')
+            # 不预加载应用：每个 worker 自己导入，后台线程在 fork 之后才启动
+            self.cfg.set('preload_app', False)
+            self.cfg.set('accesslog', None)
+
+        def load(self):
+            return load_app()
+
+    Application().run()
+
+
+def _serve_worker(sock, host, port, threads):
+    """
+    worker 进程：在继承的监听 socket 上运行 werkzeug 的多线程服务器。
+    """
+    from werkzeug.serving import make_server
+
+    app = load_app()
+
+    def exit_worker(signum, frame):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, exit_worker)
+    signal.signal(signal.SIGINT, exit_worker)
+    server = make_server(host, port, app, threaded=threads > 1, fd=sock.fileno())
+    try:
+        server.serve_forever()
+    except SystemExit:
+        pass
+    finally:
+        shutdown_worker()
+
+
+def shutdown_worker():
+    """
+    worker 退出前写回内存中的数据：等待中的翻页写回、书签写前日志的合并，以及日志队列中剩余的记录。
+    fork 出的 worker 通过 os._exit 退出，不会执行 atexit 注册的函数，所以在这里显式调用。
+    """
+    import api_change_config
+    from bookmark_store import bookmark_store
+    from app_logging import stop_logging
+
+    api_change_config.page_persister.flush()
+    bookmark_store.stop()
+    stop_logging()
+
+
+def run_prefork(bind, workers, threads):
+    """
+    内置的多进程服务器：主进程监听端口后 fork 出 worker 进程，worker 退出时自动重启。
+    没有安装 gunicorn 时使用。
+    """
+    host, port = parse_bind(bind)
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    sock.set_inheritable(True)
+
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                _serve_worker(sock, host, port, threads)
+                code = 0
+            finally:
+                os._exit(code)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(workers):
+        spawn()
+    print(f"监听 http://{host}:{port}，{workers} 个 worker 进程，每个进程 {threads} 个线程", flush=True)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            logger.warning("worker 进程 %d 退出（状态 %d），重新启动", pid, status)
+            spawn()
+    sock.close()
+
+
+def run_threaded(bind, threads):
+    """
+    单进程多线程服务器。
+    """
+    from werkzeug.serving import make_server
+
+    app = load_app()
+    host, port = parse_bind(bind)
+    make_server(host, port, app, threaded=threads > 1).serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='书签服务的生产环境启动入口')
+    parser.add_argument('--bind', default=os.environ.get('SERVE_BIND', '0.0.0.0:5000'), help='监听地址 host:port')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('SERVE_WORKERS', '1')), help='worker 进程数')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('SERVE_THREADS', '8')), help='每个 worker 的线程数（内置服务器只区分单线程和多线程）')
+    parser.add_argument('--server', choices=['auto', 'gunicorn', 'prefork', 'threaded'], default='auto',
+                        help='auto：安装了 gunicorn 时使用 gunicorn，否则使用内置的多进程服务器')
+    args = parser.parse_args(argv)
+
+    workers = max(1, args.workers)
+    threads = max(1, args.threads)
+    # worker 进程（包括 gunicorn 的 worker）在导入 config 时读取这个值，多进程时关闭延迟写回
+    os.environ['SERVE_WORKERS'] = str(workers)
+
+    server = args.server
+    if server == 'auto':
+        try:
+            import gunicorn  # noqa: F401
+            server = 'gunicorn'
+        except ImportError:
+            server = 'prefork' if workers > 1 else 'threaded'
+
+    if server == 'gunicorn':
+        run_gunicorn(args.bind, workers, threads)
+    elif server == 'prefork':
+        run_prefork(args.bind, workers, threads)
+    else:
+        run_threaded(args.bind, threads)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
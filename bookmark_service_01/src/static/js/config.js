@@ -2,29 +2,82 @@ document.addEventListener('DOMContentLoaded', function() {
     // 获取配置下拉菜单元素
     const configSelect = document.getElementById('configSelect');
 
-    // 监听配置下拉菜单的点击事件
-    configSelect.addEventListener('focus', loadConfigFiles);
+    // 文件名筛选框（glob 通配符，例如 page1*.yaml；不含通配符时按包含匹配）
+    const configFilter = document.getElementById('configFilter');
+    // 每页的文件数，以及“加载更多”选项的值
+    const PAGE_SIZE = 200;
+    const MORE_VALUE = '__more__';
+    // 下一页的起始位置（没有更多文件时为 null），以及已经加载的页数
+    let nextOffset = null;
+    let pagesLoaded = 0;
+    let filterTimer = null;
+
+    // 监听配置下拉菜单的点击事件（已经加载了后面的页时不刷新，避免丢失已加载的文件）
+    configSelect.addEventListener('focus', function() {
+        if (pagesLoaded <= 1) {
+            loadConfigFiles();
+        }
+    });
 
     // 监听配置下拉菜单的展开事件（兼容不同浏览器）
     configSelect.addEventListener('click', function() {
-        if (this.size === 1) {
+        if (this.size === 1 && pagesLoaded <= 1) {
             loadConfigFiles();
         }
     });
 
-    // 加载配置文件列表
-    function loadConfigFiles() {
-        // 获取配置文件列表
-        fetch('/api/config/files')
+    // 选中“加载更多”时追加下一页
+    configSelect.addEventListener('change', function() {
+        if (this.value === MORE_VALUE) {
+            this.selectedIndex = 0;
+            loadConfigFiles(nextOffset);
+        }
+    });
+
+    // 输入筛选条件后重新从第一页加载
+    if (configFilter) {
+        configFilter.addEventListener('input', function() {
+            clearTimeout(filterTimer);
+            filterTimer = setTimeout(() => loadConfigFiles(), 300);
+        });
+    }
+
+    // 筛选框的内容转换为 glob 参数
+    function currentGlob() {
+        const text = configFilter ? configFilter.value.trim() : '';
+        if (!text) {
+            return null;
+        }
+        return /[*?\[]/.test(text) ? text : `*${text}*`;
+    }
+
+    // 加载配置文件列表：offset 为空时从第一页重新加载，否则追加从 offset 开始的一页
+    function loadConfigFiles(offset) {
+        const append = offset !== undefined && offset !== null;
+        const params = new URLSearchParams({limit: PAGE_SIZE, offset: append ? offset : 0});
+        const glob = currentGlob();
+        if (glob) {
+            params.set('glob', glob);
+        }
+        fetch(`/api/config/files?${params}`)
             .then(response => response.json())
             .then(data => {
                 console.log('获取配置文件列表请求信息:', data);
-                if (data.code === 200) {
+                if (data.code === 200 || Array.isArray(data.files)) {
                     console.log('获取配置文件列表成功:', data);
-                    // 清空现有选项（保留第一个提示选项）
-                    const firstOption = configSelect.options[0];
-                    configSelect.innerHTML = '';
-                    configSelect.appendChild(firstOption);
+                    if (append) {
+                        // 去掉上一页末尾的“加载更多”选项
+                        const moreOption = configSelect.querySelector(`option[value="${MORE_VALUE}"]`);
+                        if (moreOption) {
+                            moreOption.remove();
+                        }
+                    } else {
+                        // 清空现有选项（保留第一个提示选项）
+                        const firstOption = configSelect.options[0];
+                        configSelect.innerHTML = '';
+                        configSelect.appendChild(firstOption);
+                        pagesLoaded = 0;
+                    }
 
                     // 从请求结果中获取文件名
                     const files = extractFilesNames(data);
@@ -36,6 +89,15 @@ document.addEventListener('DOMContentLoaded', function() {
                         option.textContent = file;
                         configSelect.appendChild(option);
                     });
+                    pagesLoaded += 1;
+                    nextOffset = data.next_offset === undefined ? null : data.next_offset;
+                    // 还有更多文件时追加“加载更多”选项，选中后加载下一页
+                    if (nextOffset !== null) {
+                        const moreOption = document.createElement('option');
+                        moreOption.value = MORE_VALUE;
+                        moreOption.textContent = `…… 加载更多（还有 ${data.total - nextOffset} 个文件）`;
+                        configSelect.appendChild(moreOption);
+                    }
                 } else {
                     console.error('获取的配置文件数据不是数组:', files);
                 }
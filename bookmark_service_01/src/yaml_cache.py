@@ -0,0 +1,130 @@
+# yaml_cache.py
+import os
+import sys
+import threading
+import logging
+from collections import OrderedDict
+import yaml_io
+from readonly import freeze
+
+logger = logging.getLogger(__name__)
+
+# 任意 YAML 配置文件（配置编辑器打开的文件）的解析结果缓存。
+# 以 (真实路径, mtime_ns, size) 作为键：文件被修改后键随之变化，旧的解析结果不会再被命中。
+# 按估算的内存占用限制总大小，超出时淘汰最久没有使用的文档（LRU）；
+# 返回的是只读视图，多个请求共享同一份数据，调用者无法修改缓存。
+YAML_CACHE_MAX_BYTES = int(os.environ.get('YAML_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+YAML_CACHE_MAX_ENTRIES = int(os.environ.get('YAML_CACHE_MAX_ENTRIES', '256'))
+
+
+def estimate_size(data):
+    """
+    估算解析后的 YAML 数据占用的内存（字节），包括容器本身和其中的键值。
+    :param data: YAML 解析得到的数据
+    :return: 字节数
+    """
+    size = sys.getsizeof(data)
+    if isinstance(data, dict):
+        for key, value in data.items():
+            size += estimate_size(key) + estimate_size(value)
+    elif isinstance(data, list):
+        for item in data:
+            size += estimate_size(item)
+    return size
+
+
+class YamlDocumentCache:
+    """
+    有内存上限的 YAML 文档 LRU 缓存。
+    """
+
+    def __init__(self, max_bytes=YAML_CACHE_MAX_BYTES, max_entries=YAML_CACHE_MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # {真实路径: (文件签名 (mtime_ns, size), 只读数据, 估算字节数)}，按最近使用排序
+        self._entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejected = 0
+
+    def _remove(self, path):
+        """
+        移除一个缓存项。调用者需持有锁。
+        """
+        _, _, size = self._entries.pop(path)
+        self.bytes -= size
+
+    def get(self, path):
+        """
+        获取 YAML 文件解析后的只读数据，文件未修改时直接返回缓存。
+        :param path: 文件路径
+        :return: 只读数据
+        """
+        path = os.path.realpath(path)
+        # 先取签名再解析：解析期间文件被替换时，缓存的是新内容、旧签名，下一次访问签名不同会重新解析
+        st = os.stat(path)
+        signature = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        data = freeze(yaml_io.load_file(path))
+        size = estimate_size(data)
+        with self._lock:
+            if path in self._entries:
+                self._remove(path)
+            if size > self.max_bytes:
+                # 单个文档超过整个缓存的上限，不缓存，避免把其他文档全部挤出去
+                self.rejected += 1
+                logger.info("YAML 文档过大，不缓存: %s（约 %d 字节）", path, size)
+                return data
+            self._entries[path] = (signature, data, size)
+            self.bytes += size
+            while self._entries and (self.bytes > self.max_bytes or len(self._entries) > self.max_entries):
+                evicted = next(iter(self._entries))
+                self._remove(evicted)
+                self.evictions += 1
+                logger.debug("淘汰 YAML 文档缓存: %s", evicted)
+        return data
+
+    def invalidate(self, path=None):
+        """
+        丢弃指定文件（为空时丢弃全部）的缓存。
+        """
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self.bytes = 0
+            else:
+                path = os.path.realpath(path)
+                if path in self._entries:
+                    self._remove(path)
+
+    def stats(self):
+        """
+        获取缓存的命中和淘汰统计。
+        :return: 统计信息字典
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+                'evictions': self.evictions,
+                'rejected': self.rejected,
+            }
+
+
+yaml_cache = YamlDocumentCache()
@@ -0,0 +1,119 @@
+# yaml_io.py
+import os
+import pickle
+import logging
+import yaml
+from atomic_file import atomic_write, file_signature
+from metrics import file_bytes
+
+logger = logging.getLogger(__name__)
+
+# 所有 YAML 的读写都通过这里，优先使用 libyaml 的 C 实现（Dockerfile 中基于 yaml-dev 编译了 PyYAML），
+# 没有编译 C 扩展时退回纯 Python 实现，行为一致，只是慢几倍。
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+    LIBYAML = True
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+    LIBYAML = False
+
+# 是否在每个 YAML 文件旁边保存二进制快照（.<文件名>.snapshot），加快进程启动后的第一次加载。
+# 快照使用 pickle 格式，只应在配置目录仅可信用户可写时开启。
+YAML_SNAPSHOT = os.environ.get('YAML_SNAPSHOT', '0').lower() in ('1', 'true', 'yes')
+
+SNAPSHOT_VERSION = 1
+
+
+def load(stream):
+    """
+    解析 YAML 内容。
+    :param stream: 字符串或已打开的文件
+    :return: 解析得到的数据
+    """
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def dump(data, stream=None):
+    """
+    序列化为 YAML，保留中文等非 ASCII 字符。
+    :param data: 要序列化的数据
+    :param stream: 输出的文件，为 None 时返回字符串
+    :return: stream 为 None 时返回 YAML 字符串
+    """
+    return yaml.dump(data, stream, Dumper=SafeDumper, allow_unicode=True)
+
+
+def snapshot_path_for(path):
+    """
+    获取 YAML 文件对应的二进制快照路径。
+    """
+    real = os.path.realpath(path)
+    return os.path.join(os.path.dirname(real), '.' + os.path.basename(real) + '.snapshot')
+
+
+def load_snapshot(path):
+    """
+    读取 YAML 文件的二进制快照，快照对应的文件签名与当前文件不一致时视为失效。
+    :param path: YAML 文件路径
+    :return: (是否命中, 数据)
+    """
+    try:
+        with open(snapshot_path_for(path), 'rb') as file:
+            version, signature, data = pickle.load(file)
+    except FileNotFoundError:
+        return False, None
+    except Exception as e:
+        logger.warning("读取 YAML 快照失败: %s %s", path, e)
+        return False, None
+    if version != SNAPSHOT_VERSION or signature != file_signature(path):
+        return False, None
+    return True, data
+
+
+def save_snapshot(path, data, signature=None):
+    """
+    保存 YAML 文件的二进制快照，失败时只记录日志。
+    :param path: YAML 文件路径
+    :param data: 文件内容解析后的数据
+    :param signature: 数据对应的文件签名，默认使用当前文件的签名
+    """
+    signature = signature if signature is not None else file_signature(path)
+    if signature is None:
+        return
+    try:
+        atomic_write(snapshot_path_for(path), pickle.dumps((SNAPSHOT_VERSION, signature, data), pickle.HIGHEST_PROTOCOL))
+    except Exception as e:
+        logger.warning("保存 YAML 快照失败: %s %s", path, e)
+
+
+def load_file(path, snapshot=YAML_SNAPSHOT):
+    """
+    读取并解析 YAML 文件。
+    :param path: 文件路径
+    :param snapshot: 是否使用二进制快照
+    :return: 解析得到的数据
+    """
+    if snapshot:
+        hit, data = load_snapshot(path)
+        if hit:
+            return data
+        # 先取签名再读文件，读取期间文件被修改时快照会因签名不一致而失效
+        signature = file_signature(path)
+    with open(path, 'r', encoding='utf-8') as file:
+        file_bytes.inc(os.fstat(file.fileno()).st_size, 'read')
+        data = load(file)
+    if snapshot:
+        save_snapshot(path, data, signature)
+    return data
+
+
+def dump_file(path, data, snapshot=YAML_SNAPSHOT):
+    """
+    序列化为 YAML 并原子地写入文件。
+    :param path: 文件路径
+    :param data: 要写入的数据
+    :param snapshot: 是否同时更新二进制快照
+    """
+    atomic_write(path, dump(data))
+    if snapshot:
+        save_snapshot(path, data)
@@ -0,0 +1,240 @@
+# yaml_stream.py
+import logging
+import yaml
+from yaml.events import (AliasEvent, ScalarEvent, SequenceStartEvent, SequenceEndEvent,
+                         MappingStartEvent, MappingEndEvent, CollectionStartEvent, CollectionEndEvent)
+import yaml_io
+
+logger = logging.getLogger(__name__)
+
+# 按事件流读取大 YAML 文件，只构造需要的部分，内存占用与文件大小无关：
+#   - 路径定位：path 为以 . 分隔的键，例如 Developer.Github。映射按键查找；
+#     序列中的元素是 homepage 格式的单键字典时按键查找，数字表示序列下标；
+#     不匹配的子树只读取事件、直接跳过，不构造 Python 对象。
+#   - 逐个读取：定位到的序列（或映射）逐个元素构造，映射的元素为 {键: 值}，可以指定 offset / limit。
+# 跳过的子树中定义的锚点（&anchor）不会被记录，之后引用它的别名会报错。
+
+
+class YamlPathNotFound(KeyError):
+    """
+    路径在 YAML 文件中不存在。
+    """
+
+
+class YamlCursor:
+    """
+    指向 YAML 文件中某个节点的游标，节点之前的内容已经被跳过。
+    使用完后需要调用 close()（或用 with 语句）。
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'r', encoding='utf-8')
+        self._loader = yaml_io.SafeLoader(self._file)
+        self._anchors = {}
+        # 跳过 StreamStart 和 DocumentStart，空文件时没有节点
+        self._loader.get_event()
+        self._empty = not self._loader.check_event(yaml.DocumentStartEvent)
+        if not self._empty:
+            self._loader.get_event()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        try:
+            self._loader.dispose()
+        finally:
+            self._file.close()
+
+    # -----------------------------------------------------------------------------------
+    # 事件级别的操作
+
+    def _skip(self):
+        """
+        跳过当前节点（包括它的整个子树）。
+        """
+        event = self._loader.get_event()
+        depth = 1 if isinstance(event, CollectionStartEvent) else 0
+        while depth:
+            event = self._loader.get_event()
+            if isinstance(event, CollectionStartEvent):
+                depth += 1
+            elif isinstance(event, CollectionEndEvent):
+                depth -= 1
+
+    def _compose(self):
+        """
+        从事件构造当前节点的节点树（与 yaml.composer 相同，但可以从文档中间开始）。
+        """
+        event = self._loader.get_event()
+        if isinstance(event, AliasEvent):
+            if event.anchor not in self._anchors:
+                raise yaml.composer.ComposerError(None, None, f"未定义的别名（锚点可能位于被跳过的部分）: {event.anchor}",
+                                                  event.start_mark)
+            return self._anchors[event.anchor]
+        if isinstance(event, ScalarEvent):
+            tag = event.tag
+            if tag is None or tag == '!':
+                tag = self._loader.resolve(yaml.ScalarNode, event.value, event.implicit)
+            node = yaml.ScalarNode(tag, event.value, event.start_mark, event.end_mark, style=event.style)
+        elif isinstance(event, SequenceStartEvent):
+            tag = event.tag
+            if tag is None or tag == '!':
+                tag = self._loader.resolve(yaml.SequenceNode, None, event.implicit)
+            node = yaml.SequenceNode(tag, [], event.start_mark, None, flow_style=event.flow_style)
+            if event.anchor is not None:
+                self._anchors[event.anchor] = node
+            while not self._loader.check_event(SequenceEndEvent):
+                node.value.append(self._compose())
+            node.end_mark = self._loader.get_event().end_mark
+            return node
+        else:
+            tag = event.tag
+            if tag is None or tag == '!':
+                tag = self._loader.resolve(yaml.MappingNode, None, event.implicit)
+            node = yaml.MappingNode(tag, [], event.start_mark, None, flow_style=event.flow_style)
+            if event.anchor is not None:
+                self._anchors[event.anchor] = node
+            while not self._loader.check_event(MappingEndEvent):
+                key = self._compose()
+                node.value.append((key, self._compose()))
+            node.end_mark = self._loader.get_event().end_mark
+            return node
+        if event.anchor is not None:
+            self._anchors[event.anchor] = node
+        return node
+
+    def _construct(self):
+        """
+        构造当前节点对应的 Python 数据。
+        """
+        return self._loader.construct_document(self._compose())
+
+    def _key_matches(self, key):
+        """
+        读取映射中的下一个键并与 key 比较，键本身是集合时直接跳过。
+        """
+        if not self._loader.check_event(ScalarEvent):
+            self._skip()
+            return False
+        return str(self._construct()) == key
+
+    def _find_in_mapping(self, key):
+        """
+        在映射中查找键，找到时停在对应的值上。调用者已读取 MappingStart。
+        """
+        while not self._loader.check_event(MappingEndEvent):
+            if self._key_matches(key):
+                return True
+            self._skip()
+        self._loader.get_event()
+        return False
+
+    def _descend(self, key):
+        """
+        进入当前节点中名为 key 的子节点。
+        """
+        if self._loader.check_event(MappingStartEvent):
+            self._loader.get_event()
+            return self._find_in_mapping(key)
+        if self._loader.check_event(SequenceStartEvent):
+            self._loader.get_event()
+            if key.isdigit():
+                for _ in range(int(key)):
+                    if self._loader.check_event(SequenceEndEvent):
+                        return False
+                    self._skip()
+                return not self._loader.check_event(SequenceEndEvent)
+            # homepage 格式：[{分组名: [...]}, ...]，按元素中的键查找
+            while not self._loader.check_event(SequenceEndEvent):
+                if self._loader.check_event(MappingStartEvent):
+                    self._loader.get_event()
+                    if self._find_in_mapping(key):
+                        return True
+                else:
+                    self._skip()
+            return False
+        return False
+
+    # -----------------------------------------------------------------------------------
+    # 对外的接口
+
+    def locate(self, path):
+        """
+        定位到路径对应的节点。
+        :param path: 以 . 分隔的路径，为空时表示整个文档
+        :raise YamlPathNotFound: 路径不存在
+        """
+        if self._empty:
+            raise YamlPathNotFound(path or '')
+        for key in (path.split('.') if path else []):
+            if not self._descend(key):
+                raise YamlPathNotFound(path)
+        return self
+
+    def is_collection(self):
+        return self._loader.check_event(SequenceStartEvent, MappingStartEvent)
+
+    def value(self):
+        """
+        构造当前节点的完整数据。
+        """
+        if self._empty:
+            return None
+        return self._construct()
+
+    def items(self, offset=0, limit=None):
+        """
+        逐个构造当前序列（或映射）的元素，跳过前 offset 个，最多 limit 个。
+        不是集合时把节点本身作为唯一的元素。
+        :return: 生成器，结束后 self.has_more 表示是否还有更多元素
+        """
+        self.has_more = False
+        if self._empty:
+            return
+        if not self.is_collection():
+            if offset == 0 and limit != 0:
+                yield self._construct()
+            return
+        mapping = self._loader.check_event(MappingStartEvent)
+        end_event = MappingEndEvent if mapping else SequenceEndEvent
+        self._loader.get_event()
+        index = 0
+        emitted = 0
+        while not self._loader.check_event(end_event):
+            if limit is not None and emitted >= limit:
+                self.has_more = True
+                return
+            if index < offset:
+                if mapping:
+                    self._skip()
+                self._skip()
+            elif mapping:
+                key = self._construct()
+                yield {key: self._construct()}
+                emitted += 1
+            else:
+                yield self._construct()
+                emitted += 1
+            index += 1
+
+
+def read_partial(file_path, path=None, offset=0, limit=None):
+    """
+    读取 YAML 文件中指定路径的内容，指定了 offset 或 limit 时只读取其中的一段元素。
+    :param file_path: YAML 文件路径
+    :param path: 以 . 分隔的路径，例如 Developer.Github
+    :param offset: 跳过的元素数
+    :param limit: 最多读取的元素数
+    :return: (内容, 是否还有更多元素)
+    :raise YamlPathNotFound: 路径不存在
+    """
+    with YamlCursor(file_path) as cursor:
+        cursor.locate(path)
+        if not offset and limit is None:
+            return cursor.value(), False
+        items = list(cursor.items(offset, limit))
+        return items, cursor.has_more